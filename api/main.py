@@ -1,6 +1,6 @@
 from fastapi import FastAPI
-from api.routers import ingest, rag_api, recommend, data_market, data_smartmeter, admin, system
-from api.services import qdrant
+from api.routers import ingest, rag_api, recommend, data_market, data_smartmeter, devices, admin, system
+from api.services import qdrant, http_pool, db, anomaly
 
 app = FastAPI(title="🌙 Luna IEMS API", version="1.0")
 
@@ -8,10 +8,41 @@ app = FastAPI(title="🌙 Luna IEMS API", version="1.0")
 def init_services():
     """Initialisiert notwendige Services beim Start."""
     try:
-        qdrant.ensure_collection(dim=384)
+        # Nur prüfen/indizieren: angelegt wird beim ersten Ingest mit der Dimension des Embedding-Modells
+        qdrant.ensure_collection()
         print("✅ Qdrant initialisiert")
     except Exception as e:
         print(f"⚠️ Startup-Warnung: {e}")
+    if anomaly.detector is not None:
+        try:
+            if anomaly.detector.load():
+                print("✅ Anomalie-Zustand geladen")
+        except Exception as e:
+            print(f"⚠️ Anomalie-Zustand konnte nicht geladen werden: {e}")
+
+@app.on_event("startup")
+async def open_db_pools():
+    """Öffnet die Postgres-Pools (sync + async)."""
+    try:
+        db.open_pool()
+        await db.aopen_pool()
+        print(f"✅ DB-Pools geöffnet (min={db.DB_POOL_MIN}, max={db.DB_POOL_MAX})")
+    except Exception as e:
+        print(f"⚠️ DB-Pools konnten nicht geöffnet werden: {e}")
+
+@app.on_event("shutdown")
+async def close_services():
+    """Schließt gepoolte HTTP-, Qdrant- und Postgres-Verbindungen und sichert den Anomalie-Zustand."""
+    if anomaly.detector is not None:
+        try:
+            anomaly.detector.save()
+        except Exception as e:
+            print(f"⚠️ Anomalie-Zustand konnte nicht gesichert werden: {e}")
+    await http_pool.aclose()
+    await db.aclose_pool()
+    db.close_pool()
+    await qdrant.aclose()
+    qdrant.close()
 
 @app.get("/health")
 def health():
@@ -23,5 +54,6 @@ app.include_router(rag_api.router)
 app.include_router(recommend.router)
 app.include_router(data_market.router)
 app.include_router(data_smartmeter.router)
+app.include_router(devices.router)
 app.include_router(admin.router)
 app.include_router(system.router)
\ No newline at end of file
@@ -1,2 +1,62 @@
-from fastapi import APIRouter
-router = APIRouter(prefix="/api/v1/placeholder", tags=["placeholder"])
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Query
+from api.services import db, market
+
+router = APIRouter(prefix="/api/v1/market", tags=["Market"])
+
+@router.post("/prices/bulk")
+async def bulk_prices(request: Request, format: str | None = None):
+    """
+    Lädt Marktpreise als NDJSON- oder CSV-Stream (COPY + Upsert).
+    NDJSON: {"market": "day_ahead", "ts": "2025-01-01T00:00:00", "price_eur_mwh": 62.3}
+    CSV: Header mit market,ts,price_eur_mwh
+    """
+    fmt = (format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")).lower()
+    if fmt not in {"ndjson", "csv"}:
+        return {"status": "error", "detail": f"Unbekanntes Format '{fmt}' (erlaubt: ndjson, csv)"}
+    try:
+        stats = await market.bulk_load(request.stream(), fmt=fmt)
+        return {"status": "ok", **stats}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+@router.get("/prices")
+def get_prices(
+    market_name: str = Query(..., alias="market"),
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+):
+    """Preise eines Markts (z. B. day_ahead, intraday) spaltenweise: t in epoch-ms, Preis in €/MWh."""
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    try:
+        with db.connection() as conn:
+            t, p = market.prices(conn, market_name, start, end)
+        return {"status": "ok", "market": market_name, "points": len(t),
+                "t": (t * 1000).astype("int64").tolist(), "price_eur_mwh": p.tolist()}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+@router.get("/cost")
+def get_cost(
+    device_id: list[int] = Query(...),
+    market_name: str = Query("day_ahead", alias="market"),
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    resolution: str = "15m",
+    per_device: bool = False,
+):
+    """
+    Verbrauch (kWh) und Kosten (€) je Intervall für ?device_id=1&device_id=2…,
+    berechnet aus den Readings-Rollups und den Preisen des Markts.
+    """
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    if end <= start:
+        return {"status": "error", "detail": "'to' muss nach 'from' liegen"}
+    try:
+        with db.connection() as conn:
+            result = market.cost(conn, market_name, device_id, start, end,
+                                 resolution=resolution, per_device=per_device)
+        return {"status": "ok", **result}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
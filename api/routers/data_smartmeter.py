@@ -1,2 +1,119 @@
-from fastapi import APIRouter
-router = APIRouter(prefix="/api/v1/placeholder", tags=["placeholder"])
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import Response
+from api.services import db, readings, rollups, series
+
+router = APIRouter(prefix="/api/v1/smartmeter", tags=["SmartMeter"])
+
+@router.post("/readings/bulk")
+async def bulk_readings(request: Request, format: str | None = None):
+    """
+    Nimmt Readings als NDJSON- oder CSV-Stream entgegen und lädt sie per COPY.
+    Format über ?format=ndjson|csv oder den Content-Type (text/csv → CSV).
+    NDJSON: {"device_id": 1, "timestamp": "2025-01-01T00:00:00", "value": 1.23}
+    CSV: Header mit device_id,timestamp,value
+    """
+    fmt = (format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")).lower()
+    if fmt not in {"ndjson", "csv"}:
+        return {"status": "error", "detail": f"Unbekanntes Format '{fmt}' (erlaubt: ndjson, csv)"}
+    try:
+        stats = await readings.bulk_ingest(request.stream(), fmt=fmt)
+        return {"status": "ok", **stats}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+@router.get("/devices/{device_id}/rollups")
+def device_rollups(
+    device_id: int,
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    max_points: int = Query(rollups.ROLLUP_MAX_POINTS, ge=1),
+    resolution: str | None = None,
+):
+    """
+    Aggregierte Verbrauchswerte (count/sum/avg/min/max) je Zeit-Bucket.
+    Ohne ?resolution=15m|1h|1d wird die feinste Auflösung gewählt, die max_points einhält.
+    """
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    if end <= start:
+        return {"status": "error", "detail": "'to' muss nach 'from' liegen"}
+    try:
+        with db.connection() as conn:
+            result = rollups.query(conn, device_id, start, end,
+                                   max_points=max_points, resolution=resolution)
+        return {"status": "ok", **result}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+@router.get("/devices/{device_id}/anomalies")
+def device_anomalies(device_id: int, limit: int = Query(100, ge=1, le=1000)):
+    """Zuletzt erkannte Anomalien eines Geräts (spike, negative, stuck), neueste zuerst."""
+    try:
+        with db.connection() as conn:
+            cur = conn.execute("""
+                SELECT "timestamp", value, kind, score, expected, created_at FROM reading_anomalies
+                WHERE device_id = %s ORDER BY "timestamp" DESC LIMIT %s
+            """, (device_id, limit))
+            rows = cur.fetchall()
+        return {
+            "status": "ok",
+            "device_id": device_id,
+            "anomalies": [
+                {"timestamp": ts.isoformat(), "value": v, "kind": k, "score": s, "expected": e,
+                 "detected_at": c.isoformat()}
+                for ts, v, k, s, e, c in rows
+            ],
+        }
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+@router.get("/devices/{device_id}/series")
+def device_series(
+    device_id: int,
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    max_points: int = Query(series.SERIES_MAX_POINTS, ge=3, le=series.SERIES_POINTS_LIMIT),
+    mode: str = "lttb",
+    format: str = "json",
+):
+    """
+    Rohdaten eines Geräts, serverseitig auf max_points reduziert (mode=lttb|minmax).
+    format=json  → {"t": [epoch-ms…], "v": [Werte…]} (spaltenweise)
+    format=binary → n × int64 epoch-ms (LE) gefolgt von n × float32, n im Header X-Series-Points
+    format=arrow → Arrow-IPC-Stream (benötigt pyarrow)
+    """
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    if end <= start:
+        return {"status": "error", "detail": "'to' muss nach 'from' liegen"}
+    if format not in {"json", "binary", "arrow"}:
+        return {"status": "error", "detail": f"Unbekanntes Format '{format}' (erlaubt: json, binary, arrow)"}
+    try:
+        t0 = time.perf_counter()
+        with db.connection() as conn:
+            t, v = series.fetch(conn, device_id, start, end)
+        raw_points = len(t)
+        t, v = series.downsample(t, v, max_points=max_points, mode=mode)
+        headers = {
+            "X-Series-Points": str(len(t)),
+            "X-Series-Raw-Points": str(raw_points),
+            "X-Series-Mode": mode,
+        }
+        if format == "binary":
+            return Response(series.to_binary(t, v), media_type="application/octet-stream", headers=headers)
+        if format == "arrow":
+            return Response(series.to_arrow(t, v), media_type="application/vnd.apache.arrow.stream",
+                            headers=headers)
+        return {
+            "status": "ok",
+            "device_id": device_id,
+            "mode": mode,
+            "raw_points": raw_points,
+            "points": len(t),
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "t": t.astype("int64").tolist(),
+            "v": v.tolist(),
+        }
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
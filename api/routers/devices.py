@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.services import db, repositories as repo
+
+router = APIRouter(prefix="/api/v1/devices", tags=["Devices"])
+
+
+def _device(d) -> dict:
+    return {
+        "id": d.id,
+        "name": d.name,
+        "type": d.type,
+        "user_id": d.user_id,
+        "owner": {"id": d.owner.id, "name": d.owner.name} if d.owner else None,
+    }
+
+
+def _reading(r) -> dict | None:
+    return {"timestamp": r.timestamp.isoformat(), "value": r.value} if r else None
+
+
+@router.get("")
+async def list_devices(
+    user_id: int | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(db.get_session),
+):
+    """Geräte (optional ?user_id=…) mit Besitzer und letztem Reading – zwei Abfragen für die ganze Seite."""
+    try:
+        devices = await repo.list_devices(session, user_id, limit=limit, offset=offset)
+        last = await repo.latest_readings(session, [d.id for d in devices])
+        return {
+            "status": "ok",
+            "devices": [{**_device(d), "last_reading": _reading(last.get(d.id))} for d in devices],
+        }
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+@router.get("/{device_id}")
+async def get_device(device_id: int, session: AsyncSession = Depends(db.get_session)):
+    """Ein Gerät mit Besitzer, letztem Reading und den Empfehlungen des letzten Laufs."""
+    try:
+        device = await repo.get_device(session, device_id)
+        if device is None:
+            return {"status": "error", "detail": f"Gerät {device_id} nicht gefunden"}
+        last = await repo.latest_readings(session, [device_id])
+        recs = await repo.latest_recommendations(session, device_id)
+        return {
+            "status": "ok",
+            **_device(device),
+            "last_reading": _reading(last.get(device_id)),
+            "recommendations": [
+                {"id": r.id, "kind": r.kind, "score": r.score, "text": r.recommendation_text,
+                 "created_at": r.created_at.isoformat() if r.created_at else None}
+                for r in recs
+            ],
+        }
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
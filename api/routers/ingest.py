@@ -1,38 +1,29 @@
-from fastapi import APIRouter, UploadFile, File
-from api.services import tika, embed, qdrant
-import tempfile, shutil, os
+from fastapi import APIRouter, UploadFile, File, Form
+from api.services import ingest_pipeline
 
 router = APIRouter(prefix="/api/v1/ingest", tags=["Ingest"])
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Nimmt Datei entgegen, extrahiert Text via Tika und speichert Embeddings in Qdrant."""
+async def upload_file(
+    file: UploadFile = File(...),
+    source: str = Form("upload"),
+    tags: str | None = Form(None),
+    tenant: str | None = Form(None),
+):
+    """
+    Nimmt Datei entgegen, streamt sie durch Tika und speichert Chunk-Embeddings in Qdrant.
+    source, tags (kommagetrennt) und tenant werden zu Filterfeldern für /api/v1/rag/ask.
+    """
     try:
-        # Temporäre Datei speichern
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
+        stats = await ingest_pipeline.ingest_stream(
+            file, file.filename, source=source, tags=(tags or "").split(","), tenant=tenant)
 
-        # Text extrahieren (Bytes statt Pfad)
-        with open(tmp_path, "rb") as f:
-            file_bytes = f.read()
-        text = tika.extract_text(file_bytes, file.filename)
-
-        if not text or not text.strip():
+        if not stats["chunks"]:
             return {"status": "error", "detail": "Keine extrahierbaren Texte gefunden."}
 
-        # Embeddings erzeugen
-        vectors = embed.embed_texts([text])
-        if not vectors or not isinstance(vectors, list) or vectors[0] is None:
-            return {"status": "error", "detail": "Fehler beim Erzeugen der Embeddings."}
-
-        # Qdrant initialisieren & speichern
-        qdrant.ensure_collection(dim=len(vectors[0]))
-        qdrant.upsert_vectors([text], vectors)
-
-        os.unlink(tmp_path)
-        return {"status": "ok", "filename": file.filename, "length": len(text)}
+        return {"status": "ok", **stats}
 
     except Exception as e:
         return {"status": "error", "detail": str(e)}
-
+    finally:
+        await file.close()
@@ -1,19 +1,74 @@
+import os, json
+from datetime import datetime
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from api.services import rag
 
 router = APIRouter(prefix="/api/v1/rag", tags=["RAG"])
+RAG_BATCH_MAX = int(os.getenv("RAG_BATCH_MAX", "100"))
+
+class AskFilters(BaseModel):
+    """Eingrenzung der Suche; Listen = einer der Werte, Datumsbereich [date_from, date_to) auf ingested_at."""
+    tenant: str | None = None
+    source: str | list[str] | None = None
+    tags: list[str] | None = None
+    doc_type: str | list[str] | None = None
+    filename: str | list[str] | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+
+    def to_dict(self) -> dict | None:
+        return self.model_dump(exclude_none=True) or None
 
 class AskBody(BaseModel):
     question: str
     top_k: int | None = 6
+    filters: AskFilters | None = None
+
+class AskBatchBody(BaseModel):
+    questions: list[str]
+    top_k: int | None = 6
+    filters: AskFilters | None = None
+
+def _filters(body) -> dict | None:
+    return body.filters.to_dict() if body.filters else None
 
 @router.post("/ask")
-def rag_ask(body: AskBody):
-    """Fragt die RAG-Engine ab und liefert eine KI-generierte Antwort."""
+async def rag_ask(body: AskBody):
+    """
+    Fragt die RAG-Engine ab und liefert eine KI-generierte Antwort.
+    Optional `filters` (tenant, source, tags, doc_type, filename, date_from/date_to) → Filter in Qdrant.
+    """
     try:
-        result = rag.ask(body.question, top_k=body.top_k or 6)
+        result = await rag.aask(body.question, top_k=body.top_k or 6, filters=_filters(body))
         return {"status": "ok", "data": result or {}}
     except Exception as e:
         return {"status": "error", "detail": str(e)}
 
+@router.post("/ask/stream")
+async def rag_ask_stream(body: AskBody):
+    """
+    Wie /ask, aber als Server-Sent Events: zuerst `citations`,
+    dann `token`-Events während der Generierung, zuletzt `done` mit Metadaten.
+    """
+    async def sse():
+        async for event, data in rag.aask_stream(body.question, top_k=body.top_k or 6, filters=_filters(body)):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/ask_batch")
+async def rag_ask_batch(body: AskBatchBody):
+    """Beantwortet mehrere Fragen in einem Request (Reihenfolge wie Eingabe, Status pro Frage)."""
+    if len(body.questions) > RAG_BATCH_MAX:
+        return {"status": "error", "detail": f"Maximal {RAG_BATCH_MAX} Fragen pro Batch."}
+    try:
+        results = await rag.aask_batch(body.questions, top_k=body.top_k or 6, filters=_filters(body))
+        return {"status": "ok", "data": results}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
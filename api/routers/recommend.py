@@ -1,2 +1,18 @@
 from fastapi import APIRouter
-router = APIRouter(prefix="/api/v1/placeholder", tags=["placeholder"])
+from api.services import db, recommender
+
+router = APIRouter(prefix="/api/v1/recommend", tags=["Recommendations"])
+
+@router.get("/{device_id}")
+def device_recommendations(device_id: int, refresh: bool = False):
+    """
+    Empfehlungen des letzten Engine-Laufs für ein Gerät.
+    Mit ?refresh=true wird das Gerät vorher neu bewertet.
+    """
+    try:
+        run = recommender.run([device_id]) if refresh else None
+        with db.connection() as conn:
+            items = recommender.latest(conn, device_id)
+        return {"status": "ok", "device_id": device_id, "recommendations": items, "run": run}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 import platform, os, socket
+from api.services import embed, answer_cache, db, anomaly
 
 router = APIRouter(prefix="/api/v1/system", tags=["System"])
 
@@ -12,5 +13,9 @@ def system_info():
         "release": platform.release(),
         "python_version": platform.python_version(),
         "container": os.getenv("HOSTNAME", "unknown"),
+        "embed_cache": embed.cache.stats() if embed.cache else None,
+        "answer_cache": answer_cache.cache.stats() if answer_cache.cache else None,
+        "db_pool": db.stats(),
+        "anomaly_detector": anomaly.detector.stats() if anomaly.detector else None,
         "status": "ok"
     }
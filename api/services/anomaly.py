@@ -0,0 +1,216 @@
+"""
+🌙 Luna IEMS – Online-Anomalieerkennung für eingehende Readings
+
+Je Gerät wird ein O(1)-Zustand in NumPy-Arrays gehalten, indiziert direkt
+über Device.id: EWMA-Mittelwert und -Varianz, Anzahl, letzter Wert und
+Wiederholungszähler. Ein Ingest-Batch wird vektorisiert über alle Geräte
+verarbeitet (pro Durchlauf höchstens ein Wert je Gerät, zeitlich sortiert).
+
+Erkannte Arten:
+- spike:    |x − μ| / σ > ANOMALY_Z (nach ANOMALY_WARMUP Werten)
+- negative: negativer Zählerwert
+- stuck:    ANOMALY_STUCK_COUNT identische Werte ≠ 0 in Folge (Zähler hängt)
+
+Treffer werden vom Ingest per COPY in reading_anomalies geschrieben – ohne
+DB-Roundtrip pro Reading. Der Zustand wird beim Shutdown unter
+ANOMALY_STATE_FILE gesichert und beim Start wieder geladen.
+"""
+import os
+import math
+import threading
+from datetime import datetime
+
+import numpy as np
+
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "1").lower() not in {"0", "false", "no", "off"}
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.05"))
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "5.0"))
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "30"))
+ANOMALY_STUCK_COUNT = int(os.getenv("ANOMALY_STUCK_COUNT", "96"))
+# Ab so vielen Werten eines Geräts in einem Batch wird skalar statt vektoriell gerechnet
+ANOMALY_VECTOR_DEPTH = int(os.getenv("ANOMALY_VECTOR_DEPTH", "64"))
+ANOMALY_STATE_FILE = os.getenv(
+    "ANOMALY_STATE_FILE", os.path.join(os.getenv("CACHE_DIR", "/tmp/luna-cache"), "anomaly_state.npz"))
+
+COPY_SQL = 'COPY reading_anomalies (device_id, "timestamp", value, kind, score, expected) FROM STDIN'
+
+_STATE = ("mean", "var", "count", "last", "repeat")
+
+
+class AnomalyDetector:
+    """Array-basierter EWMA-Detektor; thread-safe, Zustand wächst mit der höchsten Device-ID."""
+
+    def __init__(self, alpha: float = ANOMALY_ALPHA, z: float = ANOMALY_Z,
+                 warmup: int = ANOMALY_WARMUP, stuck: int = ANOMALY_STUCK_COUNT, capacity: int = 1024):
+        self.alpha = alpha
+        self.z = z
+        self.warmup = warmup
+        self.stuck = stuck
+        self._lock = threading.Lock()
+        self._alloc(capacity)
+        self.processed = 0
+        self.flagged = 0
+
+    def _alloc(self, capacity: int):
+        self.mean = np.zeros(capacity)
+        self.var = np.zeros(capacity)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.last = np.full(capacity, np.nan)
+        self.repeat = np.zeros(capacity, dtype=np.int32)
+
+    def _ensure(self, max_id: int):
+        size = len(self.mean)
+        if max_id < size:
+            return
+        new_size = 1 << int(max_id).bit_length()
+        for name in _STATE:
+            old = getattr(self, name)
+            fill = np.nan if name == "last" else 0
+            grown = np.full(new_size, fill, dtype=old.dtype)
+            grown[:size] = old
+            setattr(self, name, grown)
+
+    def process(self, device_ids, timestamps, values) -> list:
+        """
+        Aktualisiert den Zustand mit einem Batch und liefert die Anomalien als
+        [(device_id, timestamp, value, kind, score, expected)].
+        """
+        dev = np.asarray(device_ids, dtype=np.int64)
+        ts = np.asarray(timestamps, dtype="datetime64[us]")
+        val = np.asarray(values, dtype=np.float64)
+        if len(dev) == 0:
+            return []
+
+        # nach Gerät und Zeit sortieren; rank = Position innerhalb des Geräts
+        order = np.lexsort((ts, dev))
+        dev, ts, val = dev[order], ts[order], val[order]
+        starts = np.flatnonzero(np.r_[True, dev[1:] != dev[:-1]])
+        lengths = np.diff(np.r_[starts, len(dev)])
+        rank = np.arange(len(dev)) - np.repeat(starts, lengths)
+        # Geräte mit sehr vielen Werten im Batch skalar abarbeiten, sonst entstünden
+        # entsprechend viele Vektor-Durchläufe mit nur einem Element
+        long_run = np.repeat(lengths > ANOMALY_VECTOR_DEPTH, lengths)
+        short = np.flatnonzero(~long_run)
+        by_rank = short[np.argsort(rank[short], kind="stable")]
+        bounds = np.r_[0, np.cumsum(np.bincount(rank[short]))] if len(short) else np.zeros(1, dtype=np.int64)
+
+        hits = []
+        with self._lock:
+            self._ensure(int(dev.max()))
+            for r in range(len(bounds) - 1):
+                sel = by_rank[bounds[r]:bounds[r + 1]]
+                hits.extend(self._step(dev[sel], ts[sel], val[sel]))
+            for start, length in zip(starts[lengths > ANOMALY_VECTOR_DEPTH], lengths[lengths > ANOMALY_VECTOR_DEPTH]):
+                sl = slice(start, start + length)
+                hits.extend(self._scan(int(dev[start]), ts[sl], val[sl]))
+            self.processed += len(dev)
+            self.flagged += len(hits)
+        return hits
+
+    def _step(self, ids, ts, x):
+        """Ein Wert je Gerät: bewerten, dann EWMA aktualisieren."""
+        mean, var, count = self.mean[ids], self.var[ids], self.count[ids]
+        std = np.sqrt(var)
+        warm = count >= self.warmup
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.where(std > 0, np.abs(x - mean) / std, 0.0)
+        spike = warm & (score > self.z)
+        negative = x < 0
+        repeat = np.where(x == self.last[ids], self.repeat[ids] + 1, 0)
+        stuck = (repeat == self.stuck) & (x != 0)
+
+        # Ausreißer nur gekappt einrechnen, damit sie die Statistik nicht verschieben
+        upd = np.where(warm, np.clip(x, mean - self.z * std, mean + self.z * std), x)
+        upd = np.where(negative, mean, upd)
+        alpha = np.maximum(self.alpha, 1.0 / (count + 1))
+        diff = upd - mean
+        incr = alpha * diff
+        self.mean[ids] = mean + incr
+        self.var[ids] = (1 - alpha) * (var + diff * incr)
+        self.count[ids] = count + 1
+        self.last[ids] = x
+        self.repeat[ids] = repeat
+
+        out = []
+        for kind, mask in (("spike", spike), ("negative", negative), ("stuck", stuck)):
+            for i in np.flatnonzero(mask):
+                out.append((int(ids[i]), ts[i].astype(datetime), float(x[i]), kind,
+                            round(float(score[i]), 3), float(mean[i])))
+        return out
+
+    def _scan(self, device_id: int, ts, x):
+        """Skalare Variante von _step für lange Folgen eines einzelnen Geräts."""
+        mean, var = float(self.mean[device_id]), float(self.var[device_id])
+        count, repeat = int(self.count[device_id]), int(self.repeat[device_id])
+        last = float(self.last[device_id])
+        z, alpha0, warmup, stuck = self.z, self.alpha, self.warmup, self.stuck
+        out = []
+        for i, v in enumerate(x.tolist()):
+            std = math.sqrt(var)
+            warm = count >= warmup
+            score = abs(v - mean) / std if std > 0 else 0.0
+            repeat = repeat + 1 if v == last else 0
+            kinds = []
+            if warm and score > z:
+                kinds.append("spike")
+            if v < 0:
+                kinds.append("negative")
+            if repeat == stuck and v != 0:
+                kinds.append("stuck")
+            for kind in kinds:
+                out.append((device_id, ts[i].astype(datetime), v, kind, round(score, 3), mean))
+
+            upd = min(max(v, mean - z * std), mean + z * std) if warm else v
+            if v < 0:
+                upd = mean
+            alpha = max(alpha0, 1.0 / (count + 1))
+            diff = upd - mean
+            incr = alpha * diff
+            mean += incr
+            var = (1 - alpha) * (var + diff * incr)
+            count += 1
+            last = v
+        self.mean[device_id], self.var[device_id] = mean, var
+        self.count[device_id], self.repeat[device_id], self.last[device_id] = count, repeat, last
+        return out
+
+    # ---------------------------------------------------------
+    # Zustand sichern / laden
+    # ---------------------------------------------------------
+    def save(self, path: str = ANOMALY_STATE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            tmp = f"{path}.tmp.npz"
+            np.savez(tmp, **{name: getattr(self, name) for name in _STATE})
+            os.replace(tmp, path)
+
+    def load(self, path: str = ANOMALY_STATE_FILE) -> bool:
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data, self._lock:
+            for name in _STATE:
+                setattr(self, name, data[name].copy())
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "devices": int(np.count_nonzero(self.count)),
+            "processed": self.processed,
+            "flagged": self.flagged,
+            "alpha": self.alpha,
+            "z": self.z,
+        }
+
+
+def write(conn, anomalies: list) -> int:
+    """Schreibt Anomalien per COPY, ohne Commit – der Ingest committet sie zusammen mit dem Readings-Batch."""
+    if not anomalies:
+        return 0
+    with conn.cursor() as cur:
+        with cur.copy(COPY_SQL) as copy:
+            for row in anomalies:
+                copy.write_row(row)
+    return len(anomalies)
+
+
+detector = AnomalyDetector() if ANOMALY_DETECTION else None
@@ -0,0 +1,142 @@
+"""
+🌙 Luna IEMS – Semantischer Antwort-Cache für rag.ask
+
+Schlüssel: (Frage-Embedding, top_k, Prompt-Version, Collection-Version).
+Ein Treffer liegt vor, wenn eine frühere Frage mit gleichem top_k und gleicher
+Prompt-Version eine Kosinus-Ähnlichkeit ≥ ANSWER_CACHE_THRESHOLD hat.
+
+Die Collection-Version ist die mtime einer Marker-Datei unter MODEL_DIR, die von
+Ingest und Retraining angefasst wird (bump_collection_version). Da API- und
+Worker-Container /models teilen, invalidiert ein Retrain alle API-Prozesse.
+"""
+import os
+import time
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1").lower() not in {"0", "false", "no", "off"}
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", os.getenv("CACHE_TTL", "3600")))
+ANSWER_CACHE_MAX = int(os.getenv("ANSWER_CACHE_MAX", "2000"))
+MODEL_DIR = Path(os.getenv("MODEL_DIR", "/models/versions"))
+COLLECTION_VERSION_FILE = Path(os.getenv("COLLECTION_VERSION_FILE", str(MODEL_DIR / "collection_version")))
+
+_local_version = 0
+
+
+def collection_version():
+    """Aktuelle Collection-Version (Marker-Datei + prozesslokaler Zähler)."""
+    try:
+        return COLLECTION_VERSION_FILE.stat().st_mtime_ns, _local_version
+    except OSError:
+        return 0, _local_version
+
+
+def bump_collection_version():
+    """Markiert die Collection als geändert → alle gecachten Antworten werden ungültig."""
+    global _local_version
+    _local_version += 1
+    try:
+        COLLECTION_VERSION_FILE.parent.mkdir(parents=True, exist_ok=True)
+        COLLECTION_VERSION_FILE.write_text(f"{time.time()}\n", encoding="utf-8")
+    except OSError as e:
+        print(f"⚠️ Collection-Version konnte nicht geschrieben werden: {e}")
+
+
+class AnswerCache:
+    """LRU+TTL-Cache mit Ähnlichkeitssuche über normierte Frage-Embeddings."""
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: int = ANSWER_CACHE_TTL,
+                 max_items: int = ANSWER_CACHE_MAX):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries: OrderedDict[int, tuple] = OrderedDict()
+        self._next_id = 0
+        self._matrix = None
+        self._ids = []
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _check_version(self):
+        version = collection_version()
+        if version != self._version:
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _rebuild(self):
+        self._ids = list(self._entries)
+        self._matrix = (np.stack([self._entries[i][0] for i in self._ids])
+                        if self._ids else None)
+
+    @staticmethod
+    def _normalize(vec):
+        v = np.asarray(vec, dtype=np.float32)
+        n = np.linalg.norm(v)
+        return v / n if n > 0 else None
+
+    def lookup(self, q_emb, top_k: int, prompt_version: str):
+        """Liefert (Antwort-Dict, Ähnlichkeit) oder (None, None)."""
+        q = self._normalize(q_emb)
+        if q is None:
+            return None, None
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            if self._matrix is None and self._entries:
+                self._rebuild()
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                self.misses += 1
+                return None, None
+
+            sims = self._matrix @ q
+            for idx in np.argsort(-sims):
+                sim = float(sims[idx])
+                if sim < self.threshold:
+                    break
+                eid = self._ids[idx]
+                entry = self._entries.get(eid)
+                if entry is None:
+                    continue
+                _, e_top_k, e_prompt, created, value = entry
+                if now - created > self.ttl:
+                    del self._entries[eid]
+                    self._matrix = None
+                    continue
+                if e_top_k == top_k and e_prompt == prompt_version:
+                    self._entries.move_to_end(eid)
+                    self.hits += 1
+                    return value, sim
+            self.misses += 1
+            return None, None
+
+    def store(self, q_emb, top_k: int, prompt_version: str, value: dict):
+        q = self._normalize(q_emb)
+        if q is None:
+            return
+        with self._lock:
+            self._check_version()
+            self._entries[self._next_id] = (q, top_k, prompt_version, time.time(), value)
+            self._next_id += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+        }
+
+
+cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
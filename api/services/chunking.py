@@ -0,0 +1,254 @@
+"""
+🌙 Luna IEMS – Token-budgetiertes Chunking (Markdown-bewusst, streamend)
+
+Text kommt in beliebigen Stücken (z. B. aus Tika) und wird zeilenweise in
+Einheiten zerlegt: Überschriften, Codeblock-Zeilen und Sätze (zu lange
+Sätze wortweise). Die Einheiten werden bis CHUNK_MAX_TOKENS zu Chunks
+zusammengefasst:
+
+- Eine Markdown-Überschrift beginnt immer einen neuen Chunk; der
+  Überschriftenpfad (z. B. ["Playbook", "3.1 Marktlogik"]) landet in der Payload.
+- Aufeinanderfolgende Chunks desselben Abschnitts überlappen um bis zu
+  CHUNK_OVERLAP_TOKENS (ganze Sätze).
+- Jede Einheit wird genau einmal gezählt und über eine Deque nur einmal
+  hinzugefügt und entfernt → Laufzeit linear in der Textlänge.
+
+Das Token-Budget richtet sich nach dem Embedding-Modell (MODEL_MAX_TOKENS).
+Gezählt wird per Schätzung (~4 Zeichen/Token) oder – mit
+CHUNK_TOKENIZER=model und EMBED_BACKEND=local – mit dem Tokenizer des Modells.
+
+Chunks sind Dicts mit id, index, text, start, end (Zeichen-Offsets [start, end)
+im Gesamttext), tokens und headings. Die ID ist deterministisch (uuid5 aus
+Dokument-ID, Offset und Inhalt): dieselbe Datei erneut eingespielt →
+dieselben IDs → der Upsert überschreibt, statt zu duplizieren.
+"""
+import os
+import re
+import uuid
+import hashlib
+from collections import deque
+
+from . import embed
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "estimate").lower()
+
+CHUNK_NAMESPACE = uuid.UUID("3d5c2b1e-8f4a-5e6d-9c7b-0a1f2e3d4c5b")
+
+# Maximale Eingabelänge (Tokens) gängiger Embedding-Modelle; Schlüssel = Teilstring der Modell-ID
+MODEL_MAX_TOKENS = {
+    "all-minilm": 256,
+    "paraphrase-multilingual": 128,
+    "mxbai-embed-large": 512,
+    "snowflake-arctic-embed": 512,
+    "nomic-embed-text": 2048,
+    "bge-m3": 8192,
+}
+
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+FENCE_RE = re.compile(r"^[ \t]*(```|~~~)")
+LINE_RE = re.compile(r"[^\n]*\n")
+# Satz = bis inkl. Satzzeichen vor Leerraum, sonst Rest der Zeile; Leerraum hängt am Satz
+SENTENCE_RE = re.compile(r"[^\n]*?[.!?…]+(?=\s)\s*|[^\n]+\n*|\n+")
+WORD_RE = re.compile(r"\S+\s*|\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (~4 Zeichen pro Token, Leerraum zählt nicht)."""
+    n = len(text.strip())
+    return (n + 3) // 4
+
+
+def token_counter():
+    """Zählfunktion für das konfigurierte Modell (Tokenizer nur beim lokalen Backend verfügbar)."""
+    if CHUNK_TOKENIZER == "model" and embed.backend.name == "local":
+        tokenizer = embed.backend.tokenizer()
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False)) if text.strip() else 0
+    return estimate_tokens
+
+
+def model_max_tokens(model_id: str | None = None) -> int | None:
+    model_id = (model_id or embed.backend.model_id).lower()
+    for key, limit in MODEL_MAX_TOKENS.items():
+        if key in model_id:
+            return limit
+    return None
+
+
+def default_budget() -> int:
+    """CHUNK_MAX_TOKENS, begrenzt auf das Modellfenster (abzüglich Spezial-Tokens; geschätzt mit 10 % Reserve)."""
+    limit = model_max_tokens()
+    if limit is None:
+        return CHUNK_MAX_TOKENS
+    usable = limit - 2 if CHUNK_TOKENIZER == "model" else int(limit * 0.9)
+    return max(16, min(CHUNK_MAX_TOKENS, usable))
+
+
+class Chunker:
+    """Inkrementeller Chunker: feed(piece) liefert fertige Chunks, flush() den Rest."""
+
+    def __init__(self, doc_id: str = "", max_tokens: int | None = None, overlap_tokens: int | None = None,
+                 count_tokens=None):
+        self.doc_id = doc_id
+        self.max_tokens = max_tokens or default_budget()
+        overlap = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.overlap_tokens = max(0, min(overlap, self.max_tokens // 2))
+        self.count = count_tokens or token_counter()
+        self.line_chars = 2 * self.overlap_tokens
+        self.units = deque()  # (start, text, tokens)
+        self.tokens = 0
+        self.fresh = False  # enthält der aktuelle Chunk mehr als die Überlappung?
+        self.body = False  # … und mehr als nur Überschriften?
+        self.headings = []  # [(level, titel)]
+        self.in_code = False
+        self.index = 0
+        self.offset = 0  # Offset des ersten Zeichens nach carry
+        self.carry = []  # Stücke der noch unvollständigen letzten Zeile
+        self.ready = []  # fertige Chunks, die feed/flush noch ausliefern
+
+    # ---------------------------------------------------------
+    # Eingabe
+    # ---------------------------------------------------------
+    def feed(self, piece: str):
+        if not piece:
+            return
+        self.offset += len(piece)
+        cut = piece.rfind("\n") + 1
+        if not cut:
+            # Keine vollständige Zeile: nur merken, nicht erneut scannen
+            self.carry.append(piece)
+            return
+        self.carry.append(piece[:cut])
+        text = "".join(self.carry)
+        base = self.offset - len(piece) + cut - len(text)
+        self.carry = [piece[cut:]] if cut < len(piece) else []
+        ready = self.ready
+        for m in LINE_RE.finditer(text):
+            self._line(base + m.start(), m.group())
+            if ready:
+                yield from ready
+                ready.clear()
+
+    def flush(self):
+        if self.carry:
+            line = "".join(self.carry)
+            self.carry = []
+            self._line(self.offset - len(line), line)
+        if self.fresh:
+            self._emit()
+        yield from self.ready
+        self.ready.clear()
+        self.units.clear()
+        self.tokens = 0
+        self.fresh = self.body = False
+
+    def _line(self, start: int, line: str):
+        if ("```" in line or "~~~" in line) and FENCE_RE.match(line):
+            self.in_code = not self.in_code
+            self._add(start, line)
+            return
+        if self.in_code:
+            self._add(start, line)
+            return
+        m = HEADING_RE.match(line.rstrip("\n")) if line[:1] == "#" else None
+        if m:
+            # Neuer Abschnitt: aktuellen Chunk abschließen, keine Überlappung über Abschnittsgrenzen.
+            # Reine Überschriften-Chunks entfallen, der Pfad steht in "headings" der Folge-Chunks.
+            if self.fresh and self.body:
+                self._emit()
+            self.units.clear()
+            self.tokens = 0
+            self.fresh = self.body = False
+            level = len(m.group(1))
+            while self.headings and self.headings[-1][0] >= level:
+                self.headings.pop()
+            self.headings.append((level, m.group(2).strip()))
+            self._add(start, line, body=False)
+            return
+        # Kurze Zeilen (Listenpunkte, Leerzeilen) als Ganzes, längere satzweise
+        if len(line) <= self.line_chars:
+            self._add(start, line)
+            return
+        for s in SENTENCE_RE.finditer(line):
+            self._add(start + s.start(), s.group())
+
+    def _add(self, start: int, text: str, body: bool = True):
+        tokens = self.count(text)
+        if tokens > self.max_tokens:
+            # Überlanger Satz / Zeile → wortweise, ein überlanges Wort hart nach Länge
+            words = WORD_RE.findall(text)
+            if len(words) == 1:
+                step = max(1, len(text) * self.max_tokens // tokens)
+                words = [text[i:i + step] for i in range(0, len(text), step)]
+            pos = start
+            for w in words:
+                self._add(pos, w, body)
+                pos += len(w)
+            return
+        if self.fresh and self.tokens + tokens > self.max_tokens:
+            self._emit()
+            units = self.units
+            while units and (self.tokens > self.overlap_tokens or self.tokens + tokens > self.max_tokens):
+                self.tokens -= units.popleft()[2]
+            self.fresh = False
+        self.units.append((start, text, tokens))
+        self.tokens += tokens
+        if tokens:
+            self.fresh = True
+            self.body = self.body or body
+
+    # ---------------------------------------------------------
+    # Ausgabe
+    # ---------------------------------------------------------
+    def _emit(self):
+        raw = "".join(u[1] for u in self.units)
+        text = raw.strip()
+        start = self.units[0][0] + (len(raw) - len(raw.lstrip()))
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        chunk = {
+            "id": str(uuid.uuid5(CHUNK_NAMESPACE, f"{self.doc_id}:{start}:{digest}")),
+            "index": self.index,
+            "text": text,
+            "start": start,
+            "end": start + len(text),
+            "tokens": self.tokens,
+            "headings": [title for _, title in self.headings],
+        }
+        self.index += 1
+        self.ready.append(chunk)
+
+
+def iter_chunks(pieces, doc_id: str = "", **kwargs):
+    """Chunks über einen Iterator von Textstücken (kwargs: max_tokens, overlap_tokens, count_tokens)."""
+    chunker = Chunker(doc_id, **kwargs)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.flush()
+
+
+async def aiter_chunks(pieces, doc_id: str = "", **kwargs):
+    """Wie iter_chunks, aber über einen async Iterator von Textstücken."""
+    chunker = Chunker(doc_id, **kwargs)
+    async for piece in pieces:
+        for chunk in chunker.feed(piece):
+            yield chunk
+    for chunk in chunker.flush():
+        yield chunk
+
+
+def chunk_text(text: str, doc_id: str = "", **kwargs) -> list:
+    return list(iter_chunks([text], doc_id, **kwargs))
+
+
+def payload(chunk: dict) -> dict:
+    """Chunk-Felder für die Qdrant-Payload."""
+    return {
+        "text": chunk["text"],
+        "chunk_id": chunk["id"],
+        "chunk_index": chunk["index"],
+        "start": chunk["start"],
+        "end": chunk["end"],
+        "tokens": chunk["tokens"],
+        "headings": chunk["headings"],
+    }
@@ -0,0 +1,145 @@
+"""
+🌙 Luna IEMS – Kontext-Packer für RAG-Prompts
+
+Begrenzt den Kontext eines Prompts auf ein Token-Budget für GENERATE_MODEL,
+damit die Prompt-Verarbeitung unabhängig von top_k planbar bleibt:
+
+1. Duplikate verwerfen: gleiche Chunk-ID, vollständig überdeckte Offsets
+   desselben Dokuments und nahezu identische Texte (Jaccard bzw. Enthaltensein
+   über Wort-Shingles ≥ RAG_DEDUP_THRESHOLD). Teilweise Überlappung
+   (Chunk-Overlap beim Ingest) wird aus dem schwächeren Chunk herausgeschnitten.
+2. Nach Score absteigend gierig packen. Der erste Chunk, der nicht mehr ganz
+   passt, wird an einer Satzgrenze gekürzt (sofern noch RAG_MIN_CHUNK_TOKENS
+   frei sind); alles Weitere entfällt.
+
+Budget: GENERATE_NUM_CTX − RAG_ANSWER_TOKENS − Persona/System/Frage, oder fest
+über RAG_CONTEXT_TOKENS. Tokens werden wie beim Chunking geschätzt.
+"""
+import os
+import re
+
+from . import embed
+from .chunking import estimate_tokens
+
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "0"))  # 0 = aus GENERATE_NUM_CTX ableiten
+RAG_ANSWER_TOKENS = int(os.getenv("RAG_ANSWER_TOKENS", "512"))
+RAG_MIN_CHUNK_TOKENS = int(os.getenv("RAG_MIN_CHUNK_TOKENS", "48"))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.85"))
+
+# "[chunk <uuid>] " + Absatz je Chunk im Prompt
+LABEL_TOKENS = 14
+SHINGLE = 3
+
+WORD_RE = re.compile(r"\w+")
+SENTENCE_END_RE = re.compile(r"[.!?…](?=\s)|\n")
+
+
+def budget(fixed_tokens: int) -> int:
+    """Token-Budget für den Kontext bei fixed_tokens für Persona, System-Prompt und Frage."""
+    if RAG_CONTEXT_TOKENS > 0:
+        return RAG_CONTEXT_TOKENS
+    return max(0, embed.GENERATE_NUM_CTX - RAG_ANSWER_TOKENS - fixed_tokens)
+
+
+def _shingles(text: str) -> set:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE:
+        return {" ".join(words)}
+    return {hash(tuple(words[i:i + SHINGLE])) for i in range(len(words) - SHINGLE + 1)}
+
+
+def _near_duplicate(a: set, b: set) -> bool:
+    inter = len(a & b)
+    if not inter:
+        return False
+    return (inter / len(a | b) >= RAG_DEDUP_THRESHOLD
+            or inter / min(len(a), len(b)) >= RAG_DEDUP_THRESHOLD)
+
+
+def _doc_key(payload: dict):
+    return payload.get("path") or (payload.get("source"), payload.get("filename"))
+
+
+def _trim(text: str, tokens: int) -> str:
+    """Kürzt text auf etwa tokens Tokens, möglichst an einer Satzgrenze."""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    ends = [m.end() for m in SENTENCE_END_RE.finditer(head)]
+    cut = ends[-1] if ends and ends[-1] > limit // 2 else (head.rfind(" ") if " " in head else limit)
+    return head[:cut].rstrip() + " …"
+
+
+def pack(hits, max_tokens: int) -> dict:
+    """
+    Wählt und kürzt die Hits für den Prompt. Liefert
+    {"hits", "texts", "tokens", "budget", "dropped", "trimmed"}; hits/texts in Score-Reihenfolge.
+    """
+    ranked = sorted(hits, key=lambda h: float(getattr(h, "score", 0.0) or 0.0), reverse=True)
+    kept, texts, dropped, trimmed = [], [], [], []
+    seen_ids, spans, sigs = set(), [], []
+    used = 0
+
+    def _drop(h, reason):
+        dropped.append({
+            "chunk_id": str(h.payload.get("chunk_id") or getattr(h, "id", "")),
+            "score": float(getattr(h, "score", 0.0) or 0.0),
+            "reason": reason,
+        })
+
+    for i, h in enumerate(ranked):
+        payload = h.payload or {}
+        text = payload.get("text") or ""
+        cid = str(payload.get("chunk_id") or getattr(h, "id", ""))
+        if not text.strip() or cid in seen_ids:
+            _drop(h, "duplicate")
+            continue
+
+        # Überlappung mit einem stärkeren Chunk desselben Dokuments herausschneiden
+        start, end = payload.get("start"), payload.get("end")
+        if isinstance(start, int) and isinstance(end, int) and len(text) == end - start:
+            key = _doc_key(payload)
+            covered = False
+            for k, s, e in spans:
+                if k != key or e <= start or s >= end:
+                    continue
+                if s <= start and e >= end:
+                    covered = True
+                    break
+                if s <= start:  # Anfang überdeckt
+                    text, start = text[e - start:], e
+                elif e >= end:  # Ende überdeckt
+                    text, end = text[:s - start], s
+            text = text.strip()
+            if covered or not text:
+                _drop(h, "duplicate")
+                continue
+            spans.append((key, start, end))
+        text = text.strip()
+
+        sig = _shingles(text)
+        if any(_near_duplicate(sig, other) for other in sigs):
+            _drop(h, "duplicate")
+            continue
+
+        cost = estimate_tokens(text) + LABEL_TOKENS
+        if used + cost > max_tokens:
+            free = max_tokens - used - LABEL_TOKENS
+            if free >= RAG_MIN_CHUNK_TOKENS:
+                text = _trim(text, free)
+                cost = estimate_tokens(text) + LABEL_TOKENS
+                trimmed.append(cid)
+            else:
+                for rest in ranked[i:]:
+                    _drop(rest, "budget")
+                break
+
+        seen_ids.add(cid)
+        sigs.append(sig)
+        kept.append(h)
+        texts.append((cid, text))
+        used += cost
+
+    return {"hits": kept, "texts": texts, "tokens": used, "budget": max_tokens,
+            "dropped": dropped, "trimmed": trimmed}
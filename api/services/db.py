@@ -1,9 +1,167 @@
-import os, psycopg
-def conn():
-    return psycopg.connect(
-        host=os.getenv("DB_HOST","db"),
-        port=os.getenv("DB_PORT","5432"),
-        user=os.getenv("DB_USER","postgres"),
-        password=os.getenv("DB_PASSWORD") or os.getenv("DB_PASS","postgres"),
-        dbname=os.getenv("DB_NAME","luna")
+"""
+🌙 Luna IEMS – Postgres-Verbindungen (psycopg_pool)
+
+Ein prozessweiter Sync- und ein Async-Pool werden beim API-Start geöffnet
+(api/main.py) und beim Shutdown geschlossen.
+
+- conn() liefert eine Pool-Verbindung; conn.close() gibt sie an den Pool
+  zurück (close_returns). Ohne geöffneten Pool (Skripte, Worker) wird wie
+  bisher direkt verbunden.
+- connection() / aconnection() sind die Context-Manager-Varianten.
+- SessionLocal ist die SQLAlchemy-Session-Factory für `models`; sie bezieht
+  ihre Verbindungen aus demselben Pool.
+- AsyncSessionLocal / get_session() sind das Async-Gegenstück (AsyncSession
+  auf dem Async-Pool); get_session ist die FastAPI-Dependency für eine
+  Session pro Request, die Abfragen liegen in repositories.py.
+- Häufige Statements werden pro Verbindung serverseitig vorbereitet
+  (prepare_threshold) und über die gepoolten Verbindungen wiederverwendet.
+"""
+import os
+from contextlib import contextmanager
+from typing import AsyncIterator
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+DB_POOL_CHECK = os.getenv("DB_POOL_CHECK", "1").lower() not in {"0", "false", "no", "off"}
+# Nach so vielen Ausführungen wird ein Statement auf der Verbindung vorbereitet (None = nie)
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "5")
+
+pool: ConnectionPool | None = None
+apool: AsyncConnectionPool | None = None
+
+
+def conninfo() -> str:
+    return make_conninfo(
+        host=os.getenv("DB_HOST", "db"),
+        port=os.getenv("DB_PORT", "5432"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD") or os.getenv("DB_PASS", "postgres"),
+        dbname=os.getenv("DB_NAME", "luna"),
     )
+
+
+def _connect_kwargs() -> dict:
+    threshold = DB_PREPARE_THRESHOLD.strip().lower()
+    return {"prepare_threshold": None if threshold in {"", "none", "off"} else int(threshold)}
+
+
+def _pool_options(cls) -> dict:
+    return {
+        "kwargs": _connect_kwargs(),
+        "min_size": DB_POOL_MIN,
+        "max_size": max(DB_POOL_MIN, DB_POOL_MAX),
+        "timeout": DB_POOL_TIMEOUT,
+        "max_idle": DB_POOL_MAX_IDLE,
+        "max_lifetime": DB_POOL_MAX_LIFETIME,
+        # Verbindung vor der Ausgabe prüfen (z. B. nach DB-Neustart)
+        "check": cls.check_connection if DB_POOL_CHECK else None,
+        "close_returns": True,
+        "open": False,
+    }
+
+
+# -------------------------------------------------------------
+# Pools öffnen / schließen
+# -------------------------------------------------------------
+def open_pool() -> ConnectionPool:
+    global pool
+    if pool is None:
+        pool = ConnectionPool(conninfo(), name="luna-sync", **_pool_options(ConnectionPool))
+        # wait=False: API startet auch, wenn Postgres noch hochfährt
+        pool.open(wait=False)
+    return pool
+
+
+async def aopen_pool() -> AsyncConnectionPool:
+    global apool
+    if apool is None:
+        apool = AsyncConnectionPool(conninfo(), name="luna-async", **_pool_options(AsyncConnectionPool))
+        await apool.open(wait=False)
+    return apool
+
+
+def close_pool():
+    global pool
+    if pool is not None:
+        pool.close()
+        pool = None
+
+
+async def aclose_pool():
+    global apool
+    if apool is not None:
+        await apool.close()
+        apool = None
+
+
+# -------------------------------------------------------------
+# Verbindungen
+# -------------------------------------------------------------
+def conn():
+    """Pool-Verbindung (close() gibt sie zurück) oder – ohne Pool – eine direkte Verbindung."""
+    if pool is not None:
+        return pool.getconn()
+    return psycopg.connect(conninfo(), **_connect_kwargs())
+
+
+@contextmanager
+def connection():
+    """Verbindung für einen with-Block; committet bei Erfolg, rollt bei Fehlern zurück."""
+    if pool is not None:
+        with pool.connection() as c:
+            yield c
+    else:
+        with psycopg.connect(conninfo(), **_connect_kwargs()) as c:
+            yield c
+
+
+def aconnection():
+    """Async-Gegenstück zu connection(); setzt einen geöffneten Async-Pool voraus."""
+    if apool is None:
+        raise RuntimeError("Async-DB-Pool ist nicht geöffnet (aopen_pool beim Start aufrufen).")
+    return apool.connection()
+
+
+# SQLAlchemy teilt sich den psycopg-Pool: NullPool ruft pro Checkout conn() auf,
+# das close() beim Checkin gibt die Verbindung an den psycopg-Pool zurück.
+engine = create_engine("postgresql+psycopg://", creator=conn, poolclass=NullPool)
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+
+async def _aconn():
+    """Async-Pool-Verbindung für SQLAlchemy; ohne Pool eine direkte Verbindung."""
+    if apool is not None:
+        return await apool.getconn()
+    return await psycopg.AsyncConnection.connect(conninfo(), **_connect_kwargs())
+
+
+aengine = create_async_engine("postgresql+psycopg://", async_creator=_aconn, poolclass=NullPool)
+AsyncSessionLocal = async_sessionmaker(bind=aengine, expire_on_commit=False)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI-Dependency: eine AsyncSession pro Request. Schreibende Handler
+    committen selbst; nicht committete Änderungen werden beim Schließen verworfen.
+    """
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def stats() -> dict:
+    return {
+        "sync": pool.get_stats() if pool is not None else None,
+        "async": apool.get_stats() if apool is not None else None,
+        "prepare_threshold": _connect_kwargs()["prepare_threshold"],
+    }
@@ -1,25 +1,45 @@
 import os, requests, json
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "ollama")
-OLLAMA_PORT = os.getenv("OLLAMA_PORT", "11434")
-OLLAMA_URL = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}"
-EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+from . import http_pool, embed_cache, embed_backends
+from .embed_backends import EmbeddingError
+OLLAMA_URL = embed_backends.OLLAMA_URL
+EMBED_MODEL = embed_backends.EMBED_MODEL
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "ollama")
 GENERATE_MODEL = os.getenv("GENERATE_MODEL", "llama3.1:8b-instruct")
+# Kontextfenster für generate (Ollama-Standard 2048); Grundlage des RAG-Kontextbudgets
+GENERATE_NUM_CTX = int(os.getenv("GENERATE_NUM_CTX", "2048"))
+
+# Embedding-Backend (ollama | local), siehe embed_backends.py
+backend = embed_backends.create(EMBED_BACKEND)
+
+# Embedding-Cache (RAM-LRU + SQLite unter CACHE_DIR), None wenn deaktiviert
+cache = embed_cache.open_cache(backend.model_id)
+
+def _split_cached(texts):
+    """Liefert (Ergebnisliste mit Cache-Treffern, eindeutige fehlende Texte)."""
+    if cache is None:
+        return [None] * len(texts), list(dict.fromkeys(texts))
+    out = cache.get_many(texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, out) if v is None))
+    return out, missing
+
+def _merge(texts, out, missing, vectors):
+    """Füllt die Cache-Lücken mit frisch berechneten Vektoren und cached diese."""
+    fresh = dict(zip(missing, vectors))
+    if cache is not None:
+        cache.put_many(missing, vectors)
+    return [v if v is not None else fresh[t] for t, v in zip(texts, out)]
 
 def embed_texts(texts):
-    # Prefer Ollama embeddings via HTTP
-    try:
-        r = requests.post(f"{OLLAMA_URL}/api/embeddings", json={"model": EMBED_MODEL, "input": texts}, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        # Ollama returns {"embeddings": [[...], [...], ...]}
-        return data.get("embeddings") or data.get("data")
-    except Exception as e:
-        # best-effort fallback
-        return [[0.0] * 384 for _ in texts]
+    """Embeddings für alle Texte; wirft EmbeddingError, wenn das Backend ausfällt."""
+    out, missing = _split_cached(texts)
+    if not missing:
+        return out
+    return _merge(texts, out, missing, backend.embed(missing))
 
 def generate(system_prompt: str, prompt: str) -> str:
     try:
-        payload = {"model": GENERATE_MODEL, "prompt": f"{system_prompt}\n\n{prompt}", "stream": True}
+        payload = {"model": GENERATE_MODEL, "prompt": f"{system_prompt}\n\n{prompt}", "stream": True,
+                   "options": {"num_ctx": GENERATE_NUM_CTX}}
         r = requests.post(f"{OLLAMA_URL}/api/generate", json=payload, timeout=600, stream=True)
         r.raise_for_status()
         out = ""
@@ -35,3 +55,44 @@ def generate(system_prompt: str, prompt: str) -> str:
         return out.strip()
     except Exception as e:
         return f"[Fehler bei Generate: {e}]"
+
+
+# -------------------------------------------------------------
+# Async-Varianten (gemeinsamer httpx-Pool, blockieren den Event-Loop nicht)
+# -------------------------------------------------------------
+async def aembed_texts(texts):
+    """Async-Variante von embed_texts."""
+    out, missing = _split_cached(texts)
+    if not missing:
+        return out
+    return _merge(texts, out, missing, await backend.aembed(missing))
+
+async def agenerate_stream(system_prompt: str, prompt: str):
+    """Liefert die Antwort-Tokens von Ollama, sobald sie eintreffen."""
+    payload = {"model": GENERATE_MODEL, "prompt": f"{system_prompt}\n\n{prompt}", "stream": True,
+               "options": {"num_ctx": GENERATE_NUM_CTX}}
+    async with http_pool.get_client().stream("POST", f"{OLLAMA_URL}/api/generate", json=payload, timeout=600) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            try:
+                j = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if j.get("response"):
+                yield j["response"]
+            if j.get("done"):
+                return
+
+async def agenerate(system_prompt: str, prompt: str, strict: bool = False) -> str:
+    """strict=True reicht Fehler weiter, statt sie als Antworttext zu liefern (Status je Frage in ask_batch)."""
+    try:
+        out = ""
+        async for token in agenerate_stream(system_prompt, prompt):
+            out += token
+        return out.strip()
+    except Exception as e:
+        if strict:
+            raise
+        return f"[Fehler bei Generate: {e}]"
@@ -0,0 +1,167 @@
+"""
+🌙 Luna IEMS – Embedding-Backends
+
+Auswahl über EMBED_BACKEND:
+- "ollama": HTTP gegen Ollama (/api/embed), Modell EMBED_MODEL
+- "local":  sentence-transformers im Prozess (CPU), Modell LOCAL_EMBED_MODEL
+
+Fehler werden als EmbeddingError gemeldet – es gibt bewusst keinen
+Null-Vektor-Fallback mehr, da dieser den Index vergiftet.
+"""
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import http_pool
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "ollama")
+OLLAMA_PORT = os.getenv("OLLAMA_PORT", "11434")
+# OLLAMA_HOST darf bereits eine vollständige URL sein (siehe .env)
+OLLAMA_URL = OLLAMA_HOST if OLLAMA_HOST.startswith("http") else f"http://{OLLAMA_HOST}:{OLLAMA_PORT}"
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBED_DEVICE = os.getenv("LOCAL_EMBED_DEVICE", "cpu")
+LOCAL_EMBED_BATCH = int(os.getenv("LOCAL_EMBED_BATCH", "64"))
+LOCAL_EMBED_MAX_WAIT_MS = float(os.getenv("LOCAL_EMBED_MAX_WAIT_MS", "5"))
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "2"))
+
+
+class EmbeddingError(RuntimeError):
+    """Das Embedding-Backend konnte keine (vollständigen) Vektoren liefern."""
+
+
+# -------------------------------------------------------------
+# Ollama (HTTP)
+# -------------------------------------------------------------
+class OllamaBackend:
+    name = "ollama"
+
+    def __init__(self, model: str = EMBED_MODEL, url: str = OLLAMA_URL):
+        self.model = model
+        self.url = f"{url}/api/embed"
+        self.model_id = f"ollama:{model}"
+        self._session = requests.Session()
+
+    def _parse(self, data: dict, n: int):
+        # Ollama returns {"embeddings": [[...], [...], ...]}
+        vectors = data.get("embeddings") or data.get("data")
+        if not vectors or len(vectors) != n:
+            raise EmbeddingError(f"Ollama lieferte {len(vectors or [])} statt {n} Embeddings.")
+        return vectors
+
+    def embed(self, texts):
+        try:
+            r = self._session.post(self.url, json={"model": self.model, "input": texts}, timeout=120)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            raise EmbeddingError(f"Ollama-Embedding fehlgeschlagen: {e}") from e
+        return self._parse(r.json(), len(texts))
+
+    async def aembed(self, texts):
+        try:
+            r = await http_pool.get_client().post(self.url, json={"model": self.model, "input": texts}, timeout=120)
+            r.raise_for_status()
+        except Exception as e:
+            raise EmbeddingError(f"Ollama-Embedding fehlgeschlagen: {e}") from e
+        return self._parse(r.json(), len(texts))
+
+
+# -------------------------------------------------------------
+# Lokal (sentence-transformers, CPU)
+# -------------------------------------------------------------
+class LocalBackend:
+    """
+    Lädt das Modell beim ersten Aufruf. Async-Aufrufe werden für bis zu
+    LOCAL_EMBED_MAX_WAIT_MS gesammelt und gemeinsam (dynamisches Batching)
+    im Thread-Pool berechnet, damit der Event-Loop frei bleibt.
+    """
+    name = "local"
+
+    def __init__(self, model: str = LOCAL_EMBED_MODEL, device: str = LOCAL_EMBED_DEVICE):
+        self.model = model
+        self.device = device
+        self.model_id = f"local:{model}"
+        self._st = None
+        self._load_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max(1, LOCAL_EMBED_THREADS), thread_name_prefix="embed-local")
+        self._queue: list = []
+        self._flush_handle = None
+
+    def _load(self):
+        if self._st is None:
+            with self._load_lock:
+                if self._st is None:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                    except ImportError as e:
+                        raise EmbeddingError("EMBED_BACKEND=local benötigt 'sentence-transformers'.") from e
+                    print(f"🧠 Lade lokales Embedding-Modell '{self.model}' ({self.device}) …")
+                    self._st = SentenceTransformer(self.model, device=self.device)
+        return self._st
+
+    def tokenizer(self):
+        """Tokenizer des Modells (z. B. für token-genaues Chunking)."""
+        return self._load().tokenizer
+
+    def embed(self, texts):
+        if not texts:
+            return []
+        try:
+            vectors = self._load().encode(
+                list(texts), batch_size=LOCAL_EMBED_BATCH, normalize_embeddings=True,
+                convert_to_numpy=True, show_progress_bar=False,
+            )
+        except EmbeddingError:
+            raise
+        except Exception as e:
+            raise EmbeddingError(f"Lokales Embedding fehlgeschlagen: {e}") from e
+        return vectors.tolist()
+
+    async def aembed(self, texts):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.append((list(texts), fut))
+        if sum(len(t) for t, _ in self._queue) >= LOCAL_EMBED_BATCH:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(LOCAL_EMBED_MAX_WAIT_MS / 1000, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        queue, self._queue = self._queue, []
+        if not queue:
+            return
+        loop = asyncio.get_running_loop()
+        texts = [t for batch, _ in queue for t in batch]
+        job = loop.run_in_executor(self._pool, self.embed, texts)
+
+        def _done(job):
+            exc = job.exception()
+            offset = 0
+            for batch, fut in queue:
+                start, offset = offset, offset + len(batch)
+                if fut.done():
+                    continue
+                if exc is not None:
+                    fut.set_exception(exc)
+                else:
+                    fut.set_result(job.result()[start:offset])
+
+        job.add_done_callback(_done)
+
+
+BACKENDS = {"ollama": OllamaBackend, "local": LocalBackend}
+
+
+def create(name: str):
+    try:
+        return BACKENDS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unbekanntes EMBED_BACKEND '{name}' (erlaubt: {', '.join(BACKENDS)})")
@@ -0,0 +1,183 @@
+"""
+🌙 Luna IEMS – Embedding-Cache
+Content-adressierter Cache für Embeddings, Schlüssel = (EMBED_MODEL, sha256(text)).
+
+Zwei Stufen:
+1. In-Process-LRU (OrderedDict, begrenzt auf EMBED_CACHE_MEM_ITEMS Einträge)
+2. Persistente SQLite-Datei unter CACHE_DIR, begrenzt auf EMBED_CACHE_MAX_MB
+
+Wechselt das Embedding-Modell, wird der persistente Teil beim Öffnen geleert.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from pathlib import Path
+from collections import OrderedDict
+
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "/tmp/luna-cache"))
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1").lower() not in {"0", "false", "no", "off"}
+EMBED_CACHE_MEM_ITEMS = int(os.getenv("EMBED_CACHE_MEM_ITEMS", "20000"))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+
+
+def _sha256(b: bytes) -> str:
+    return hashlib.sha256(b).hexdigest()
+
+
+class EmbeddingCache:
+    """Zweistufiger LRU-Cache (RAM + SQLite) für Embedding-Vektoren."""
+
+    def __init__(self, model: str, path: Path | None = None,
+                 mem_items: int = EMBED_CACHE_MEM_ITEMS, max_mb: int = EMBED_CACHE_MAX_MB):
+        self.model = model
+        self.mem_items = mem_items
+        self.max_bytes = max_mb * 1024 * 1024
+        self._mem: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts_since_evict = 0
+        self.hits_mem = self.hits_disk = self.misses = self.evictions = 0
+
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " key TEXT PRIMARY KEY, vec BLOB NOT NULL, size INTEGER NOT NULL, atime REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_atime ON embeddings(atime)")
+                self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+                self._check_model()
+            except Exception as e:
+                print(f"⚠️ Persistenter Embedding-Cache nicht verfügbar ({path}): {e}")
+                self._db = None
+
+    # ---------------------------------------------------------
+    # Interna
+    # ---------------------------------------------------------
+    def _check_model(self):
+        """Leert den persistenten Cache, wenn sich das Embedding-Modell geändert hat."""
+        row = self._db.execute("SELECT v FROM meta WHERE k = 'model'").fetchone()
+        if row and row[0] != self.model:
+            print(f"♻️ Embedding-Modell gewechselt ({row[0]} → {self.model}) – Cache wird geleert.")
+            self._db.execute("DELETE FROM embeddings")
+            self._db.execute("VACUUM")
+        self._db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('model', ?)", (self.model,))
+
+    def key(self, text: str) -> str:
+        return f"{self.model}:{_sha256(text.encode('utf-8'))}"
+
+    def _mem_put(self, key: str, vec: list):
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    def _evict_disk(self):
+        """Entfernt die am längsten nicht genutzten Einträge, bis das Größenlimit passt."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Auf 90 % des Limits zurückschneiden, damit nicht bei jedem Put evicted wird
+        target = total - int(self.max_bytes * 0.9)
+        freed, doomed = 0, []
+        for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY atime"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    # ---------------------------------------------------------
+    # Öffentliche API
+    # ---------------------------------------------------------
+    def get_many(self, texts) -> list:
+        """Liefert pro Text den gecachten Vektor oder None."""
+        keys = [self.key(t) for t in texts]
+        out = [None] * len(keys)
+        disk_lookup = []
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._mem.get(k)
+                if vec is not None:
+                    self._mem.move_to_end(k)
+                    out[i] = vec
+                    self.hits_mem += 1
+                else:
+                    disk_lookup.append(i)
+
+            if disk_lookup and self._db is not None:
+                wanted = {keys[i] for i in disk_lookup}
+                found = {}
+                wanted_list = list(wanted)
+                for start in range(0, len(wanted_list), 500):
+                    part = wanted_list[start:start + 500]
+                    q = f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})"
+                    for k, blob in self._db.execute(q, part):
+                        found[k] = array("f", blob).tolist()
+                if found:
+                    now = time.time()
+                    self._db.executemany("UPDATE embeddings SET atime = ? WHERE key = ?",
+                                         [(now, k) for k in found])
+                for i in disk_lookup:
+                    vec = found.get(keys[i])
+                    if vec is not None:
+                        self._mem_put(keys[i], vec)
+                        out[i] = vec
+                        self.hits_disk += 1
+                    else:
+                        self.misses += 1
+            else:
+                self.misses += len(disk_lookup)
+        return out
+
+    def put_many(self, texts, vectors):
+        """Legt Vektoren in beiden Stufen ab."""
+        rows = []
+        now = time.time()
+        with self._lock:
+            for t, v in zip(texts, vectors):
+                if v is None or len(v) == 0:
+                    continue
+                k = self.key(t)
+                self._mem_put(k, list(v))
+                blob = array("f", v).tobytes()
+                rows.append((k, blob, len(blob), now))
+            if rows and self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vec, size, atime) VALUES (?, ?, ?, ?)", rows
+                )
+                self._puts_since_evict += len(rows)
+                if self._puts_since_evict >= 1000:
+                    self._puts_since_evict = 0
+                    self._evict_disk()
+
+    def stats(self) -> dict:
+        lookups = self.hits_mem + self.hits_disk + self.misses
+        with self._lock:
+            disk_items = (self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                          if self._db is not None else 0)
+        return {
+            "model": self.model,
+            "mem_items": len(self._mem),
+            "disk_items": disk_items,
+            "hits_mem": self.hits_mem,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits_mem + self.hits_disk) / lookups, 3) if lookups else None,
+        }
+
+
+def open_cache(model: str) -> EmbeddingCache | None:
+    """Erzeugt den Cache gemäß Konfiguration (None, wenn deaktiviert)."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    return EmbeddingCache(model, path=CACHE_DIR / "embeddings.sqlite3")
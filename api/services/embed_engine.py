@@ -0,0 +1,152 @@
+"""
+🌙 Luna IEMS – Paralleles Embedding-Engine (Producer/Consumer)
+
+Dateien lesen & chunken (Thread-Pool) → Token-budgetierte Batches →
+N parallele Embedding-Requests → Upserts in festen Batches.
+
+Jede Stufe hat ein begrenztes Fenster an offenen Aufträgen (Backpressure),
+d. h. der Speicherbedarf bleibt unabhängig von der Korpusgröße konstant.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import embed
+
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8192"))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+READ_WORKERS = int(os.getenv("READ_WORKERS", "4"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (~4 Zeichen pro Token)."""
+    return len(text) // 4 + 1
+
+
+def _bounded_map(pool, fn, items, window: int):
+    """Wie pool.map, aber mit höchstens `window` offenen Aufträgen (Reihenfolge bleibt erhalten)."""
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= window:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+
+class EmbeddingEngine:
+    """
+    Producer/Consumer-Pipeline für große Korpora.
+
+    load(source) -> Liste von (point_id, text, payload)
+    upsert(points) mit points = Liste von (point_id, vector, payload)
+    on_error(sources, exc) wird für fehlgeschlagene Quellen aufgerufen.
+    """
+
+    def __init__(self, concurrency: int = EMBED_CONCURRENCY, batch_tokens: int = EMBED_BATCH_TOKENS,
+                 batch_max_items: int = EMBED_BATCH_MAX_ITEMS, upsert_batch: int = UPSERT_BATCH_SIZE,
+                 read_workers: int = READ_WORKERS, embed_fn=None):
+        self.concurrency = max(1, concurrency)
+        self.batch_tokens = batch_tokens
+        self.batch_max_items = batch_max_items
+        self.upsert_batch = upsert_batch
+        self.read_workers = max(1, read_workers)
+        self.embed_fn = embed_fn or embed.embed_texts
+
+    def _embed_batch(self, batch):
+        vectors = self.embed_fn([text for _, _, text, _ in batch])
+        if not vectors or len(vectors) != len(batch) or not any(vectors[0]):
+            raise RuntimeError("Embedding-Backend lieferte keine gültigen Vektoren.")
+        return vectors
+
+    def _batches(self, chunks):
+        """Gruppiert (source, point_id, text, payload) in Token-budgetierte Batches."""
+        batch, tokens = [], 0
+        for item in chunks:
+            t = estimate_tokens(item[2])
+            if batch and (tokens + t > self.batch_tokens or len(batch) >= self.batch_max_items):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(item)
+            tokens += t
+        if batch:
+            yield batch
+
+    def run(self, sources, load, upsert, on_error=None) -> dict:
+        stats = {"sources": 0, "chunks": 0, "batches": 0, "points": 0, "failed_sources": 0}
+        t_start = time.perf_counter()
+        failed = set()
+
+        def _fail(srcs, exc):
+            new = set(srcs) - failed
+            failed.update(new)
+            stats["failed_sources"] += len(new)
+            if on_error and new:
+                on_error(sorted(new, key=str), exc)
+
+        def _chunks():
+            for src, fut in _bounded_map(read_pool, load, sources, self.read_workers * 2):
+                try:
+                    items = fut.result()
+                except Exception as e:
+                    _fail([src], e)
+                    continue
+                stats["sources"] += 1
+                for pid, text, payload in items:
+                    yield src, pid, text, payload
+
+        buffer, upserts, embeds = [], deque(), {}
+
+        def _flush(points):
+            # Backpressure: höchstens 2 Upserts gleichzeitig
+            while len(upserts) >= 2:
+                upserts.popleft().result()
+            upserts.append(upsert_pool.submit(upsert, points))
+            stats["points"] += len(points)
+
+        def _collect(done):
+            for fut in done:
+                batch = embeds.pop(fut)
+                try:
+                    vectors = fut.result()
+                except Exception as e:
+                    _fail({src for src, *_ in batch}, e)
+                    continue
+                buffer.extend(
+                    (pid, vec, payload)
+                    for (src, pid, _, payload), vec in zip(batch, vectors)
+                    if src not in failed
+                )
+                while len(buffer) >= self.upsert_batch:
+                    _flush(buffer[:self.upsert_batch])
+                    del buffer[:self.upsert_batch]
+
+        with ThreadPoolExecutor(self.read_workers, thread_name_prefix="engine-read") as read_pool, \
+             ThreadPoolExecutor(self.concurrency, thread_name_prefix="engine-embed") as embed_pool, \
+             ThreadPoolExecutor(2, thread_name_prefix="engine-upsert") as upsert_pool:
+
+            for batch in self._batches(_chunks()):
+                # Backpressure: höchstens 2 × concurrency Batches offen
+                while len(embeds) >= self.concurrency * 2:
+                    done, _ = wait(embeds, return_when=FIRST_COMPLETED)
+                    _collect(done)
+                embeds[embed_pool.submit(self._embed_batch, batch)] = batch
+                stats["batches"] += 1
+                stats["chunks"] += len(batch)
+
+            while embeds:
+                done, _ = wait(embeds, return_when=FIRST_COMPLETED)
+                _collect(done)
+            if buffer:
+                _flush(list(buffer))
+                buffer.clear()
+            while upserts:
+                upserts.popleft().result()
+
+        elapsed = time.perf_counter() - t_start
+        stats["seconds"] = round(elapsed, 3)
+        stats["chunks_per_s"] = round(stats["chunks"] / elapsed, 1) if elapsed > 0 else None
+        return stats
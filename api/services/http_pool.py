@@ -0,0 +1,34 @@
+"""
+Gemeinsamer, gepoolter HTTP-Client für alle asynchronen Service-Aufrufe
+(Tika, Ollama). Wird lazy im laufenden Event-Loop erzeugt und beim
+Shutdown der API geschlossen.
+"""
+import os
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Liefert den prozessweiten AsyncClient (Connection-Pool, Keep-Alive)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+    return _client
+
+
+async def aclose():
+    """Schließt den Pool (FastAPI-Shutdown)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,142 @@
+"""
+🌙 Luna IEMS – Streaming Ingest Pipeline
+Datei → Tika (Stream) → Chunks (chunking.py) → Embeddings (Batches) → Qdrant (Pipelined Upserts).
+
+Der Text wird nie vollständig im Speicher gehalten: es liegen höchstens ein
+Embedding-Batch plus `UPSERT_INFLIGHT` Upsert-Batches gleichzeitig im RAM.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+
+from . import tika, embed, qdrant, chunking, answer_cache
+
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH", "32"))
+UPSERT_INFLIGHT = int(os.getenv("INGEST_UPSERT_INFLIGHT", "2"))
+
+
+class _Stage:
+    """Zeit- und Mengenzähler für eine Pipeline-Stufe."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.items = 0
+
+    def report(self, unit: str) -> dict:
+        rate = self.items / self.seconds if self.seconds > 0 else None
+        return {
+            unit: self.items,
+            "seconds": round(self.seconds, 3),
+            f"{unit}_per_s": round(rate, 1) if rate else None,
+        }
+
+
+async def _timed(gen, stage: _Stage, measure=len):
+    """Misst die Zeit, die ein async Generator zum Liefern seiner Elemente benötigt."""
+    it = gen.__aiter__()
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = await it.__anext__()
+        except StopAsyncIteration:
+            stage.seconds += time.perf_counter() - t0
+            return
+        stage.seconds += time.perf_counter() - t0
+        stage.items += measure(item)
+        yield item
+
+
+async def _batches(chunks, size: int):
+    batch = []
+    async for c in chunks:
+        batch.append(c)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _read_upload(fileobj, size: int = 1 << 16):
+    """Liest ein (async) UploadFile stückweise, ohne es komplett zu puffern."""
+    while True:
+        data = await fileobj.read(size)
+        if not data:
+            return
+        yield data
+
+
+async def ingest_stream(fileobj, filename: str, source: str = "upload", tags=None, tenant: str | None = None) -> dict:
+    """
+    Streamt eine Datei (UploadFile o. ä. mit async read) durch die komplette Ingest-Pipeline.
+    source, tags, tenant, Dateityp und Ingest-Zeitpunkt landen in der Payload (filterbar, siehe qdrant.build_filter).
+    Liefert Kennzahlen pro Stufe (extract, embed, upsert) zurück.
+    """
+    t_start = time.perf_counter()
+    extract, chunk_stage, embedding, upserting = _Stage(), _Stage(), _Stage(), _Stage()
+
+    pieces = _timed(tika.aextract_text_stream(_read_upload(fileobj), filename), extract)
+    # Stabile Chunk-IDs je (source, filename): erneuter Upload überschreibt unveränderte Chunks
+    chunks = _timed(chunking.aiter_chunks(pieces, doc_id=f"{source}:{filename}"), chunk_stage, measure=lambda _: 1)
+
+    async def _upsert(texts, vectors, payloads, ids):
+        t0 = time.perf_counter()
+        await qdrant.aupsert_vectors(texts, vectors, payloads, ids=ids)
+        return time.perf_counter() - t0, len(vectors)
+
+    meta = qdrant.doc_meta(filename, source, tags, tenant)
+    pending = deque()
+    collection_ready = False
+    chunk_index = 0
+
+    try:
+        async for batch in _batches(chunks, EMBED_BATCH_SIZE):
+            t0 = time.perf_counter()
+            texts = [c["text"] for c in batch]
+            vectors = await embed.aembed_texts(texts)
+            embedding.seconds += time.perf_counter() - t0
+            if not vectors or len(vectors) != len(batch) or vectors[0] is None:
+                raise RuntimeError("Fehler beim Erzeugen der Embeddings.")
+            embedding.items += len(vectors)
+
+            if not collection_ready:
+                await qdrant.aensure_collection(dim=len(vectors[0]))
+                collection_ready = True
+
+            payloads = [{**chunking.payload(c), **meta} for c in batch]
+            chunk_index += len(batch)
+
+            # Backpressure: höchstens UPSERT_INFLIGHT Upserts gleichzeitig
+            while len(pending) >= max(1, UPSERT_INFLIGHT):
+                secs, n = await pending.popleft()
+                upserting.seconds += secs
+                upserting.items += n
+            pending.append(asyncio.create_task(_upsert(texts, vectors, payloads, [c["id"] for c in batch])))
+
+        while pending:
+            secs, n = await pending.popleft()
+            upserting.seconds += secs
+            upserting.items += n
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if chunk_index:
+        answer_cache.bump_collection_version()
+
+    # Chunk-Zeit enthält das Warten auf Tika → herausrechnen
+    chunk_stage.seconds = max(0.0, chunk_stage.seconds - extract.seconds)
+
+    return {
+        "filename": filename,
+        "chunks": chunk_index,
+        "length": extract.items,
+        "stages": {
+            "extract": extract.report("chars"),
+            "chunk": chunk_stage.report("chunks"),
+            "embed": embedding.report("chunks"),
+            "upsert": upserting.report("points"),
+        },
+        "total_seconds": round(time.perf_counter() - t_start, 3),
+    }
@@ -0,0 +1,208 @@
+"""
+🌙 Luna IEMS – Marktpreise (Day-Ahead, Intraday) und Kostenberechnung
+
+- Bulk-Load von CSV/NDJSON-Preisdateien per COPY in eine Staging-Tabelle,
+  danach Upsert nach market_prices (neu veröffentlichte Preise überschreiben).
+- Kosten je Intervall: Verbrauchsmatrix (Geräte × Intervalle) aus den
+  Readings-Rollups × Preisvektor, vektorisiert mit NumPy.
+
+Reading.value wird als mittlere Leistung in kW interpretiert (wie
+consumption_kw im Simulator), Preise in €/MWh.
+"""
+import os
+import csv
+import json
+import math
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from . import db, rollups
+from .readings import ReadingParser
+
+MARKET_COPY_BATCH = int(os.getenv("MARKET_COPY_BATCH", "50000"))
+# Ein Preis gilt bis zum nächsten, höchstens aber so lange
+MARKET_PRICE_MAX_GAP = timedelta(hours=int(os.getenv("MARKET_PRICE_MAX_GAP_H", "24")))
+EPOCH = datetime(1970, 1, 1)
+
+STAGE_SQL = "CREATE TEMP TABLE IF NOT EXISTS market_prices_stage (LIKE market_prices) ON COMMIT DELETE ROWS"
+COPY_SQL = "COPY market_prices_stage (market, ts, price_eur_mwh) FROM STDIN"
+MERGE_SQL = """
+    INSERT INTO market_prices (market, ts, price_eur_mwh)
+    SELECT DISTINCT ON (market, ts) market, ts, price_eur_mwh FROM market_prices_stage
+    ORDER BY market, ts
+    ON CONFLICT (market, ts) DO UPDATE SET price_eur_mwh = EXCLUDED.price_eur_mwh
+"""
+PRICES_SQL = """
+    SELECT string_agg(float8send(extract(epoch FROM ts)::float8), '' ORDER BY ts),
+           string_agg(float8send(price_eur_mwh), '' ORDER BY ts)
+    FROM market_prices
+    WHERE market = %s AND ts >= %s AND ts < %s
+"""
+
+
+class PriceParser(ReadingParser):
+    """NDJSON/CSV-Parser für Preise: market, ts (oder timestamp), price_eur_mwh (oder price)."""
+
+    def __init__(self, fmt: str):
+        super().__init__(fmt)
+        self.years = set()
+
+    def _record(self, line: str):
+        if self.fmt == "csv":
+            fields = next(csv.reader([line]))
+            if self._header is None:
+                self._header = {name.strip(): i for i, name in enumerate(fields)}
+                h = self._header
+                missing = [name for name, alts in (("market", ()), ("ts", ("timestamp",)),
+                                                   ("price_eur_mwh", ("price",)))
+                           if name not in h and not any(a in h for a in alts)]
+                if missing:
+                    raise ValueError(f"CSV-Header unvollständig, fehlt: {', '.join(missing)}")
+                return None
+            h = self._header
+            ts_col = h.get("ts", h.get("timestamp"))
+            price_col = h.get("price_eur_mwh", h.get("price"))
+            return fields[h["market"]], fields[ts_col], fields[price_col]
+        obj = json.loads(line)
+        price = obj.get("price_eur_mwh")
+        return obj.get("market"), obj.get("ts") or obj.get("timestamp"), price if price is not None else obj.get("price")
+
+    def _validate(self, line: str):
+        rec = self._fields(line)
+        if rec is None:
+            return None
+        market, ts, price = rec
+        market = str(market or "").strip()
+        if not market or len(market) > 64:
+            self._reject("Ungültiger Markt")
+            return None
+        try:
+            parsed = datetime.fromisoformat(str(ts).strip()).replace(tzinfo=None)
+            price = float(price)
+        except (TypeError, ValueError) as e:
+            self._reject(f"Ungültiger Wert: {e}")
+            return None
+        if not math.isfinite(price):
+            self._reject("Preis ist nicht endlich")
+            return None
+        self.years.add(parsed.year)
+        return market, parsed, price
+
+
+def load_batch(conn, rows, years) -> int:
+    """COPY in die Staging-Tabelle, fehlende Jahrespartitionen anlegen, Upsert, Commit."""
+    with conn.cursor() as cur:
+        cur.execute(STAGE_SQL)
+        for year in sorted(years):
+            cur.execute("SELECT market_prices_create_partition(%s)", (date(year, 1, 1),))
+        with cur.copy(COPY_SQL) as copy:
+            for row in rows:
+                copy.write_row(row)
+        cur.execute(MERGE_SQL)
+        count = cur.rowcount
+    conn.commit()
+    return count
+
+
+async def bulk_load(chunks, fmt: str = "ndjson", batch_size: int = MARKET_COPY_BATCH) -> dict:
+    """Lädt einen async Byte-Stream mit Preisen; Duplikate (market, ts) werden überschrieben."""
+    t0 = time.perf_counter()
+    parser = PriceParser(fmt)
+    stored = 0
+    batch = []
+    conn = await run_in_threadpool(db.conn)
+    try:
+        async for data in chunks:
+            for row in await run_in_threadpool(parser.parse, data):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    stored += await run_in_threadpool(load_batch, conn, batch, set(parser.years))
+                    batch = []
+        batch.extend(parser.flush())
+        if batch:
+            stored += await run_in_threadpool(load_batch, conn, batch, set(parser.years))
+    finally:
+        await run_in_threadpool(conn.close)
+    return {
+        "stored": stored,
+        "rejected": parser.rejected,
+        "errors": parser.errors,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+# -------------------------------------------------------------
+# Abfragen
+# -------------------------------------------------------------
+def prices(conn, market: str, start: datetime, end: datetime):
+    """Preise eines Markts als (epoch-Sekunden, €/MWh)-Arrays, zeitlich sortiert."""
+    with conn.cursor(binary=True) as cur:
+        cur.execute(PRICES_SQL, (market, start, end))
+        t_raw, p_raw = cur.fetchone()
+    if not t_raw:
+        return np.empty(0), np.empty(0)
+    return np.frombuffer(t_raw, dtype=">f8").astype(np.float64), np.frombuffer(p_raw, dtype=">f8").astype(np.float64)
+
+
+def price_grid(conn, market: str, start: datetime, intervals: int, width: timedelta) -> np.ndarray:
+    """Preis je Intervall (Intervallbeginn), vorwärts aufgefüllt bis MARKET_PRICE_MAX_GAP; sonst NaN."""
+    end = start + width * intervals
+    t, p = prices(conn, market, start - MARKET_PRICE_MAX_GAP, end)
+    grid = (start - EPOCH).total_seconds() + np.arange(intervals) * width.total_seconds()
+    out = np.full(intervals, np.nan)
+    if len(t):
+        idx = np.searchsorted(t, grid, side="right") - 1
+        valid = (idx >= 0) & (grid - t[np.maximum(idx, 0)] < MARKET_PRICE_MAX_GAP.total_seconds())
+        out[valid] = p[idx[valid]]
+    return out
+
+
+def cost(conn, market: str, device_ids, start: datetime, end: datetime,
+         resolution: str = "15m", per_device: bool = False) -> dict:
+    """Energie (kWh) und Kosten (€) je Intervall über alle Geräte, plus Summen je Gerät."""
+    if resolution not in ("15m", "1h"):
+        raise ValueError("Kosten gibt es nur in 15m- oder 1h-Auflösung")
+    width, _ = rollups.RESOLUTIONS[resolution]
+    # auf Intervallgrenzen ausrichten (Rollup-Buckets liegen auf vollen 15 min/Stunden)
+    offset = (start - EPOCH).total_seconds() % width.total_seconds()
+    start = start - timedelta(seconds=offset)
+    intervals = int(math.ceil((end - start) / width))
+    ids = np.unique(np.asarray(device_ids, dtype=np.int64))
+
+    load_kw = rollups.load_matrix(conn, ids, start, intervals, resolution)
+    price = price_grid(conn, market, start, intervals, width)
+    kwh = load_kw * (width.total_seconds() / 3600)
+    eur = kwh * (price / 1000.0)[None, :]
+
+    t_ms = ((start - EPOCH).total_seconds() + np.arange(intervals) * width.total_seconds()) * 1000
+    result = {
+        "market": market,
+        "resolution": resolution,
+        "devices": len(ids),
+        "intervals": intervals,
+        "t": t_ms.astype(np.int64).tolist(),
+        "price_eur_mwh": _nan_to_none(price),
+        "kwh": _nan_to_none(np.nansum(kwh, axis=0), mask=np.isnan(kwh).all(axis=0)),
+        "cost_eur": _nan_to_none(np.nansum(eur, axis=0), mask=np.isnan(eur).all(axis=0)),
+        "total_kwh": round(float(np.nansum(kwh)), 4),
+        "total_cost_eur": round(float(np.nansum(eur)), 4),
+        "device_totals": {
+            int(d): {"kwh": round(float(k), 4), "cost_eur": round(float(c), 4)}
+            for d, k, c in zip(ids, np.nansum(kwh, axis=1), np.nansum(eur, axis=1))
+        },
+    }
+    if per_device:
+        result["device_cost_eur"] = {int(d): _nan_to_none(row) for d, row in zip(ids, eur)}
+    return result
+
+
+def _nan_to_none(arr, mask=None) -> list:
+    """JSON kennt kein NaN → fehlende Werte als null."""
+    arr = np.asarray(arr, dtype=np.float64).round(6)
+    missing = np.isnan(arr) if mask is None else (mask | np.isnan(arr))
+    out = arr.astype(object)
+    out[missing] = None
+    return out.tolist()
@@ -1,124 +1,659 @@
 import os
+import time
 import uuid
-from qdrant_client import QdrantClient, models as qm
+import asyncio
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 
-__all__ = ["client", "ensure_collection", "upsert_vectors", "search", "qm"]
+import grpc
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient, models as qm
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+from . import sparse
+
+__all__ = [
+    "get_client", "get_async_client", "ensure_collection", "upsert_vectors", "upsert_points",
+    "search", "search_batch", "search_hybrid_batch", "search_params", "has_sparse", "make_point", "doc_meta",
+    "build_filter", "profile", "create_collection", "update_profile", "resolve_collection", "switch_alias", "scroll", "delete_points", "delete_by_payload", "close", "qm",
+    "aensure_collection", "aupsert_vectors", "aupsert_points", "asearch", "asearch_batch",
+    "asearch_hybrid_batch", "ahas_sparse", "aclose",
+]
 
 # === Qdrant Konfiguration ===
 COLL = os.getenv("QDRANT_COLLECTION", "luna_chunks")
 QDRANT_HOST = os.getenv("QDRANT_HOST", "qdrant")
 QDRANT_HTTP = int(os.getenv("QDRANT_HTTP", "6333"))
+QDRANT_GRPC = int(os.getenv("QDRANT_GRPC", "6334"))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "1").lower() in {"1", "true", "yes", "on"}
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "30"))
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "32"))
+QDRANT_UPSERT_BATCH = int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_UPSERT_PARALLEL = int(os.getenv("QDRANT_UPSERT_PARALLEL", "2"))
+QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", "3"))
+QDRANT_BACKOFF = float(os.getenv("QDRANT_BACKOFF", "0.5"))
+# Hybride Suche: BM25-Sparse-Vektor neben dem (unbenannten) Dense-Vektor, siehe sparse.py
+QDRANT_HYBRID = os.getenv("QDRANT_HYBRID", "1").lower() in {"1", "true", "yes", "on"}
+SPARSE_VECTOR = os.getenv("QDRANT_SPARSE_VECTOR", "bm25")
+
+# Speicherprofil neuer Collections (siehe PROFILES), optional einzeln überschrieben
+QDRANT_PROFILE = os.getenv("QDRANT_PROFILE", "default")
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "0"))  # 0 = Wert des Profils
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "0"))
+# Suchzeit: hnsw_ef (0 = Qdrant-Standard), Rescoring quantisierter Treffer mit den Originalvektoren
+QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", "0"))
+QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "1").lower() in {"1", "true", "yes", "on"}
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+
+# Collection-Profile. RAM je Vektor (dim d, ohne HNSW-Graph): default 4·d Bytes,
+# scalar d (int8, 4×), product d/4 (x16 gegenüber float32), binary d/8 (32×).
+# Originalvektoren liegen bei den quantisierten Profilen auf Disk und dienen nur dem Rescoring.
+PROFILES = {
+    "default": {"quantization": None, "on_disk": False, "m": 16, "ef_construct": 100},
+    "scalar": {"quantization": "scalar", "on_disk": True, "m": 16, "ef_construct": 128},
+    "product": {"quantization": "product", "on_disk": True, "m": 16, "ef_construct": 128},
+    "binary": {"quantization": "binary", "on_disk": True, "m": 32, "ef_construct": 256},
+}
+
+_client: QdrantClient | None = None
+_aclient: AsyncQdrantClient | None = None
+_lock = threading.Lock()
+_sparse: dict[str, bool] = {}  # Collection → hat Sparse-Vektor SPARSE_VECTOR
+_indexed: set[str] = set()  # Collections, deren Payload-Indizes in diesem Prozess geprüft sind
+
+# Payload-Indizes für gefilterte Suche. Ohne Index filtert Qdrant per Full-Scan über die Payloads;
+# "tenant" ist als Mandanten-Feld markiert (Punkte eines Mandanten liegen im Speicher beieinander).
+# "text" bleibt ohne Index – Volltext deckt der BM25-Sparse-Vektor ab.
+PAYLOAD_INDEXES = {
+    "tenant": qm.KeywordIndexParams(type=qm.KeywordIndexType.KEYWORD, is_tenant=True),
+    "source": qm.PayloadSchemaType.KEYWORD,
+    "tags": qm.PayloadSchemaType.KEYWORD,
+    "doc_type": qm.PayloadSchemaType.KEYWORD,
+    "filename": qm.PayloadSchemaType.KEYWORD,
+    "path": qm.PayloadSchemaType.KEYWORD,
+    "chunk_id": qm.PayloadSchemaType.UUID,
+    "ingested_at": qm.PayloadSchemaType.DATETIME,
+}
+# Über build_filter filterbare Keyword-Felder; Datumsbereich wirkt auf DATE_FIELD
+FILTER_FIELDS = ("tenant", "source", "tags", "doc_type", "filename", "path")
+DATE_FIELD = "ingested_at"
+
+
+# -------------------------------------------------------------
+# Clients (lazy, ein Pool pro Prozess)
+# -------------------------------------------------------------
+def _client_args() -> dict:
+    # Wenn Host bereits mit http:// beginnt, nutze `url=`, sonst klassisch host/port
+    args = {"url": QDRANT_HOST} if QDRANT_HOST.startswith("http") else {"host": QDRANT_HOST, "port": QDRANT_HTTP}
+    return {
+        **args,
+        "grpc_port": QDRANT_GRPC,
+        "prefer_grpc": QDRANT_PREFER_GRPC,
+        "timeout": QDRANT_TIMEOUT,
+        "limits": httpx.Limits(max_connections=QDRANT_POOL_SIZE, max_keepalive_connections=QDRANT_POOL_SIZE),
+    }
+
+
+def get_client() -> QdrantClient:
+    """Prozessweiter, lazy erzeugter Sync-Client (gRPC bevorzugt, REST-Pool als Fallback)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = QdrantClient(**_client_args())
+    return _client
+
+
+def get_async_client() -> AsyncQdrantClient:
+    """Prozessweiter, lazy erzeugter Async-Client für FastAPI-Routen."""
+    global _aclient
+    if _aclient is None:
+        _aclient = AsyncQdrantClient(**_client_args())
+    return _aclient
+
+
+def __getattr__(name):
+    # Rückwärtskompatibel: `qdrant.client` / `qdrant.aclient`
+    if name == "client":
+        return get_client()
+    if name == "aclient":
+        return get_async_client()
+    raise AttributeError(name)
+
+
+# -------------------------------------------------------------
+# Retries mit exponentiellem Backoff
+# -------------------------------------------------------------
+# gRPC-Statuscodes vorübergehender Fehler; NOT_FOUND, INVALID_ARGUMENT (falsche Dimension),
+# ALREADY_EXISTS usw. sind Client-Fehler wie ein 4xx über REST
+GRPC_RETRYABLE = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+}
+
+
+def _retryable(e: Exception) -> bool:
+    # 4xx sind Client-Fehler (falsche Dimension, unbekannte Collection …) → nicht wiederholen
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code is None or e.status_code >= 500 or e.status_code == 429
+    # prefer_grpc: Serverfehler kommen als grpc.RpcError (sync und grpc.aio)
+    if isinstance(e, grpc.RpcError) and callable(getattr(e, "code", None)):
+        return e.code() in GRPC_RETRYABLE
+    return not isinstance(e, (ValueError, TypeError))
+
+
+def _retry(fn, *args, **kwargs):
+    for attempt in range(QDRANT_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= QDRANT_RETRIES or not _retryable(e):
+                raise
+            delay = QDRANT_BACKOFF * 2 ** attempt
+            print(f"🔁 Qdrant-Aufruf fehlgeschlagen ({e}) – neuer Versuch in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def _aretry(fn, *args, **kwargs):
+    for attempt in range(QDRANT_RETRIES + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= QDRANT_RETRIES or not _retryable(e):
+                raise
+            delay = QDRANT_BACKOFF * 2 ** attempt
+            print(f"🔁 Qdrant-Aufruf fehlgeschlagen ({e}) – neuer Versuch in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def make_point(pid, vector, payload: dict, hybrid: bool = False) -> qm.PointStruct:
+    """PointStruct; mit hybrid=True zusätzlich der BM25-Sparse-Vektor aus payload["text"]."""
+    if hybrid:
+        vector = {"": vector, SPARSE_VECTOR: sparse.encode_document(payload.get("text") or "")}
+    return qm.PointStruct(id=pid, vector=vector, payload=payload)
+
+
+def _points(texts, vectors, payloads=None, ids=None, hybrid: bool = False) -> list:
+    if payloads is None:
+        payloads = [{"text": t} for t in texts]
+    if ids is None:
+        # Punkt-IDs als UUIDs erzeugen
+        ids = [str(uuid.uuid4()) for _ in vectors]
+    if hybrid:
+        payloads = [pl if pl.get("text") else {**pl, "text": t} for t, pl in zip(texts, payloads)]
+    return [make_point(pid, vec, pl, hybrid) for pid, vec, pl in zip(ids, vectors, payloads)]
+
+
+def _batched(items, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-# Automatische URL-Erkennung
-# Wenn Host bereits mit http:// beginnt, nutze `url=`, sonst klassisch host/port
-if QDRANT_HOST.startswith("http"):
-    client = QdrantClient(url=QDRANT_HOST)
-else:
-    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_HTTP)
 
 # -------------------------------------------------------------
 # Collection sicherstellen
 # -------------------------------------------------------------
-def ensure_collection(dim: int = 384):
-    """Erstellt oder prüft, ob die Collection existiert."""
+def profile(name: str | None = None) -> dict:
+    """Profil aus PROFILES inkl. Überschreibungen aus QDRANT_HNSW_*."""
+    name = name or QDRANT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unbekanntes Qdrant-Profil '{name}' (verfügbar: {', '.join(PROFILES)})")
+    p = {**PROFILES[name], "name": name}
+    if QDRANT_HNSW_M:
+        p["m"] = QDRANT_HNSW_M
+    if QDRANT_HNSW_EF_CONSTRUCT:
+        p["ef_construct"] = QDRANT_HNSW_EF_CONSTRUCT
+    return p
+
+
+def _quantization(kind: str | None):
+    if kind == "scalar":
+        return qm.ScalarQuantization(scalar=qm.ScalarQuantizationConfig(
+            type=qm.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "product":
+        return qm.ProductQuantization(product=qm.ProductQuantizationConfig(
+            compression=qm.CompressionRatio.X16, always_ram=True))
+    if kind == "binary":
+        return qm.BinaryQuantization(binary=qm.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def _collection_config(dim: int, profile_name: str | None = None) -> dict:
+    p = profile(profile_name)
+    config = {
+        "vectors_config": qm.VectorParams(size=dim, distance=qm.Distance.COSINE, on_disk=p["on_disk"]),
+        "hnsw_config": qm.HnswConfigDiff(m=p["m"], ef_construct=p["ef_construct"]),
+        "quantization_config": _quantization(p["quantization"]),
+        "on_disk_payload": p["on_disk"],
+    }
+    if QDRANT_HYBRID:
+        # IDF rechnet Qdrant zur Suchzeit → Gewichte beim Ingest bleiben korpusunabhängig
+        config["sparse_vectors_config"] = {SPARSE_VECTOR: qm.SparseVectorParams(
+            index=qm.SparseIndexParams(on_disk=p["on_disk"]), modifier=qm.Modifier.IDF)}
+    return config
+
+
+def create_collection(name: str, dim: int, profile_name: str | None = None):
+    """Legt eine Collection mit Profil und allen Payload-Indizes an (z. B. Ziel einer Migration)."""
+    c = get_client()
+    _retry(c.create_collection, collection_name=name, **_collection_config(dim, profile_name))
+    for field, schema in PAYLOAD_INDEXES.items():
+        _retry(c.create_payload_index, collection_name=name, field_name=field, field_schema=schema)
+
+
+def update_profile(profile_name: str | None = None, name: str | None = None):
+    """
+    Stellt eine bestehende Collection im laufenden Betrieb auf ein Profil um
+    (Quantisierung, On-Disk, HNSW). Qdrant baut die Segmente im Hintergrund neu,
+    Suchen laufen währenddessen weiter. Sparse-Vektoren lassen sich so nicht
+    nachrüsten – dafür scripts/qdrant_migrate.py (neue Collection + Alias).
+    """
+    p = profile(profile_name)
+    _retry(
+        get_client().update_collection,
+        collection_name=name or COLL,
+        vectors_config={"": qm.VectorParamsDiff(on_disk=p["on_disk"])},
+        hnsw_config=qm.HnswConfigDiff(m=p["m"], ef_construct=p["ef_construct"]),
+        quantization_config=_quantization(p["quantization"]) or qm.Disabled.DISABLED,
+        collection_params=qm.CollectionParamsDiff(on_disk_payload=p["on_disk"]),
+    )
+
+
+def resolve_collection(name: str | None = None) -> str:
+    """Collection hinter dem Alias name (Standard COLL); ohne Alias der Name selbst."""
+    name = name or COLL
+    for a in _retry(get_client().get_aliases).aliases:
+        if a.alias_name == name:
+            return a.collection_name
+    return name
+
+
+def switch_alias(target: str, alias: str | None = None):
+    """Setzt den Alias atomar auf target – Suchen und Upserts wechseln ohne Unterbrechung."""
+    alias = alias or COLL
+    actions = [qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name=target, alias_name=alias))]
+    if resolve_collection(alias) != alias:
+        actions.insert(0, qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=alias)))
+    _retry(get_client().update_collection_aliases, change_aliases_operations=actions)
+    _sparse.pop(alias, None)
+    _indexed.discard(alias)
+
+
+def _has_sparse(info) -> bool:
+    return QDRANT_HYBRID and SPARSE_VECTOR in (info.config.params.sparse_vectors or {})
+
+
+def has_sparse() -> bool:
+    """
+    Ob die Collection den BM25-Sparse-Vektor hat (einmal je Prozess abgefragt).
+    Ältere Collections ohne Sparse-Vektor laufen rein dense weiter, bis sie neu aufgebaut sind.
+    """
+    if COLL not in _sparse:
+        try:
+            _sparse[COLL] = _has_sparse(_retry(get_client().get_collection, COLL))
+        except Exception:
+            return False
+    return _sparse[COLL]
+
+
+async def ahas_sparse() -> bool:
+    """Async-Variante von has_sparse."""
+    if COLL not in _sparse:
+        try:
+            _sparse[COLL] = _has_sparse(await _aretry(get_async_client().get_collection, COLL))
+        except Exception:
+            return False
+    return _sparse[COLL]
+
+
+def _missing_indexes(info=None) -> list:
+    """Fehlende Payload-Indizes [(feld, schema)]; info=None für eine neue Collection."""
+    _indexed.add(COLL)
+    if info is None:
+        return list(PAYLOAD_INDEXES.items())
+    _sparse[COLL] = _has_sparse(info)
+    return [(f, schema) for f, schema in PAYLOAD_INDEXES.items() if f not in (info.payload_schema or {})]
+
+
+def ensure_collection(dim: int | None = None):
+    """
+    Erstellt oder prüft, ob die Collection existiert; legt fehlende Payload-Indizes an.
+    Ohne dim wird nur geprüft – die Dimension hängt vom Embedding-Modell ab, angelegt
+    wird dann beim ersten Upsert mit len(vector).
+    """
     try:
-        collections = client.get_collections().collections
-        if any(c.name == COLL for c in collections):
+        c = get_client()
+        if _retry(c.collection_exists, COLL):
             print(f"✅ Qdrant-Collection '{COLL}' existiert bereits.")
+            if COLL in _indexed:
+                return
+            missing = _missing_indexes(_retry(c.get_collection, COLL))
+        elif not dim:
+            print(f"ℹ️ Qdrant-Collection '{COLL}' fehlt – wird beim ersten Ingest angelegt.")
             return
-        print(f"📦 Erstelle neue Qdrant-Collection '{COLL}' (dim={dim}) …")
-        client.recreate_collection(
-            collection_name=COLL,
-            vectors_config=qm.VectorParams(
-                size=dim,
-                distance=qm.Distance.COSINE
-            ),
-        )
-        print(f"✅ Collection '{COLL}' erfolgreich erstellt.")
+        else:
+            print(f"📦 Erstelle neue Qdrant-Collection '{COLL}' (dim={dim}) …")
+            c.create_collection(collection_name=COLL, **_collection_config(dim))
+            _sparse[COLL] = QDRANT_HYBRID
+            missing = _missing_indexes()
+            print(f"✅ Collection '{COLL}' erfolgreich erstellt.")
+        # wait=False: auf großen Collections baut Qdrant die Indizes im Hintergrund
+        for field, schema in missing:
+            _retry(c.create_payload_index, collection_name=COLL, field_name=field, field_schema=schema, wait=False)
+            print(f"🗂️ Payload-Index '{field}' angelegt.")
     except Exception as e:
         print(f"⚠️ Fehler beim Qdrant-Setup: {e}")
 
-# -------------------------------------------------------------
-# Vektoren hochladen / upsert
-# -------------------------------------------------------------
-def upsert_vectors(texts, vectors, payloads=None):
-    """Speichert Embeddings in Qdrant."""
+
+async def aensure_collection(dim: int | None = None):
+    """Async-Variante von ensure_collection."""
     try:
-        if not vectors:
-            print("⚠️ Keine Vektoren übergeben – kein Upload durchgeführt.")
+        c = get_async_client()
+        if await _aretry(c.collection_exists, COLL):
+            if COLL in _indexed:
+                return
+            missing = _missing_indexes(await _aretry(c.get_collection, COLL))
+        elif not dim:
             return
+        else:
+            print(f"📦 Erstelle neue Qdrant-Collection '{COLL}' (dim={dim}) …")
+            await c.create_collection(collection_name=COLL, **_collection_config(dim))
+            _sparse[COLL] = QDRANT_HYBRID
+            missing = _missing_indexes()
+            print(f"✅ Collection '{COLL}' erfolgreich erstellt.")
+        for field, schema in missing:
+            await _aretry(c.create_payload_index, collection_name=COLL, field_name=field,
+                          field_schema=schema, wait=False)
+            print(f"🗂️ Payload-Index '{field}' angelegt.")
+    except Exception as e:
+        print(f"⚠️ Fehler beim Qdrant-Setup: {e}")
 
-        if payloads is None:
-            payloads = [{"text": t} for t in texts]
 
-        # Punkt-IDs als UUIDs erzeugen
-        points = [
-            qm.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vec,
-                payload=payload
-            )
-            for vec, payload in zip(vectors, payloads)
-        ]
+# -------------------------------------------------------------
+# Vektoren hochladen / upsert (gebatcht, parallel, mit Retries)
+# -------------------------------------------------------------
+def upsert_points(points, batch_size: int = QDRANT_UPSERT_BATCH, parallel: int = QDRANT_UPSERT_PARALLEL,
+                  collection: str | None = None) -> int:
+    """Upsert von PointStructs in Batches; bei parallel > 1 mehrere Batches gleichzeitig."""
+    c = get_client()
+    batches = list(_batched(list(points), max(1, batch_size)))
+
+    def _one(batch):
+        _retry(c.upsert, collection_name=collection or COLL, points=batch)
+        return len(batch)
+
+    if parallel <= 1 or len(batches) <= 1:
+        return sum(_one(b) for b in batches)
+    with ThreadPoolExecutor(min(parallel, len(batches)), thread_name_prefix="qdrant-upsert") as pool:
+        return sum(pool.map(_one, batches))
+
+
+async def aupsert_points(points, batch_size: int = QDRANT_UPSERT_BATCH, parallel: int = QDRANT_UPSERT_PARALLEL) -> int:
+    """Async-Variante von upsert_points (höchstens `parallel` Batches gleichzeitig)."""
+    c = get_async_client()
+    sem = asyncio.Semaphore(max(1, parallel))
 
-        result = client.upsert(collection_name=COLL, points=points)
-        print(f"✅ {len(points)} Vektoren erfolgreich in Qdrant upserted. Ergebnis: {result.status}")
-        return result
+    async def _one(batch):
+        async with sem:
+            await _aretry(c.upsert, collection_name=COLL, points=batch)
+            return len(batch)
 
+    done = await asyncio.gather(*[_one(b) for b in _batched(list(points), max(1, batch_size))])
+    return sum(done)
+
+
+def upsert_vectors(texts, vectors, payloads=None, ids=None):
+    """Speichert Embeddings in Qdrant. Fehler werden nach allen Retries weitergereicht."""
+    if not vectors:
+        print("⚠️ Keine Vektoren übergeben – kein Upload durchgeführt.")
+        return 0
+    try:
+        n = upsert_points(_points(texts, vectors, payloads, ids, hybrid=has_sparse()))
+        print(f"✅ {n} Vektoren erfolgreich in Qdrant upserted.")
+        return n
     except Exception as e:
         print(f"⚠️ Fehler beim Upsert in Qdrant: {e}")
+        raise
+
+
+async def aupsert_vectors(texts, vectors, payloads=None, ids=None):
+    """Async-Variante von upsert_vectors."""
+    if not vectors:
+        print("⚠️ Keine Vektoren übergeben – kein Upload durchgeführt.")
+        return 0
+    try:
+        n = await aupsert_points(_points(texts, vectors, payloads, ids, hybrid=await ahas_sparse()))
+        print(f"✅ {n} Vektoren erfolgreich in Qdrant upserted.")
+        return n
+    except Exception as e:
+        print(f"⚠️ Fehler beim Upsert in Qdrant: {e}")
+        raise
+
+
+# -------------------------------------------------------------
+# Filter
+# -------------------------------------------------------------
+def doc_meta(filename: str, source: str, tags=None, tenant: str | None = None) -> dict:
+    """Filterbare Dokument-Felder für die Payload jedes Chunks (siehe PAYLOAD_INDEXES)."""
+    meta = {
+        "filename": filename,
+        "source": source,
+        "doc_type": os.path.splitext(filename)[1].lstrip(".").lower() or "unknown",
+        "tags": sorted({t.strip() for t in tags or [] if t and t.strip()}),
+        DATE_FIELD: datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if tenant:
+        meta["tenant"] = tenant
+    return meta
+
+
+def _match(key: str, value) -> qm.FieldCondition:
+    if isinstance(value, (list, tuple, set)):
+        return qm.FieldCondition(key=key, match=qm.MatchAny(any=list(value)))
+    return qm.FieldCondition(key=key, match=qm.MatchValue(value=value))
+
+
+def build_filter(date_from=None, date_to=None, **fields) -> qm.Filter | None:
+    """
+    Filter für die Suche, z. B. build_filter(source="upload", tags=["tarif"], date_from=…).
+    Felder aus FILTER_FIELDS; eine Liste heißt "einer der Werte" (bei tags: eines der Tags).
+    Datumsbereich [date_from, date_to) auf DATE_FIELD. Alle Bedingungen laufen über Payload-Indizes.
+    """
+    must = []
+    for key, value in fields.items():
+        if key not in FILTER_FIELDS:
+            raise ValueError(f"Unbekanntes Filterfeld '{key}' (erlaubt: {', '.join(FILTER_FIELDS)})")
+        if value is None or (isinstance(value, (list, tuple, set)) and not value):
+            continue
+        must.append(_match(key, value))
+    if date_from is not None or date_to is not None:
+        must.append(qm.FieldCondition(key=DATE_FIELD, range=qm.DatetimeRange(gte=date_from, lt=date_to)))
+    return qm.Filter(must=must) if must else None
+
 
 # -------------------------------------------------------------
 # Ähnlichkeitssuche
 # -------------------------------------------------------------
-def search(vector, top_k=6):
-    """Sucht ähnliche Einträge zu einem gegebenen Vektor."""
+def search_params(ef: int | None = None, rescore: bool | None = None, oversampling: float | None = None,
+                  exact: bool = False) -> qm.SearchParams:
+    """
+    Suchparameter für Dense-Suchen: hnsw_ef (größer = genauer, langsamer) sowie
+    Rescoring/Oversampling bei quantisierten Collections (oversampling × limit
+    Kandidaten aus den quantisierten Vektoren, dann Neubewertung mit den Originalen).
+    exact=True erzwingt eine vollständige Suche (Referenz für Recall-Messungen).
+    """
+    return qm.SearchParams(
+        hnsw_ef=ef or QDRANT_SEARCH_EF or None,
+        exact=exact,
+        quantization=qm.QuantizationSearchParams(
+            rescore=QDRANT_RESCORE if rescore is None else rescore,
+            oversampling=oversampling or QDRANT_OVERSAMPLING,
+        ),
+    )
+
+
+def search(vector, top_k=6, query_filter: qm.Filter | None = None, params: qm.SearchParams | None = None):
+    """Sucht ähnliche Einträge zu einem gegebenen Vektor (optional gefiltert, siehe build_filter)."""
     try:
-        return client.search(collection_name=COLL, query_vector=vector, limit=top_k)
+        return _retry(get_client().search, collection_name=COLL, query_vector=vector, limit=top_k,
+                      query_filter=query_filter, search_params=params or search_params())
     except Exception as e:
         print(f"⚠️ Qdrant-Suche fehlgeschlagen: {e}")
         return []
 
 
+async def asearch(vector, top_k=6, query_filter: qm.Filter | None = None, params: qm.SearchParams | None = None):
+    """Sucht ähnliche Einträge zu einem Vektor, ohne den Event-Loop zu blockieren."""
+    try:
+        return await _aretry(get_async_client().search, collection_name=COLL, query_vector=vector, limit=top_k,
+                             query_filter=query_filter, search_params=params or search_params())
+    except Exception as e:
+        print(f"⚠️ Qdrant-Suche fehlgeschlagen: {e}")
+        return []
 
-# -------------------------------------------------------------
-# Vektoren hochladen
-# -------------------------------------------------------------
-def upsert_vectors(texts, vectors, payloads=None):
-    """Speichert Text-Embeddings in Qdrant mit optionalen Payloads."""
+
+def _search_requests(vectors, top_k, query_filter=None, params=None):
+    params = params or search_params()
+    return [qm.SearchRequest(vector=v, limit=top_k, filter=query_filter, params=params, with_payload=True)
+            for v in vectors]
+
+
+def search_batch(vectors, top_k=6, query_filter: qm.Filter | None = None, params: qm.SearchParams | None = None):
+    """Viele Suchen in einem Request. Liefert eine Trefferliste pro Vektor."""
+    if not vectors:
+        return []
     try:
-        c = get_client()
-        if not vectors:
-            print("⚠️ Keine Vektoren übergeben – kein Upload durchgeführt.")
-            return
+        return _retry(get_client().search_batch, collection_name=COLL,
+                      requests=_search_requests(vectors, top_k, query_filter, params))
+    except Exception as e:
+        print(f"⚠️ Qdrant-Batch-Suche fehlgeschlagen: {e}")
+        return [[] for _ in vectors]
+
+
+async def asearch_batch(vectors, top_k=6, query_filter: qm.Filter | None = None,
+                        params: qm.SearchParams | None = None):
+    """Async-Variante von search_batch."""
+    if not vectors:
+        return []
+    try:
+        return await _aretry(get_async_client().search_batch, collection_name=COLL,
+                             requests=_search_requests(vectors, top_k, query_filter, params))
+    except Exception as e:
+        print(f"⚠️ Qdrant-Batch-Suche fehlgeschlagen: {e}")
+        return [[] for _ in vectors]
+
 
-        if payloads is None:
-            payloads = [{"text": t} for t in texts]
+def _hybrid_requests(vectors, texts, top_k, query_filter=None, params=None):
+    return _search_requests(vectors, top_k, query_filter, params) + [
+        qm.SearchRequest(vector=qm.NamedSparseVector(name=SPARSE_VECTOR, vector=sparse.encode_query(t)),
+                         limit=top_k, filter=query_filter, with_payload=True)
+        for t in texts
+    ]
 
-        # Erzeuge eindeutige UUIDs für alle Punkte
-        point_ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
 
-        points = [
-            qm.PointStruct(id=pid, vector=vec, payload=pl)
-            for pid, vec, pl in zip(point_ids, vectors, payloads)
-        ]
+def _split_hybrid(results, n: int) -> list:
+    return [(results[i], results[n + i] if len(results) > n else []) for i in range(n)]
 
-        result = c.upsert(collection_name=COLL, points=points)
-        print(f"✅ {len(points)} Embeddings in Qdrant gespeichert. Ergebnis: {result.status}")
 
+def search_hybrid_batch(vectors, texts, top_k=6, query_filter: qm.Filter | None = None,
+                        params: qm.SearchParams | None = None):
+    """
+    Dense- und BM25-Suche für viele Anfragen in einem Request (Qdrant führt sie
+    gemeinsam aus). Liefert je Anfrage (dense_hits, sparse_hits); ohne
+    Sparse-Index ist sparse_hits leer.
+    """
+    if not vectors:
+        return []
+    requests = (_hybrid_requests(vectors, texts, top_k, query_filter, params) if has_sparse()
+                else _search_requests(vectors, top_k, query_filter, params))
+    try:
+        return _split_hybrid(_retry(get_client().search_batch, collection_name=COLL, requests=requests), len(vectors))
     except Exception as e:
-        print(f"⚠️ Fehler beim Upsert in Qdrant: {e}")
+        print(f"⚠️ Qdrant-Hybrid-Suche fehlgeschlagen: {e}")
+        return [([], []) for _ in vectors]
+
+
+async def asearch_hybrid_batch(vectors, texts, top_k=6, query_filter: qm.Filter | None = None,
+                               params: qm.SearchParams | None = None):
+    """Async-Variante von search_hybrid_batch."""
+    if not vectors:
+        return []
+    requests = (_hybrid_requests(vectors, texts, top_k, query_filter, params) if await ahas_sparse()
+                else _search_requests(vectors, top_k, query_filter, params))
+    try:
+        results = await _aretry(get_async_client().search_batch, collection_name=COLL, requests=requests)
+        return _split_hybrid(results, len(vectors))
+    except Exception as e:
+        print(f"⚠️ Qdrant-Hybrid-Suche fehlgeschlagen: {e}")
+        return [([], []) for _ in vectors]
 
 
 # -------------------------------------------------------------
-# Suche
+# Scroll & Löschen
 # -------------------------------------------------------------
-def search(vector, top_k=6):
-    """Sucht ähnliche Einträge zu einem Vektor."""
+def scroll(scroll_filter=None, batch_size: int = 256, with_payload=True, with_vectors=False,
+           collection: str | None = None):
+    """Iteriert seitenweise über alle (gefilterten) Punkte der Collection."""
+    c = get_client()
+    offset = None
+    while True:
+        records, offset = _retry(
+            c.scroll, collection_name=collection or COLL, scroll_filter=scroll_filter, limit=batch_size,
+            offset=offset, with_payload=with_payload, with_vectors=with_vectors,
+        )
+        yield from records
+        if offset is None:
+            return
+
+
+def delete_points(ids, batch_size: int = 1000):
+    """Löscht Punkte anhand ihrer IDs."""
+    ids = list(ids)
+    c = get_client()
+    for batch in _batched(ids, batch_size):
+        _retry(c.delete, collection_name=COLL, points_selector=qm.PointIdsList(points=batch))
+
+
+def delete_by_payload(key: str, values, batch_size: int = 1000, keep_ids=None):
+    """Löscht alle Punkte, deren Payload-Feld `key` einen der Werte enthält – außer keep_ids."""
+    values = list(values)
+    keep = [qm.HasIdCondition(has_id=list(keep_ids))] if keep_ids else None
     c = get_client()
     try:
-        return c.search(collection_name=COLL, query_vector=vector, limit=top_k)
+        for batch in _batched(values, batch_size):
+            _retry(
+                c.delete,
+                collection_name=COLL,
+                points_selector=qm.FilterSelector(filter=qm.Filter(must=[
+                    qm.FieldCondition(key=key, match=qm.MatchAny(any=batch))
+                ], must_not=keep)),
+            )
     except Exception as e:
-        print(f"⚠️ Qdrant-Suche fehlgeschlagen: {e}")
-        return []
+        print(f"⚠️ Löschen in Qdrant fehlgeschlagen: {e}")
+        raise
+
+
+# -------------------------------------------------------------
+# Shutdown
+# -------------------------------------------------------------
+def close():
+    global _client
+    if _client is not None:
+        try:
+            _client.close()
+        except Exception as e:
+            print(f"⚠️ Qdrant-Client konnte nicht geschlossen werden: {e}")
+        _client = None
+
 
+async def aclose():
+    """Schließt den Async-Client (FastAPI-Shutdown)."""
+    global _aclient
+    if _aclient is not None:
+        try:
+            await _aclient.close()
+        except Exception as e:
+            print(f"⚠️ Qdrant-Client konnte nicht geschlossen werden: {e}")
+        _aclient = None
@@ -1,9 +1,16 @@
-import os, hashlib, yaml, traceback
+import os, json, time, yaml, asyncio, traceback
 from datetime import datetime
-from . import embed, qdrant
+from . import embed, qdrant, answer_cache, context
+from .chunking import estimate_tokens
+from .embed_cache import _sha256
 
 # === Persona / System aus YAML laden ===
 PROMPT_PATH = os.getenv("PROMPT_PATH", "prompts/luna.yml")
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+# Hybride Suche: Dense + BM25 (qdrant.search_hybrid_batch), per Reciprocal Rank Fusion zusammengeführt
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1").lower() in {"1", "true", "yes", "on"}
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_HYBRID_OVERSAMPLE = int(os.getenv("RAG_HYBRID_OVERSAMPLE", "2"))  # Kandidaten je Suche = top_k × Faktor
 try:
     with open(PROMPT_PATH, "r", encoding="utf-8") as f:
         conf = yaml.safe_load(f)
@@ -13,83 +20,344 @@ except Exception:
     PERSONA = "Du bist Luna, eine neutrale KI."
     SYSTEM = ""
 
-def _sha256(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
+# Ändern sich Persona, System-Prompt oder Modell, greifen alte Cache-Einträge nicht mehr
+PROMPT_VERSION = _sha256(f"{PERSONA}\0{SYSTEM}\0{embed.GENERATE_MODEL}".encode("utf-8"))[:16]
 
-def chunk_text(text: str, max_len: int = 800):
-    """Teilt längere Texte in handhabbare Chunks auf."""
-    words, chunks, cur = text.split(), [], []
-    for w in words:
-        cur.append(w)
-        if sum(len(x) + 1 for x in cur) >= max_len:
-            chunks.append(" ".join(cur))
-            cur = []
-    if cur:
-        chunks.append(" ".join(cur))
-    return chunks
+# Persona, System-Prompt und Gerüst ("Kontext:", "Frage:") – fester Anteil jedes Prompts
+PROMPT_TOKENS = estimate_tokens(PERSONA) + estimate_tokens(SYSTEM) + 8
+
+# -------------------------------------------------------------
+# Retrieval (dense oder hybrid)
+# -------------------------------------------------------------
+def _fuse(dense, bm25, top_k: int) -> list:
+    """
+    Reciprocal Rank Fusion: score = Σ 1 / (RAG_RRF_K + Rang) über beide Listen.
+    Nur Ränge zählen – Cosinus- und BM25-Scores sind nicht vergleichbar.
+    Die Hits tragen danach den RRF-Score.
+    """
+    if not bm25:
+        return list(dense[:top_k])
+    scores, hits = {}, {}
+    for ranked in (dense, bm25):
+        for rank, h in enumerate(ranked, start=1):
+            key = str(h.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RAG_RRF_K + rank)
+            hits.setdefault(key, h)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [hits[k].model_copy(update={"score": scores[k]}) for k in best]
+
+
+def _scope(filters: dict | None):
+    """
+    Qdrant-Filter (qdrant.build_filter) und Cache-Version einer Anfrage.
+    Gefilterte Antworten bekommen eine eigene Version → kein Treffer über Filtergrenzen.
+    """
+    if not filters:
+        return None, PROMPT_VERSION
+    key = json.dumps(filters, sort_keys=True, default=str)
+    return qdrant.build_filter(**filters), f"{PROMPT_VERSION}:{_sha256(key.encode('utf-8'))[:16]}"
+
+
+def _retrieve(question: str, q_emb, top_k: int, query_filter=None) -> list:
+    if not RAG_HYBRID:
+        return qdrant.search(q_emb, top_k=top_k, query_filter=query_filter)
+    (dense, bm25), = qdrant.search_hybrid_batch([q_emb], [question], top_k=top_k * RAG_HYBRID_OVERSAMPLE,
+                                                query_filter=query_filter)
+    return _fuse(dense, bm25, top_k)
+
+
+async def _aretrieve_batch(questions, embs, top_k: int, query_filter=None) -> list:
+    """Eine Trefferliste je Frage; Dense- und BM25-Suchen aller Fragen in einem Qdrant-Request."""
+    if not RAG_HYBRID:
+        return await qdrant.asearch_batch(embs, top_k=top_k, query_filter=query_filter)
+    pairs = await qdrant.asearch_hybrid_batch(embs, questions, top_k=top_k * RAG_HYBRID_OVERSAMPLE,
+                                              query_filter=query_filter)
+    return [_fuse(dense, bm25, top_k) for dense, bm25 in pairs]
+
+
+async def _aretrieve(question: str, q_emb, top_k: int, query_filter=None) -> list:
+    return (await _aretrieve_batch([question], [q_emb], top_k, query_filter))[0]
+
+
+# -------------------------------------------------------------
+# Bausteine für ask / aask
+# -------------------------------------------------------------
+def _empty(answer: str, status: str) -> dict:
+    return {
+        "answer": answer,
+        "status": status,
+        "chunks_used": [],
+        "citations": [],
+        "context_tokens": 0,
+        "chunks_dropped": []
+    }
+
+
+def _pack(question: str, hits) -> dict:
+    """Hits auf das Kontextbudget packen (siehe context.py)."""
+    return context.pack(hits, context.budget(PROMPT_TOKENS + estimate_tokens(question)))
+
+
+def _build_prompt(question: str, packed: dict) -> str:
+    ctx = "\n\n".join([f"[chunk {cid}] {txt}" for cid, txt in packed["texts"]])
+    return f"{SYSTEM}\n\nKontext:\n{ctx}\n\nFrage: {question}"
 
 
-def ask(question: str, top_k: int = 6):
+def _citations(hits) -> list:
+    return [
+        {
+            "chunk_id": str(h.payload.get("chunk_id")),
+            "score": float(getattr(h, "score", 0.0))
+        }
+        for h in hits
+    ]
+
+
+def _sources(packed: dict) -> dict:
+    """Quellen des Prompts plus Budget-Auskunft: genutzte Tokens, verworfene Chunks."""
+    return {
+        "chunks_used": [str(getattr(h, "id", "")) for h in packed["hits"]],
+        "citations": _citations(packed["hits"]),
+        "context_tokens": packed["tokens"],
+        "context_budget": packed["budget"],
+        "chunks_trimmed": packed["trimmed"],
+        "chunks_dropped": packed["dropped"],
+    }
+
+
+def _result(answer, packed) -> dict:
+    if not answer or not isinstance(answer, str):
+        answer = "Keine Antwort generiert."
+    return {
+        "answer": answer.strip(),
+        "persona": PERSONA,
+        "status": "ok",
+        **_sources(packed),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+def _cached(q_emb, top_k: int, version: str = PROMPT_VERSION):
+    """Semantischer Cache-Lookup; liefert die gecachte Antwort oder None."""
+    if answer_cache.cache is None:
+        return None
+    value, sim = answer_cache.cache.lookup(q_emb, top_k, version)
+    if value is None:
+        return None
+    return {**value, "cache": {"hit": True, "similarity": round(sim, 4)}}
+
+
+def _remember(q_emb, top_k: int, result: dict, version: str = PROMPT_VERSION):
+    """Speichert nur erfolgreiche Antworten (keine Fehlertexte aus generate)."""
+    if answer_cache.cache is None or result.get("status") != "ok":
+        return
+    if result["answer"].startswith("[Fehler"):
+        return
+    answer_cache.cache.store(q_emb, top_k, version, result)
+
+
+def _error(e: Exception) -> dict:
+    # Sauberes Fehlerobjekt für Smoke-Tests und API
+    return {
+        "answer": f"[Fehler in RAG.ask: {e}]",
+        "trace": "".join(traceback.format_exception(e)),
+        "status": "error",
+        "chunks_used": [],
+        "citations": [],
+        "context_tokens": 0,
+        "chunks_dropped": []
+    }
+
+
+def ask(question: str, top_k: int = 6, filters: dict | None = None):
     """
     RAG-Anfrage:
-    1. Frage einbetten → Qdrant-Suche
-    2. Kontext kombinieren → Prompt generieren
+    1. Frage einbetten → Qdrant-Suche (dense + BM25, Reciprocal Rank Fusion)
+    2. Kontext ins Token-Budget packen (Duplikate raus, nach Score) → Prompt
     3. Antwort von LLM abrufen
+    filters (z. B. {"source": "upload", "tags": ["tarif"], "date_from": …}) schränken
+    die Suche in Qdrant ein, siehe qdrant.build_filter.
     Immer strukturierte Ausgabe für API und Tests.
     """
     try:
+        query_filter, version = _scope(filters)
+
         # === 1. Embedding ===
         q_emb = embed.embed_texts([question])[0]
         if not q_emb or not isinstance(q_emb, (list, tuple)):
-            return {
-                "answer": "Fehler: Kein gültiges Embedding erzeugt.",
-                "status": "embedding_error",
-                "chunks_used": [],
-                "citations": []
-            }
+            return _empty("Fehler: Kein gültiges Embedding erzeugt.", "embedding_error")
 
-        # === 2. Qdrant-Suche ===
-        hits = qdrant.search(q_emb, top_k=top_k)
+        # === 1b. Semantischer Antwort-Cache ===
+        cached = _cached(q_emb, top_k, version)
+        if cached:
+            return cached
+
+        # === 2. Qdrant-Suche (dense + BM25, RRF) ===
+        hits = _retrieve(question, q_emb, top_k, query_filter)
         if not hits:
-            return {
-                "answer": "Keine passenden Quellen gefunden.",
-                "status": "no_hits",
-                "chunks_used": [],
-                "citations": []
-            }
+            return _empty("Keine passenden Quellen gefunden.", "no_hits")
 
-        # === 3. Kontext zusammenbauen ===
-        texts = [(h.payload.get("chunk_id"), h.payload.get("text", "")) for h in hits]
-        context = "\n\n".join([f"[chunk {cid}] {txt}" for cid, txt in texts if txt])
-        prompt = f"{SYSTEM}\n\nKontext:\n{context}\n\nFrage: {question}"
+        # === 3. Kontext ins Token-Budget packen ===
+        packed = _pack(question, hits)
+        prompt = _build_prompt(question, packed)
 
         # === 4. Antwort generieren ===
         answer = embed.generate(PERSONA, prompt)
-        if not answer or not isinstance(answer, str):
-            answer = "Keine Antwort generiert."
 
         # === 5. Strukturierte Rückgabe ===
-        return {
-            "answer": answer.strip(),
+        result = _result(answer, packed)
+        _remember(q_emb, top_k, result, version)
+        return result
+
+    except embed.EmbeddingError as e:
+        return _empty(f"Fehler: {e}", "embedding_error")
+    except Exception as e:
+        return _error(e)
+
+
+async def aask(question: str, top_k: int = 6, filters: dict | None = None):
+    """Async-Variante von ask – blockiert den Event-Loop nicht."""
+    try:
+        query_filter, version = _scope(filters)
+        q_emb = (await embed.aembed_texts([question]))[0]
+        if not q_emb or not isinstance(q_emb, (list, tuple)):
+            return _empty("Fehler: Kein gültiges Embedding erzeugt.", "embedding_error")
+
+        cached = _cached(q_emb, top_k, version)
+        if cached:
+            return cached
+
+        hits = await _aretrieve(question, q_emb, top_k, query_filter)
+        if not hits:
+            return _empty("Keine passenden Quellen gefunden.", "no_hits")
+
+        packed = _pack(question, hits)
+        answer = await embed.agenerate(PERSONA, _build_prompt(question, packed))
+        result = _result(answer, packed)
+        _remember(q_emb, top_k, result, version)
+        return result
+
+    except embed.EmbeddingError as e:
+        return _empty(f"Fehler: {e}", "embedding_error")
+    except Exception as e:
+        return _error(e)
+
+
+async def aask_batch(questions, top_k: int = 6, filters: dict | None = None):
+    """
+    Beantwortet viele Fragen auf einmal:
+    ein Embedding-Aufruf, eine Qdrant-Batch-Suche (dense + BM25), Generierungen mit
+    höchstens RAG_BATCH_CONCURRENCY parallelen LLM-Aufrufen.
+    Ergebnisse in Eingabereihenfolge, jeweils mit eigenem Status.
+    filters gelten für alle Fragen.
+    """
+    n = len(questions)
+    if not n:
+        return []
+    try:
+        query_filter, version = _scope(filters)
+        embs = await embed.aembed_texts(list(questions))
+    except embed.EmbeddingError as e:
+        return [_empty(f"Fehler: {e}", "embedding_error") for _ in questions]
+    except Exception as e:
+        return [_error(e) for _ in questions]
+    if not embs or len(embs) != n:
+        return [_empty("Fehler: Kein gültiges Embedding erzeugt.", "embedding_error") for _ in questions]
+
+    results = [None] * n
+    pending = []
+    for i, q_emb in enumerate(embs):
+        if not q_emb or not isinstance(q_emb, (list, tuple)):
+            results[i] = _empty("Fehler: Kein gültiges Embedding erzeugt.", "embedding_error")
+            continue
+        results[i] = _cached(q_emb, top_k, version)
+        if results[i] is None:
+            pending.append(i)
+
+    hit_lists = await _aretrieve_batch([questions[i] for i in pending], [embs[i] for i in pending], top_k,
+                                       query_filter)
+    sem = asyncio.Semaphore(max(1, RAG_BATCH_CONCURRENCY))
+
+    async def _answer(i, hits):
+        if not hits:
+            return _empty("Keine passenden Quellen gefunden.", "no_hits")
+        packed = _pack(questions[i], hits)
+        async with sem:
+            # Generate-Fehler als Exception → _error, statt "[Fehler …]" mit Status ok
+            answer = await embed.agenerate(PERSONA, _build_prompt(questions[i], packed), strict=True)
+        result = _result(answer, packed)
+        _remember(embs[i], top_k, result, version)
+        return result
+
+    answers = await asyncio.gather(
+        *[_answer(i, hits) for i, hits in zip(pending, hit_lists)], return_exceptions=True
+    )
+    for i, res in zip(pending, answers):
+        results[i] = _error(res) if isinstance(res, Exception) else res
+    return results
+
+
+async def aask_stream(question: str, top_k: int = 6, filters: dict | None = None):
+    """
+    Streaming-Variante von aask. Liefert Events als (event, data):
+    1. "citations" – Quellen (inkl. Kontextbudget), sobald die Suche fertig ist
+    2. "token"     – Antwort-Tokens, sobald das LLM sie erzeugt
+    3. "done"      – Metadaten (Status, Time-to-first-Token, Gesamtdauer)
+    Fehler werden als "error"-Event gemeldet.
+    """
+    t0 = time.perf_counter()
+    try:
+        query_filter, version = _scope(filters)
+        q_emb = (await embed.aembed_texts([question]))[0]
+        if not q_emb or not isinstance(q_emb, (list, tuple)):
+            yield "done", _empty("Fehler: Kein gültiges Embedding erzeugt.", "embedding_error")
+            return
+
+        cached = _cached(q_emb, top_k, version)
+        if cached:
+            yield "citations", {k: cached[k] for k in ("chunks_used", "citations", "context_tokens",
+                                                       "chunks_dropped") if k in cached}
+            yield "token", {"t": cached["answer"]}
+            yield "done", {
+                "persona": PERSONA,
+                "status": "ok",
+                "tokens": 1,
+                "cache": cached["cache"],
+                "ttft_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "timestamp": datetime.utcnow().isoformat() + "Z"
+            }
+            return
+
+        hits = await _aretrieve(question, q_emb, top_k, query_filter)
+        if not hits:
+            yield "done", _empty("Keine passenden Quellen gefunden.", "no_hits")
+            return
+
+        packed = _pack(question, hits)
+        yield "citations", _sources(packed)
+
+        ttft, n_tokens, parts = None, 0, []
+        async for token in embed.agenerate_stream(PERSONA, _build_prompt(question, packed)):
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+            n_tokens += 1
+            parts.append(token)
+            yield "token", {"t": token}
+
+        if n_tokens:
+            _remember(q_emb, top_k, _result("".join(parts), packed), version)
+
+        yield "done", {
             "persona": PERSONA,
-            "status": "ok",
-            "chunks_used": [str(getattr(h, "id", "")) for h in hits],
-            "citations": [
-                {
-                    "chunk_id": str(h.payload.get("chunk_id")),
-                    "score": float(getattr(h, "score", 0.0))
-                }
-                for h in hits
-            ],
+            "status": "ok" if n_tokens else "empty",
+            "tokens": n_tokens,
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "total_ms": round((time.perf_counter() - t0) * 1000, 1),
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
 
+    except embed.EmbeddingError as e:
+        yield "done", _empty(f"Fehler: {e}", "embedding_error")
     except Exception as e:
-        # Sauberes Fehlerobjekt für Smoke-Tests und API
-        return {
-            "answer": f"[Fehler in RAG.ask: {e}]",
-            "trace": traceback.format_exc(),
-            "status": "error",
-            "chunks_used": [],
-            "citations": []
-        }
+        yield "error", _error(e)
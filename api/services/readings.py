@@ -0,0 +1,284 @@
+"""
+🌙 Luna IEMS – Smart-Meter-Readings: Bulk-Ingest via COPY
+
+NDJSON- oder CSV-Streams werden zeilenweise geparst, validiert und in
+Batches von READINGS_COPY_BATCH Zeilen per psycopg3-COPY in `readings`
+geschrieben – ohne ORM-Objekte. Während ein Batch kopiert wird, läuft das
+Parsen des nächsten weiter.
+
+Nach jedem COPY werden die berührten Rollup-Buckets (15 min/Stunde/Tag)
+neu aggregiert (rollups.py) und der Batch durch den Online-Anomaliedetektor
+geschickt (anomaly.py).
+
+`readings` ist monatlich nach timestamp partitioniert (Migration 5b7e2c91d4a0).
+Fehlende Monatspartitionen legt der Ingest vor dem COPY an, alte Partitionen
+entfernt apply_retention (siehe scripts/readings_maintenance.py).
+"""
+import os
+import re
+import csv
+import json
+import math
+import time
+import asyncio
+from datetime import date, datetime
+
+from starlette.concurrency import run_in_threadpool
+
+from . import db, rollups, anomaly
+
+READINGS_COPY_BATCH = int(os.getenv("READINGS_COPY_BATCH", "50000"))
+MAX_REPORTED_ERRORS = 20
+
+COPY_SQL = 'COPY readings (device_id, "timestamp", value) FROM STDIN'
+PARTITION_RE = re.compile(r"^readings_(\d{4})_(\d{2})$")
+
+
+class ReadingParser:
+    """Inkrementeller Parser für NDJSON/CSV-Bytes, liefert validierte Zeilen."""
+
+    def __init__(self, fmt: str, known_devices: set | None = None):
+        self.fmt = fmt
+        self.known_devices = known_devices
+        self.lineno = 0
+        self.rejected = 0
+        self.errors = []
+        self._carry = b""
+        self._header = None
+        self.months = set()
+        self.touched = rollups.TouchedRanges()
+
+    def _reject(self, msg: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": self.lineno, "error": msg})
+
+    def _record(self, line: str):
+        if self.fmt == "csv":
+            fields = next(csv.reader([line]))
+            if self._header is None:
+                self._header = {name.strip(): i for i, name in enumerate(fields)}
+                missing = {"device_id", "timestamp", "value"} - set(self._header)
+                if missing:
+                    raise ValueError(f"CSV-Header unvollständig, fehlt: {', '.join(sorted(missing))}")
+                return None
+            h = self._header
+            return fields[h["device_id"]], fields[h["timestamp"]], fields[h["value"]]
+        obj = json.loads(line)
+        return obj.get("device_id"), obj.get("timestamp") or obj.get("ts"), obj.get("value")
+
+    def _fields(self, line: str):
+        """
+        _record mit Fehlerbehandlung: kaputte Zeilen (zu kurz, kein JSON-Objekt, …)
+        werden abgelehnt und liefern None. Nur ein ungültiger CSV-Header bricht ab –
+        sonst wäre jede weitere Zeile fehlerhaft.
+        """
+        header = self.fmt == "csv" and self._header is None
+        try:
+            return self._record(line)
+        except (ValueError, IndexError, AttributeError, TypeError) as e:
+            if header:
+                raise ValueError(str(e)) from e
+            self._reject(f"Ungültige Zeile: {e}")
+            return None
+
+    def _validate(self, line: str):
+        rec = self._fields(line)
+        if rec is None:
+            return None
+        device_id, ts, value = rec
+        try:
+            device_id = int(device_id)
+            ts = str(ts).strip()
+            parsed = datetime.fromisoformat(ts)
+            value = float(value)
+        except (TypeError, ValueError) as e:
+            self._reject(f"Ungültiger Wert: {e}")
+            return None
+        if not math.isfinite(value):
+            self._reject("Wert ist nicht endlich")
+            return None
+        if self.known_devices is not None and device_id not in self.known_devices:
+            self._reject(f"Unbekanntes Gerät {device_id}")
+            return None
+        self.months.add((parsed.year, parsed.month))
+        # timestamp without time zone: Postgres ignoriert einen Offset im Input
+        parsed = parsed.replace(tzinfo=None)
+        self.touched.add(device_id, parsed)
+        return device_id, ts, value, parsed
+
+    def feed(self, data: bytes):
+        """Nimmt rohe Bytes entgegen und liefert vollständige, gültige Zeilen."""
+        data = self._carry + data
+        lines = data.split(b"\n")
+        self._carry = lines.pop()
+        for raw in lines:
+            row = self._line(raw)
+            if row is not None:
+                yield row
+
+    def parse(self, data: bytes) -> list:
+        """feed als Liste – zum Aufruf per run_in_threadpool, damit das Parsen den Event-Loop nicht blockiert."""
+        return list(self.feed(data))
+
+    def flush(self):
+        raw, self._carry = self._carry, b""
+        row = self._line(raw)
+        if row is not None:
+            yield row
+
+    def _line(self, raw: bytes):
+        self.lineno += 1
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line:
+            return None
+        return self._validate(line)
+
+
+def _copy_text(rows) -> str:
+    # COPY-Textformat: Tab-getrennt; Werte sind numerisch/ISO-Zeitstempel → kein Escaping nötig
+    return "".join(f"{d}\t{ts}\t{v!r}\n" for d, ts, v, *_ in rows)
+
+
+def copy_batch(conn, rows, commit: bool = True) -> int:
+    """Schreibt einen Batch per COPY und committet ihn (commit=False: Aufrufer committet)."""
+    with conn.cursor() as cur:
+        with cur.copy(COPY_SQL) as copy:
+            copy.write(_copy_text(rows))
+    if commit:
+        conn.commit()
+    return len(rows)
+
+
+# -------------------------------------------------------------
+# Partitionen
+# -------------------------------------------------------------
+def ensure_partitions(conn, start: datetime, end: datetime) -> int:
+    """Legt alle Monatspartitionen zwischen start und end an (idempotent)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT readings_ensure_partitions(%s, %s)", (start, end))
+        count = cur.fetchone()[0]
+    conn.commit()
+    return count
+
+
+def ensure_months(conn, months) -> None:
+    """Legt die Partitionen für (Jahr, Monat)-Paare an."""
+    with conn.cursor() as cur:
+        for year, month in sorted(months):
+            cur.execute("SELECT readings_create_partition(%s)", (date(year, month, 1),))
+    conn.commit()
+
+
+def list_partitions(conn) -> list:
+    """Liefert [(Name, Monatsbeginn)] aller Monatspartitionen, älteste zuerst."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'readings'::regclass
+        """)
+        names = [r[0] for r in cur.fetchall()]
+    parts = []
+    for name in names:
+        m = PARTITION_RE.match(name)
+        if m:
+            parts.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def apply_retention(conn, keep_months: int, drop: bool = True, today: date | None = None) -> list:
+    """
+    Hängt Monatspartitionen ab, die vollständig älter als keep_months sind,
+    und löscht sie optional. Liefert die Namen der betroffenen Partitionen.
+    """
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    cutoff = date(months // 12, months % 12 + 1, 1)
+    removed = []
+    for name, start in list_partitions(conn):
+        if start >= cutoff:
+            break
+        with conn.cursor() as cur:
+            cur.execute(f'ALTER TABLE readings DETACH PARTITION "{name}"')
+            if drop:
+                cur.execute(f'DROP TABLE "{name}"')
+        conn.commit()
+        removed.append(name)
+    return removed
+
+
+def load_device_ids(conn) -> set:
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM devices")
+        return {r[0] for r in cur.fetchall()}
+
+
+async def bulk_ingest(chunks, fmt: str = "ndjson", batch_size: int = READINGS_COPY_BATCH) -> dict:
+    """
+    Liest einen async Byte-Stream (z. B. request.stream()) und lädt ihn per COPY.
+    Liefert angenommene/abgelehnte Zeilen und den Durchsatz.
+    """
+    t0 = time.perf_counter()
+    conn = await run_in_threadpool(db.conn)
+    accepted = 0
+    inflight = None
+    known_months = set()
+    stats = {"anomalies": 0}
+    try:
+        parser = ReadingParser(fmt, known_devices=await run_in_threadpool(load_device_ids, conn))
+        batch = []
+
+        def _copy(rows, months, touched):
+            # Fehlende Partitionen vorher anlegen, sonst landet alles in readings_default
+            if months:
+                ensure_months(conn, months)
+            # Readings und ihre Anomalien in einer Transaktion
+            count = copy_batch(conn, rows, commit=False)
+            if anomaly.detector is not None:
+                hits = anomaly.detector.process([r[0] for r in rows], [r[3] for r in rows], [r[2] for r in rows])
+                stats["anomalies"] += anomaly.write(conn, hits)
+            conn.commit()
+            if rollups.ROLLUPS_ON_INGEST:
+                rollups.refresh(conn, touched)
+            return count
+
+        async def _submit(rows):
+            nonlocal inflight, accepted
+            # Höchstens ein COPY gleichzeitig; Parsen läuft währenddessen weiter
+            if inflight is not None:
+                accepted += await inflight
+            months = parser.months - known_months
+            known_months.update(months)
+            touched, parser.touched = parser.touched, rollups.TouchedRanges()
+            inflight = asyncio.ensure_future(run_in_threadpool(_copy, rows, months, touched))
+
+        async for data in chunks:
+            for row in await run_in_threadpool(parser.parse, data):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    await _submit(batch)
+                    batch = []
+        batch.extend(parser.flush())
+        if batch:
+            await _submit(batch)
+        if inflight is not None:
+            accepted += await inflight
+            inflight = None
+    finally:
+        if inflight is not None:
+            try:
+                await inflight
+            except Exception:
+                pass
+        await run_in_threadpool(conn.close)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "accepted": accepted,
+        "rejected": parser.rejected,
+        "errors": parser.errors,
+        "anomalies": stats["anomalies"],
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(accepted / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,198 @@
+"""
+🌙 Luna IEMS – Vektorisierte Empfehlungs-Engine
+
+Lädt je Block von RECO_DEVICE_CHUNK Geräten die Stundenwerte der letzten
+RECO_WINDOW_DAYS Tage aus readings_rollup_1h als Matrix (Geräte × Stunden)
+und berechnet alle Signale spaltenweise mit NumPy:
+
+- baseload:   hohe Grundlast (10-%-Perzentil im Verhältnis zum Median)
+- peak:       Lastspitzen (Maximum im Verhältnis zum Mittelwert)
+- load_shift: hoher Verbrauchsanteil in den Hochpreisstunden RECO_PEAK_HOURS
+- anomaly:    letzter Tag weicht stark von den Vortagen ab (z-Score)
+
+Die Texte kommen aus Vorlagen; optional formuliert das LLM die
+RECO_LLM_TOP_N wichtigsten Empfehlungen eines Laufs um. Geschrieben wird per COPY.
+"""
+import os
+import time
+import heapq
+import warnings
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import db, embed, rollups
+
+RECO_WINDOW_DAYS = int(os.getenv("RECO_WINDOW_DAYS", "14"))
+RECO_DEVICE_CHUNK = int(os.getenv("RECO_DEVICE_CHUNK", "5000"))
+RECO_MIN_COVERAGE = float(os.getenv("RECO_MIN_COVERAGE", "0.5"))
+RECO_PEAK_HOURS = os.getenv("RECO_PEAK_HOURS", "17-20")
+RECO_BASELOAD_RATIO = float(os.getenv("RECO_BASELOAD_RATIO", "0.6"))
+RECO_PEAK_RATIO = float(os.getenv("RECO_PEAK_RATIO", "4.0"))
+RECO_SHIFT_FACTOR = float(os.getenv("RECO_SHIFT_FACTOR", "1.5"))
+RECO_ANOMALY_Z = float(os.getenv("RECO_ANOMALY_Z", "3.0"))
+RECO_LLM_TOP_N = int(os.getenv("RECO_LLM_TOP_N", "0"))
+RECO_LLM_CONCURRENCY = int(os.getenv("RECO_LLM_CONCURRENCY", "2"))
+
+COPY_SQL = "COPY recommendations (device_id, kind, score, recommendation_text, created_at) FROM STDIN"
+
+TEMPLATES = {
+    "baseload": ("Die Grundlast liegt bei {base:.2f} und damit bei {base_ratio:.0%} des typischen Verbrauchs. "
+                 "Prüfen Sie Standby-Geräte und Dauerverbraucher."),
+    "peak": ("Lastspitzen bis {peak:.2f} – das {peak_ratio:.1f}-Fache des Durchschnitts. "
+             "Große Verbraucher zeitlich zu entzerren senkt die Spitzenlast."),
+    "load_shift": ("{share:.0%} des Verbrauchs fällt in die Hochpreiszeit ({hours} Uhr). "
+                   "Verschieben Sie flexible Lasten in günstigere Stunden."),
+    "anomaly": ("Der Verbrauch der letzten 24 Stunden weicht stark vom Üblichen ab (z = {z:+.1f}). "
+                "Bitte Gerät und Zähler prüfen."),
+}
+
+LLM_SYSTEM = ("Du bist Luna, eine Energieberaterin. Formuliere die folgende Empfehlung in ein bis zwei "
+              "freundlichen, konkreten Sätzen auf Deutsch um. Keine neuen Zahlen erfinden.")
+
+
+def _peak_hours(spec: str) -> list:
+    """'17-20' → [17, 18, 19, 20]; '7-9,17-20' ist ebenfalls erlaubt."""
+    hours = set()
+    for part in spec.split(","):
+        lo, _, hi = part.strip().partition("-")
+        hours.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(h % 24 for h in hours)
+
+
+PEAK_HOURS = _peak_hours(RECO_PEAK_HOURS)
+
+
+def window(now: datetime | None = None, days: int = RECO_WINDOW_DAYS):
+    """Stundengenaues Auswertungsfenster [start, end), endet mit der letzten vollen Stunde."""
+    end = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    return end - timedelta(days=days), end
+
+
+def signals(matrix: np.ndarray, start_hour: int = 0) -> dict:
+    """Berechnet alle Kennzahlen vektoriell über alle Geräte (Zeilen)."""
+    n_dev, hours = matrix.shape
+    days = hours // 24
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        coverage = np.isfinite(matrix).mean(axis=1)
+        mean = np.nanmean(matrix, axis=1)
+        median = np.nanmedian(matrix, axis=1)
+        base = np.nanpercentile(matrix, 10, axis=1)
+        peak = np.nanmax(matrix, axis=1)
+
+        hod = (start_hour + np.arange(hours)) % 24
+        in_peak = np.isin(hod, PEAK_HOURS)
+        total = np.nansum(matrix, axis=1)
+        share = np.nansum(matrix[:, in_peak], axis=1) / total
+        expected = in_peak.mean()
+
+        daily = np.nanmean(matrix[:, hours - days * 24:].reshape(n_dev, days, 24), axis=2)
+        hist = daily[:, :-1]
+        z = (daily[:, -1] - np.nanmean(hist, axis=1)) / np.nanstd(hist, axis=1)
+
+    ok = (coverage >= RECO_MIN_COVERAGE) & (mean > 0)
+    return {
+        "ok": ok,
+        "base": base, "baseload_ratio": base / median,
+        "peak": peak, "peak_ratio": peak / mean,
+        "share": share, "shift_factor": share / expected if expected else np.zeros(n_dev),
+        "z": z,
+    }
+
+
+def recommend(device_ids: np.ndarray, sig: dict) -> list:
+    """Liefert [(device_id, kind, score, text)] für alle Signale über ihrer Schwelle."""
+    ok = sig["ok"]
+    scores = {
+        "baseload": sig["baseload_ratio"] / RECO_BASELOAD_RATIO,
+        "peak": sig["peak_ratio"] / RECO_PEAK_RATIO,
+        "load_shift": sig["shift_factor"] / RECO_SHIFT_FACTOR,
+        "anomaly": np.abs(sig["z"]) / RECO_ANOMALY_Z,
+    }
+    hours = f"{PEAK_HOURS[0]}–{PEAK_HOURS[-1] + 1}" if PEAK_HOURS else "-"
+    out = []
+    for kind, score in scores.items():
+        hit = np.flatnonzero(ok & np.isfinite(score) & (score >= 1.0))
+        for i in hit:
+            fields = {
+                "base": sig["base"][i], "base_ratio": sig["baseload_ratio"][i],
+                "peak": sig["peak"][i], "peak_ratio": sig["peak_ratio"][i],
+                "share": sig["share"][i], "hours": hours, "z": sig["z"][i],
+            }
+            out.append((int(device_ids[i]), kind, round(float(score[i]), 3), TEMPLATES[kind].format(**fields)))
+    return out
+
+
+def _write(conn, rows: list, created_at: datetime) -> int:
+    with conn.cursor() as cur:
+        with cur.copy(COPY_SQL) as copy:
+            for device_id, kind, score, text in rows:
+                copy.write_row((device_id, kind, score, text, created_at))
+    conn.commit()
+    return len(rows)
+
+
+def _rephrase(conn, top: list, created_at: datetime) -> int:
+    """Lässt das LLM die wichtigsten Empfehlungen umformulieren (Fehler → Vorlage bleibt)."""
+    with ThreadPoolExecutor(max(1, RECO_LLM_CONCURRENCY)) as pool:
+        texts = list(pool.map(lambda r: embed.generate(LLM_SYSTEM, r[3]), top))
+    updates = [(text, r[0], r[1], created_at) for r, text in zip(top, texts)
+               if text and not text.startswith("[Fehler")]
+    if updates:
+        with conn.cursor() as cur:
+            cur.executemany(
+                "UPDATE recommendations SET recommendation_text = %s "
+                "WHERE device_id = %s AND kind = %s AND created_at = %s", updates)
+        conn.commit()
+    return len(updates)
+
+
+def run(device_ids=None, now: datetime | None = None, days: int = RECO_WINDOW_DAYS,
+        llm_top_n: int = RECO_LLM_TOP_N) -> dict:
+    """Berechnet Empfehlungen für device_ids (Standard: alle Geräte) und speichert sie."""
+    t0 = time.perf_counter()
+    start, end = window(now, days)
+    hours = days * 24
+    created_at = datetime.now()
+    written = 0
+    top = []
+    with db.connection() as conn:
+        if device_ids is None:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM devices ORDER BY id")
+                device_ids = [r[0] for r in cur.fetchall()]
+        ids = np.unique(np.asarray(device_ids, dtype=np.int64))
+        for offset in range(0, len(ids), RECO_DEVICE_CHUNK):
+            chunk = ids[offset:offset + RECO_DEVICE_CHUNK]
+            matrix = rollups.load_matrix(conn, chunk, start, hours, resolution="1h")
+            rows = recommend(chunk, signals(matrix, start.hour))
+            written += _write(conn, rows, created_at)
+            if llm_top_n > 0:
+                top = heapq.nlargest(llm_top_n, top + rows, key=lambda r: r[2])
+        rephrased = _rephrase(conn, top, created_at) if top else 0
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "devices": len(ids),
+        "recommendations": written,
+        "llm_rephrased": rephrased,
+        "window": [start.isoformat(), end.isoformat()],
+        "seconds": round(elapsed, 3),
+    }
+
+
+def latest(conn, device_id: int) -> list:
+    """Empfehlungen des letzten Laufs für ein Gerät, wichtigste zuerst."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, kind, score, recommendation_text, created_at FROM recommendations
+            WHERE device_id = %(d)s
+              AND created_at = (SELECT max(created_at) FROM recommendations WHERE device_id = %(d)s)
+            ORDER BY score DESC
+        """, {"d": device_id})
+        return [
+            {"id": i, "kind": k, "score": s, "text": t, "created_at": c.isoformat() if c else None}
+            for i, k, s, t, c in cur.fetchall()
+        ]
@@ -0,0 +1,130 @@
+"""
+🌙 Luna IEMS – Async-Repositories für `models`
+
+Typisierte Abfragen auf einer AsyncSession (db.get_session). Beziehungen
+werden nur explizit geladen: selectinload für 1:n (eine Zusatzabfrage je
+Beziehung statt je Zeile), joinedload für n:1. Alles Übrige ist per
+raiseload gesperrt – ein vergessenes Eager-Loading fällt sofort als Fehler
+auf statt als N+1-Abfrageserie.
+
+Device.readings wird nie eager geladen (Millionen Zeilen); Readings gibt es
+nur zeitlich begrenzt (readings_for_device) oder als letzter Wert je Gerät.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, func, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload, selectinload, raiseload
+
+from models import User, Device, Reading, Recommendation
+
+
+# -------------------------------------------------------------
+# User
+# -------------------------------------------------------------
+async def get_user(session: AsyncSession, user_id: int, with_devices: bool = True) -> User | None:
+    options = [selectinload(User.devices).options(raiseload("*"))] if with_devices else []
+    result = await session.execute(
+        select(User).where(User.id == user_id).options(*options, raiseload("*")))
+    return result.scalar_one_or_none()
+
+
+async def list_users(session: AsyncSession, limit: int = 100, offset: int = 0,
+                     with_devices: bool = False) -> list[User]:
+    options = [selectinload(User.devices).options(raiseload("*"))] if with_devices else []
+    result = await session.execute(
+        select(User).order_by(User.id).limit(limit).offset(offset).options(*options, raiseload("*")))
+    return list(result.scalars())
+
+
+async def create_user(session: AsyncSession, name: str, email: str | None = None) -> User:
+    """Legt einen User an (flush, kein Commit)."""
+    user = User(name=name, email=email)
+    session.add(user)
+    await session.flush()
+    return user
+
+
+# -------------------------------------------------------------
+# Device
+# -------------------------------------------------------------
+async def get_device(session: AsyncSession, device_id: int) -> Device | None:
+    """Gerät mit Besitzer (eine Abfrage)."""
+    result = await session.execute(
+        select(Device).where(Device.id == device_id)
+        .options(joinedload(Device.owner).options(raiseload("*")), raiseload("*")))
+    return result.scalar_one_or_none()
+
+
+async def list_devices(session: AsyncSession, user_id: int | None = None,
+                       limit: int = 100, offset: int = 0) -> list[Device]:
+    """Geräte (optional eines Users) mit Besitzer, nach ID sortiert."""
+    stmt = select(Device).order_by(Device.id).limit(limit).offset(offset)
+    if user_id is not None:
+        stmt = stmt.where(Device.user_id == user_id)
+    result = await session.execute(
+        stmt.options(joinedload(Device.owner).options(raiseload("*")), raiseload("*")))
+    return list(result.scalars())
+
+
+async def create_device(session: AsyncSession, name: str, type: str, user_id: int | None = None) -> Device:
+    """Legt ein Gerät an (flush, kein Commit)."""
+    device = Device(name=name, type=type, user_id=user_id)
+    session.add(device)
+    await session.flush()
+    return device
+
+
+# -------------------------------------------------------------
+# Reading
+# -------------------------------------------------------------
+async def readings_for_device(session: AsyncSession, device_id: int, start: datetime, end: datetime,
+                              limit: int = 10000) -> list[Reading]:
+    """Readings eines Geräts in [start, end), zeitlich sortiert (Partition-Pruning über timestamp)."""
+    result = await session.execute(
+        select(Reading)
+        .where(Reading.device_id == device_id, Reading.timestamp >= start, Reading.timestamp < end)
+        .order_by(Reading.timestamp).limit(limit).options(raiseload("*")))
+    return list(result.scalars())
+
+
+async def latest_readings(session: AsyncSession, device_ids: list[int]) -> dict[int, Reading]:
+    """
+    Letztes Reading je Gerät in einer Abfrage: LATERAL-Join mit LIMIT 1 je
+    Gerät nutzt ix_readings_device_id_timestamp, statt alle Readings zu lesen.
+    """
+    if not device_ids:
+        return {}
+    last = (
+        select(Reading).where(Reading.device_id == Device.id)
+        .order_by(Reading.timestamp.desc()).limit(1).lateral()
+    )
+    reading = aliased(Reading, last)
+    result = await session.execute(
+        select(reading).select_from(Device).join(last, true())
+        .where(Device.id.in_(device_ids)).options(raiseload("*")))
+    return {r.device_id: r for r in result.scalars()}
+
+
+# -------------------------------------------------------------
+# Recommendation
+# -------------------------------------------------------------
+async def latest_recommendations(session: AsyncSession, device_id: int) -> list[Recommendation]:
+    """Empfehlungen des letzten Engine-Laufs für ein Gerät, wichtigste zuerst."""
+    last_run = (select(func.max(Recommendation.created_at))
+                .where(Recommendation.device_id == device_id).scalar_subquery())
+    result = await session.execute(
+        select(Recommendation)
+        .where(Recommendation.device_id == device_id, Recommendation.created_at == last_run)
+        .order_by(Recommendation.score.desc()).options(raiseload("*")))
+    return list(result.scalars())
+
+
+async def recommendations_for_user(session: AsyncSession, user_id: int, limit: int = 100) -> list[Recommendation]:
+    """Neueste Empfehlungen über alle Geräte eines Users, jeweils mit Gerät."""
+    result = await session.execute(
+        select(Recommendation).join(Recommendation.device)
+        .where(Device.user_id == user_id)
+        .order_by(Recommendation.created_at.desc(), Recommendation.score.desc()).limit(limit)
+        .options(joinedload(Recommendation.device).options(raiseload("*")), raiseload("*")))
+    return list(result.scalars())
@@ -0,0 +1,138 @@
+"""
+🌙 Luna IEMS – Readings-Rollups (15 min, Stunde, Tag)
+
+Die Aggregattabellen readings_rollup_{15m,1h,1d} (Migration c3d8a1f7e2b5)
+werden inkrementell gepflegt: Nach jedem Ingest-Batch werden nur die Buckets
+neu berechnet, die die neuen Daten berühren (SQL-Funktion
+readings_refresh_rollups). Abfragen wählen die feinste Auflösung, deren
+Punktanzahl noch ins Budget max_points passt.
+"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ROLLUPS_ON_INGEST = os.getenv("ROLLUPS_ON_INGEST", "1").lower() not in {"0", "false", "no", "off"}
+ROLLUP_MAX_POINTS = int(os.getenv("ROLLUP_MAX_POINTS", "1000"))
+
+# Name → (Bucket-Breite, Tabelle), fein nach grob
+RESOLUTIONS = {
+    "15m": (timedelta(minutes=15), "readings_rollup_15m"),
+    "1h": (timedelta(hours=1), "readings_rollup_1h"),
+    "1d": (timedelta(days=1), "readings_rollup_1d"),
+}
+
+
+class TouchedRanges:
+    """Sammelt je Gerät den kleinsten/größten Zeitstempel eines Batches."""
+
+    def __init__(self):
+        self.ranges: dict[int, list] = {}
+
+    def add(self, device_id: int, ts: datetime):
+        r = self.ranges.get(device_id)
+        if r is None:
+            self.ranges[device_id] = [ts, ts]
+        elif ts < r[0]:
+            r[0] = ts
+        elif ts > r[1]:
+            r[1] = ts
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+
+def refresh(conn, touched: TouchedRanges) -> int:
+    """Aggregiert alle berührten Buckets neu und committet. Liefert die Anzahl Geräte."""
+    if not touched:
+        return 0
+    devices = list(touched.ranges)
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT readings_refresh_rollups(%s::integer[], %s::timestamp[], %s::timestamp[])",
+            (devices, [touched.ranges[d][0] for d in devices], [touched.ranges[d][1] for d in devices]),
+        )
+    conn.commit()
+    return len(devices)
+
+
+def rebuild(conn, start: datetime | None = None, end: datetime | None = None) -> int:
+    """Berechnet die Rollups aller Geräte (optional nur für [start, end]) neu."""
+    touched = TouchedRanges()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT device_id, min("timestamp"), max("timestamp") FROM readings
+            WHERE device_id IS NOT NULL
+              AND (%(start)s::timestamp IS NULL OR "timestamp" >= %(start)s)
+              AND (%(end)s::timestamp IS NULL OR "timestamp" <= %(end)s)
+            GROUP BY device_id
+        """, {"start": start, "end": end})
+        for device_id, t_from, t_to in cur.fetchall():
+            touched.ranges[device_id] = [t_from, t_to]
+    return refresh(conn, touched)
+
+
+MATRIX_SQL = """
+    SELECT string_agg(int4send(device_id), ''),
+           string_agg(int4send(floor(extract(epoch FROM bucket - %(start)s) / %(width)s)::int), ''),
+           string_agg(float8send(sum / n), '')
+    FROM {table}
+    WHERE device_id = ANY(%(devices)s) AND bucket >= %(start)s AND bucket < %(end)s
+"""
+
+
+def load_matrix(conn, device_ids: np.ndarray, start: datetime, intervals: int,
+                resolution: str = "1h") -> np.ndarray:
+    """
+    Bucket-Mittelwerte als float32-Matrix (Geräte × Intervalle) ab start;
+    device_ids muss sortiert sein, fehlende Buckets sind NaN.
+    """
+    width, table = RESOLUTIONS[resolution]
+    matrix = np.full((len(device_ids), intervals), np.nan, dtype=np.float32)
+    with conn.cursor(binary=True) as cur:
+        cur.execute(MATRIX_SQL.format(table=table), {
+            "devices": [int(d) for d in device_ids], "start": start,
+            "end": start + width * intervals, "width": width.total_seconds(),
+        })
+        dev_raw, idx_raw, val_raw = cur.fetchone()
+    if dev_raw:
+        rows = np.searchsorted(device_ids, np.frombuffer(dev_raw, dtype=">i4"))
+        matrix[rows, np.frombuffer(idx_raw, dtype=">i4")] = np.frombuffer(val_raw, dtype=">f8")
+    return matrix
+
+
+def pick_resolution(start: datetime, end: datetime, max_points: int = ROLLUP_MAX_POINTS) -> str:
+    """Feinste Auflösung mit höchstens max_points Buckets; sonst die gröbste."""
+    span = end - start
+    for name, (width, _) in RESOLUTIONS.items():
+        if span / width <= max_points:
+            return name
+    return name
+
+
+def query(conn, device_id: int, start: datetime, end: datetime,
+          max_points: int = ROLLUP_MAX_POINTS, resolution: str | None = None) -> dict:
+    """Liefert die Aggregat-Buckets eines Geräts im Zeitraum [start, end)."""
+    resolution = resolution or pick_resolution(start, end, max_points)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unbekannte Auflösung '{resolution}' (erlaubt: {', '.join(RESOLUTIONS)})")
+    width, table = RESOLUTIONS[resolution]
+    with conn.cursor() as cur:
+        # Der Bucket, in dem start liegt, gehört mit dazu
+        cur.execute(f"""
+            SELECT bucket, n, sum, min, max FROM {table}
+            WHERE device_id = %s AND bucket > %s AND bucket < %s
+            ORDER BY bucket
+        """, (device_id, start - width, end))
+        rows = cur.fetchall()
+    return {
+        "device_id": device_id,
+        "resolution": resolution,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "points": len(rows),
+        "buckets": [
+            {"bucket": b.isoformat(), "count": n, "sum": s, "avg": s / n if n else None, "min": lo, "max": hi}
+            for b, n, s, lo, hi in rows
+        ],
+    }
@@ -0,0 +1,133 @@
+"""
+🌙 Luna IEMS – Zeitreihen-Abfrage mit serverseitigem Downsampling
+
+Readings eines Geräts werden monatsweise (entlang der Partitionen) als
+gepackte float8-Blöcke gelesen und direkt in NumPy-Arrays (Zeit in epoch-ms,
+Wert) dekodiert – ohne Python-Objekt pro Zeile.
+Anschließend wird auf max_points reduziert:
+- "lttb":   Largest-Triangle-Three-Buckets (erhält die visuelle Form)
+- "minmax": Minimum und Maximum je Bucket (erhält Spitzen, z. B. Lastspitzen)
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+
+SERIES_MAX_POINTS = int(os.getenv("SERIES_MAX_POINTS", "2000"))
+SERIES_POINTS_LIMIT = int(os.getenv("SERIES_POINTS_LIMIT", "20000"))
+MODES = ("lttb", "minmax")
+
+# Je Zeitfenster eine Zeile mit zwei bytea-Spalten (big-endian float8) → np.frombuffer,
+# statt Millionen Einzelzeilen durch den Treiber zu reichen.
+SERIES_SQL = """
+    SELECT string_agg(float8send((extract(epoch FROM "timestamp") * 1000)::float8), '' ORDER BY "timestamp"),
+           string_agg(float8send(value), '' ORDER BY "timestamp")
+    FROM readings
+    WHERE device_id = %s AND "timestamp" >= %s AND "timestamp" < %s
+"""
+
+
+def _month_windows(start: datetime, end: datetime):
+    """Zerlegt [start, end) an Monatsgrenzen (= Partitionsgrenzen von readings)."""
+    lo = start
+    while lo < end:
+        nxt = datetime(lo.year + lo.month // 12, lo.month % 12 + 1, 1)
+        hi = min(nxt, end)
+        yield lo, hi
+        lo = hi
+
+
+def fetch(conn, device_id: int, start: datetime, end: datetime):
+    """Liefert (t_ms, values) als float64-Arrays, zeitlich sortiert – monatsweise gelesen."""
+    t_parts, v_parts = [], []
+    with conn.cursor(binary=True) as cur:
+        for lo, hi in _month_windows(start, end):
+            cur.execute(SERIES_SQL, (device_id, lo, hi))
+            t_raw, v_raw = cur.fetchone()
+            if t_raw:
+                t_parts.append(np.frombuffer(t_raw, dtype=">f8").astype(np.float64))
+                v_parts.append(np.frombuffer(v_raw, dtype=">f8").astype(np.float64))
+    if not t_parts:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(t_parts), np.concatenate(v_parts)
+
+
+# -------------------------------------------------------------
+# Downsampling
+# -------------------------------------------------------------
+def lttb(t: np.ndarray, v: np.ndarray, n_out: int):
+    """Largest-Triangle-Three-Buckets; erster und letzter Punkt bleiben erhalten."""
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return t, v
+    # Bucket-Grenzen für die n-2 inneren Punkte
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Mittelwert des jeweils folgenden Buckets, vektoriell über kumulative Summen
+    ct, cv = np.concatenate(([0.0], np.cumsum(t))), np.concatenate(([0.0], np.cumsum(v)))
+    nxt_lo, nxt_hi = edges[1:], np.append(edges[2:], n)
+    cnt = np.maximum(nxt_hi - nxt_lo, 1)
+    avg_t = (ct[nxt_hi] - ct[nxt_lo]) / cnt
+    avg_v = (cv[nxt_hi] - cv[nxt_lo]) / cnt
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ta, va = t[a], v[a]
+        # doppelte Dreiecksfläche zwischen Punkt a, Kandidaten und Mittel des nächsten Buckets
+        area = np.abs((ta - avg_t[i]) * (v[lo:hi] - va) - (ta - t[lo:hi]) * (avg_v[i] - va))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return t[idx], v[idx]
+
+
+def minmax(t: np.ndarray, v: np.ndarray, n_out: int):
+    """Minimum und Maximum je Bucket (n_out/2 Buckets gleicher Punktanzahl), zeitlich sortiert."""
+    n = len(t)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return t, v
+    # Bucket-Grenzen wie bei lttb; n > n_out → jeder Bucket hat mindestens zwei Punkte
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    counts = np.diff(edges)
+    picks = []
+    for reduce in (np.minimum, np.maximum):
+        pos = np.flatnonzero(v == np.repeat(reduce.reduceat(v, edges[:-1]), counts))
+        # pos ist sortiert → erster Treffer je Bucket (wie argmin/argmax)
+        bucket = np.searchsorted(edges, pos, side="right")
+        picks.append(pos[np.r_[True, bucket[1:] != bucket[:-1]]])
+    idx = np.unique(np.concatenate(picks))
+    return t[idx], v[idx]
+
+
+def downsample(t, v, max_points: int = SERIES_MAX_POINTS, mode: str = "lttb"):
+    if mode not in MODES:
+        raise ValueError(f"Unbekannter Modus '{mode}' (erlaubt: {', '.join(MODES)})")
+    if len(t) <= max_points:
+        return t, v
+    return lttb(t, v, max_points) if mode == "lttb" else minmax(t, v, max_points)
+
+
+# -------------------------------------------------------------
+# Ausgabeformate
+# -------------------------------------------------------------
+def to_binary(t, v) -> bytes:
+    """n × int64 epoch-ms (little endian), gefolgt von n × float32."""
+    return t.astype("<i8").tobytes() + v.astype("<f4").tobytes()
+
+
+def to_arrow(t, v) -> bytes:
+    """Arrow-IPC-Stream mit den Spalten t (timestamp[ms]) und v (float32)."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("format=arrow benötigt 'pyarrow'.") from e
+    table = pa.table({
+        "t": pa.array(t.astype("int64"), type=pa.timestamp("ms")),
+        "v": pa.array(v.astype("float32")),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
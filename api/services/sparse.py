@@ -0,0 +1,78 @@
+"""
+🌙 Luna IEMS – BM25-Sparse-Vektoren für die hybride Suche
+
+Jeder Chunk bekommt neben dem Dense-Embedding einen Sparse-Vektor mit den
+BM25-Termgewichten (tf-Sättigung mit k1/b, Längennormierung über
+BM25_AVG_LEN). Die IDF rechnet Qdrant selbst (Sparse-Vektor mit
+Modifier.IDF) – der Index bleibt ohne eigene Korpusstatistik aktuell.
+
+Tokenisierung bewusst ohne Stemming: exakte Begriffe wie Tarifcodes
+("NT-2", "HT/NT"), Paragraphen ("§ 14a" → "§14a" und "14a") oder Normen
+("DIN VDE 0100") sollen genau treffen; dafür sind Dense-Vektoren zuständig,
+wenn es um Bedeutung geht. Terme werden per CRC32 auf Indizes abgebildet
+(stabil über Prozesse, Kollisionen sind bei 2³² Plätzen vernachlässigbar).
+"""
+import os
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client import models as qm
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Durchschnittliche Chunk-Länge in Termen (CHUNK_MAX_TOKENS=512 ≈ 250–300 Wörter)
+BM25_AVG_LEN = float(os.getenv("BM25_AVG_LEN", "256"))
+
+# Wort, optional mit "§" davor und Binnen-Trennern ("nt-2", "0,25", "ht/nt", "3.1")
+TERM_RE = re.compile(r"§?\w+(?:[-./,]\w+)*")
+PARAGRAPH_RE = re.compile(r"§\s+(?=\w)")
+
+STOPWORDS = frozenset("""
+aber als am an auch auf aus bei bin bis bist da damit dann das dass dein deine dem den der des dich die dies
+diese dieser dieses dir doch dort du durch ein eine einem einen einer eines er es euer eure für hat hatte
+hier ich ihr ihre im in ins ist ja jede jeder jedes kann kein keine mit muss nach nicht noch nun nur ob oder
+ohne sehr sein seine sich sie sind so soll über um und uns unser unter vom von vor war wann warum was weil
+welche welcher wenn wer werden wie wieder wir wird wo zu zum zur zwischen
+a an and are as at be by for from has have how in is it of on or that the this to was what when where which
+who why will with
+""".split())
+
+
+def terms(text: str) -> list:
+    """Kleingeschriebene Suchterme ohne Stoppwörter; "§ 14a" zählt als "§14a" und "14a"."""
+    out = []
+    for t in TERM_RE.findall(PARAGRAPH_RE.sub("§", text.lower())):
+        if t in STOPWORDS:
+            continue
+        out.append(t)
+        if t[0] == "§" and len(t) > 1:
+            out.append(t[1:])
+        elif "-" in t or "/" in t:
+            # "ht/nt" → auch "ht", "nt"; Zahlen mit Punkt/Komma bleiben ganz
+            out.extend(p for p in re.split(r"[-/]", t) if len(p) > 1 and p not in STOPWORDS)
+    return out
+
+
+def _index(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _vector(weights: dict) -> qm.SparseVector:
+    return qm.SparseVector(indices=list(weights), values=list(weights.values()))
+
+
+def encode_document(text: str) -> qm.SparseVector:
+    """BM25-Termgewichte eines Chunks (ohne IDF)."""
+    tf = Counter(terms(text))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(tf.values()) / BM25_AVG_LEN)
+    weights = {}
+    for term, n in tf.items():
+        i = _index(term)
+        weights[i] = weights.get(i, 0.0) + n * (BM25_K1 + 1) / (n + norm)
+    return _vector(weights)
+
+
+def encode_query(text: str) -> qm.SparseVector:
+    """Anfrage-Vektor: jeder Term einmal mit Gewicht 1 (die IDF kommt von Qdrant)."""
+    return _vector({_index(t): 1.0 for t in dict.fromkeys(terms(text))})
@@ -1,10 +1,42 @@
-import os, requests
+import os, requests, httpx
+from . import http_pool
 TIKA_HOST = os.getenv("TIKA_HOST", "tika")
 TIKA_PORT = os.getenv("TIKA_PORT", "9998")
 TIKA_URL = f"http://{TIKA_HOST}:{TIKA_PORT}/tika"
 HEADERS = {"Accept": "text/plain"}
+STREAM_CHUNK_SIZE = int(os.getenv("TIKA_STREAM_CHUNK_SIZE", "65536"))
 
 def extract_text(file_bytes: bytes, filename: str) -> str:
     r = requests.put(TIKA_URL, headers=HEADERS, data=file_bytes, timeout=60)
     r.raise_for_status()
     return r.text
+
+def extract_text_stream(fileobj, filename: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Streamt ein File-Objekt zu Tika und liefert den extrahierten Text stückweise."""
+    r = requests.put(TIKA_URL, headers=HEADERS, data=fileobj, timeout=(10, 600), stream=True)
+    try:
+        r.raise_for_status()
+        if not r.encoding:
+            r.encoding = "utf-8"
+        for piece in r.iter_content(chunk_size=chunk_size, decode_unicode=True):
+            if piece:
+                yield piece
+    finally:
+        r.close()
+
+# -------------------------------------------------------------
+# Async-Varianten (gemeinsamer httpx-Pool)
+# -------------------------------------------------------------
+async def aextract_text(file_bytes: bytes, filename: str) -> str:
+    r = await http_pool.get_client().put(TIKA_URL, headers=HEADERS, content=file_bytes, timeout=60)
+    r.raise_for_status()
+    return r.text
+
+async def aextract_text_stream(content, filename: str):
+    """Streamt Bytes (async Iterator) zu Tika und liefert den extrahierten Text stückweise."""
+    timeout = httpx.Timeout(600.0, connect=10.0)
+    async with http_pool.get_client().stream("PUT", TIKA_URL, headers=HEADERS, content=content, timeout=timeout) as r:
+        r.raise_for_status()
+        async for piece in r.aiter_text(STREAM_CHUNK_SIZE):
+            if piece:
+                yield piece
@@ -0,0 +1,131 @@
+"""partition readings by month
+
+Revision ID: 5b7e2c91d4a0
+Revises: 83f49e9c4063
+Create Date: 2026-10-18 09:12:44.318201
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c91d4a0'
+down_revision: Union[str, None] = '83f49e9c4063'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Monate, die beim Upgrade über das aktuelle Datum hinaus angelegt werden
+MONTHS_AHEAD = 12
+
+
+def upgrade() -> None:
+    # Partitionierte Tabellen brauchen den Partition-Key im Primary Key →
+    # ein FK auf readings.id allein ist nicht mehr möglich.
+    op.drop_constraint('recommendations_reading_id_fkey', 'recommendations', type_='foreignkey')
+    op.alter_column('recommendations', 'reading_id', type_=sa.BigInteger(), existing_type=sa.Integer())
+    op.create_index('ix_recommendations_reading_id', 'recommendations', ['reading_id'])
+
+    op.execute('ALTER TABLE readings RENAME TO readings_legacy')
+    op.execute('ALTER TABLE readings_legacy RENAME CONSTRAINT readings_pkey TO readings_legacy_pkey')
+    op.execute('ALTER TABLE readings_legacy RENAME CONSTRAINT readings_device_id_fkey TO readings_legacy_device_id_fkey')
+    op.execute('ALTER SEQUENCE readings_id_seq AS bigint')
+    op.execute("""
+        CREATE TABLE readings (
+            id bigint NOT NULL DEFAULT nextval('readings_id_seq'),
+            "timestamp" timestamp without time zone NOT NULL,
+            value double precision NOT NULL,
+            device_id integer CONSTRAINT readings_device_id_fkey REFERENCES devices (id),
+            CONSTRAINT readings_pkey PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+    op.execute('ALTER SEQUENCE readings_id_seq OWNED BY readings.id')
+    op.execute('CREATE TABLE readings_default PARTITION OF readings DEFAULT')
+
+    op.create_index('ix_readings_device_id_timestamp', 'readings', ['device_id', 'timestamp'])
+    op.create_index('ix_readings_timestamp_brin', 'readings', ['timestamp'], postgresql_using='brin')
+
+    # Legt die Monatspartition für p_start an. Zeilen, die bisher in der
+    # Default-Partition gelandet sind, werden dabei in die neue Partition verschoben.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION readings_create_partition(p_start date) RETURNS text AS $$
+        DECLARE
+            v_start date := date_trunc('month', p_start)::date;
+            v_end   date := (date_trunc('month', p_start) + interval '1 month')::date;
+            v_name  text := format('readings_%s', to_char(v_start, 'YYYY_MM'));
+        BEGIN
+            IF to_regclass(v_name) IS NOT NULL THEN
+                RETURN v_name;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE readings INCLUDING DEFAULTS)', v_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM readings_default WHERE "timestamp" >= %L AND "timestamp" < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', v_start, v_end, v_name);
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I CHECK ("timestamp" >= %L AND "timestamp" < %L)',
+                v_name, v_name || '_range', v_start, v_end);
+            EXECUTE format('ALTER TABLE readings ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_start, v_end);
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', v_name, v_name || '_range');
+            RETURN v_name;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION readings_ensure_partitions(p_from timestamp, p_to timestamp) RETURNS integer AS $$
+        DECLARE
+            v_month date := date_trunc('month', p_from)::date;
+            v_count integer := 0;
+        BEGIN
+            WHILE v_month <= p_to LOOP
+                PERFORM readings_create_partition(v_month);
+                v_month := (v_month + interval '1 month')::date;
+                v_count := v_count + 1;
+            END LOOP;
+            RETURN v_count;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute(f"""
+        SELECT readings_ensure_partitions(
+            LEAST(COALESCE((SELECT min("timestamp") FROM readings_legacy), now()), now())::timestamp,
+            (now() + interval '{MONTHS_AHEAD} months')::timestamp
+        )
+    """)
+    op.execute("""
+        INSERT INTO readings (id, "timestamp", value, device_id)
+        SELECT id, "timestamp", value, device_id FROM readings_legacy
+    """)
+    op.execute('DROP TABLE readings_legacy')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE readings RENAME TO readings_partitioned')
+    op.execute('ALTER TABLE readings_partitioned RENAME CONSTRAINT readings_pkey TO readings_partitioned_pkey')
+    op.execute('ALTER TABLE readings_partitioned RENAME CONSTRAINT readings_device_id_fkey TO readings_partitioned_device_id_fkey')
+    op.execute('ALTER SEQUENCE readings_id_seq AS integer')
+    op.execute("""
+        CREATE TABLE readings (
+            id integer NOT NULL DEFAULT nextval('readings_id_seq'),
+            "timestamp" timestamp without time zone NOT NULL,
+            value double precision NOT NULL,
+            device_id integer CONSTRAINT readings_device_id_fkey REFERENCES devices (id),
+            CONSTRAINT readings_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO readings (id, "timestamp", value, device_id)
+        SELECT id, "timestamp", value, device_id FROM readings_partitioned
+    """)
+    op.execute('ALTER SEQUENCE readings_id_seq OWNED BY readings.id')
+    op.execute('DROP TABLE readings_partitioned CASCADE')
+    op.execute('DROP FUNCTION IF EXISTS readings_ensure_partitions(timestamp, timestamp)')
+    op.execute('DROP FUNCTION IF EXISTS readings_create_partition(date)')
+
+    op.drop_index('ix_recommendations_reading_id', table_name='recommendations')
+    op.alter_column('recommendations', 'reading_id', type_=sa.Integer(), existing_type=sa.BigInteger())
+    op.create_foreign_key('recommendations_reading_id_fkey', 'recommendations', 'readings',
+                          ['reading_id'], ['id'])
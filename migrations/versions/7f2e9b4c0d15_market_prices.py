@@ -0,0 +1,65 @@
+"""market prices partitioned by year
+
+Revision ID: 7f2e9b4c0d15
+Revises: e41b7d93a6c8
+Create Date: 2026-10-18 16:48:12.604390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2e9b4c0d15'
+down_revision: Union[str, None] = 'e41b7d93a6c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Jahre, die beim Upgrade über das aktuelle Jahr hinaus angelegt werden
+YEARS_AHEAD = 1
+
+
+def upgrade() -> None:
+    # Preise sind klein (35 040 Viertelstunden pro Markt und Jahr) → Jahrespartitionen.
+    # Der Primary Key (market, ts) ist zugleich der Abfrage-Index.
+    op.execute("""
+        CREATE TABLE market_prices (
+            market text NOT NULL,
+            ts timestamp without time zone NOT NULL,
+            price_eur_mwh double precision NOT NULL,
+            CONSTRAINT market_prices_pkey PRIMARY KEY (market, ts)
+        ) PARTITION BY RANGE (ts)
+    """)
+    op.execute('CREATE TABLE market_prices_default PARTITION OF market_prices DEFAULT')
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION market_prices_create_partition(p_start date) RETURNS text AS $$
+        DECLARE
+            v_start date := date_trunc('year', p_start)::date;
+            v_end   date := (date_trunc('year', p_start) + interval '1 year')::date;
+            v_name  text := format('market_prices_%s', to_char(v_start, 'YYYY'));
+        BEGIN
+            IF to_regclass(v_name) IS NOT NULL THEN
+                RETURN v_name;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE market_prices INCLUDING DEFAULTS)', v_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM market_prices_default WHERE ts >= %L AND ts < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', v_start, v_end, v_name);
+            EXECUTE format('ALTER TABLE market_prices ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_start, v_end);
+            RETURN v_name;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        SELECT market_prices_create_partition((date_trunc('year', now()) + make_interval(years => y))::date)
+        FROM generate_series(0, {YEARS_AHEAD}) AS y
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TABLE market_prices CASCADE')
+    op.execute('DROP FUNCTION IF EXISTS market_prices_create_partition(date)')
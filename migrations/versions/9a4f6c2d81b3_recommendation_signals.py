@@ -0,0 +1,34 @@
+"""recommendation device, kind and score
+
+Revision ID: 9a4f6c2d81b3
+Revises: c3d8a1f7e2b5
+Create Date: 2026-10-18 14:05:51.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f6c2d81b3'
+down_revision: Union[str, None] = 'c3d8a1f7e2b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('recommendations', sa.Column('device_id', sa.Integer(), nullable=True))
+    op.add_column('recommendations', sa.Column('kind', sa.String(), nullable=True))
+    op.add_column('recommendations', sa.Column('score', sa.Float(), nullable=True))
+    op.create_foreign_key('recommendations_device_id_fkey', 'recommendations', 'devices', ['device_id'], ['id'])
+    op.create_index('ix_recommendations_device_id_created_at', 'recommendations', ['device_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recommendations_device_id_created_at', table_name='recommendations')
+    op.drop_constraint('recommendations_device_id_fkey', 'recommendations', type_='foreignkey')
+    op.drop_column('recommendations', 'score')
+    op.drop_column('recommendations', 'kind')
+    op.drop_column('recommendations', 'device_id')
@@ -0,0 +1,92 @@
+"""readings rollups (15 min, hourly, daily)
+
+Revision ID: c3d8a1f7e2b5
+Revises: 5b7e2c91d4a0
+Create Date: 2026-10-18 11:40:02.517934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8a1f7e2b5'
+down_revision: Union[str, None] = '5b7e2c91d4a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ('readings_rollup_15m', 'readings_rollup_1h', 'readings_rollup_1d')
+
+
+def upgrade() -> None:
+    for table in ROLLUP_TABLES:
+        op.create_table(table,
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('n', sa.Integer(), nullable=False),
+        sa.Column('sum', sa.Float(), nullable=False),
+        sa.Column('min', sa.Float(), nullable=False),
+        sa.Column('max', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('device_id', 'bucket')
+        )
+
+    # Berechnet die Buckets neu, die von [p_from, p_to] je Gerät berührt werden:
+    # 15 min aus den Rohdaten, Stunde aus 15 min, Tag aus Stunde.
+    # Ein Bucket wird immer vollständig neu aggregiert → verspätete Daten sind unkritisch.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION readings_refresh_rollups(
+            p_devices integer[], p_from timestamp[], p_to timestamp[]
+        ) RETURNS void AS $$
+        BEGIN
+            INSERT INTO readings_rollup_15m (device_id, bucket, n, sum, min, max)
+            SELECT r.device_id, date_bin('15 minutes', r."timestamp", timestamp '2000-01-01'),
+                   count(*), sum(r.value), min(r.value), max(r.value)
+            FROM unnest(p_devices, p_from, p_to) AS t(device_id, t_from, t_to)
+            JOIN readings r ON r.device_id = t.device_id
+             AND r."timestamp" >= date_bin('15 minutes', t.t_from, timestamp '2000-01-01')
+             AND r."timestamp" <  date_bin('15 minutes', t.t_to, timestamp '2000-01-01') + interval '15 minutes'
+            GROUP BY 1, 2
+            ON CONFLICT (device_id, bucket) DO UPDATE
+            SET n = EXCLUDED.n, sum = EXCLUDED.sum, min = EXCLUDED.min, max = EXCLUDED.max;
+
+            INSERT INTO readings_rollup_1h (device_id, bucket, n, sum, min, max)
+            SELECT r.device_id, date_trunc('hour', r.bucket),
+                   sum(r.n), sum(r.sum), min(r.min), max(r.max)
+            FROM unnest(p_devices, p_from, p_to) AS t(device_id, t_from, t_to)
+            JOIN readings_rollup_15m r ON r.device_id = t.device_id
+             AND r.bucket >= date_trunc('hour', t.t_from)
+             AND r.bucket <  date_trunc('hour', t.t_to) + interval '1 hour'
+            GROUP BY 1, 2
+            ON CONFLICT (device_id, bucket) DO UPDATE
+            SET n = EXCLUDED.n, sum = EXCLUDED.sum, min = EXCLUDED.min, max = EXCLUDED.max;
+
+            INSERT INTO readings_rollup_1d (device_id, bucket, n, sum, min, max)
+            SELECT r.device_id, date_trunc('day', r.bucket),
+                   sum(r.n), sum(r.sum), min(r.min), max(r.max)
+            FROM unnest(p_devices, p_from, p_to) AS t(device_id, t_from, t_to)
+            JOIN readings_rollup_1h r ON r.device_id = t.device_id
+             AND r.bucket >= date_trunc('day', t.t_from)
+             AND r.bucket <  date_trunc('day', t.t_to) + interval '1 day'
+            GROUP BY 1, 2
+            ON CONFLICT (device_id, bucket) DO UPDATE
+            SET n = EXCLUDED.n, sum = EXCLUDED.sum, min = EXCLUDED.min, max = EXCLUDED.max;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Backfill aus den vorhandenen Rohdaten
+    op.execute("""
+        SELECT readings_refresh_rollups(array_agg(device_id), array_agg(t_from), array_agg(t_to))
+        FROM (
+            SELECT device_id, min("timestamp") AS t_from, max("timestamp") AS t_to
+            FROM readings WHERE device_id IS NOT NULL GROUP BY device_id
+        ) s
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS readings_refresh_rollups(integer[], timestamp[], timestamp[])')
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_table(table)
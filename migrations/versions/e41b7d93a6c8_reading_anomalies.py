@@ -0,0 +1,39 @@
+"""reading anomalies
+
+Revision ID: e41b7d93a6c8
+Revises: 9a4f6c2d81b3
+Create Date: 2026-10-18 15:22:37.881530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b7d93a6c8'
+down_revision: Union[str, None] = '9a4f6c2d81b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reading_anomalies',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=True),
+    sa.Column('expected', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reading_anomalies_device_id_timestamp', 'reading_anomalies', ['device_id', 'timestamp'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reading_anomalies_device_id_timestamp', table_name='reading_anomalies')
+    op.drop_table('reading_anomalies')
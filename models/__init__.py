@@ -3,5 +3,9 @@ from .user import User
 from .device import Device
 from .reading import Reading
 from .recommendation import Recommendation
+from .reading_anomaly import ReadingAnomaly
+from .market_price import MarketPrice
+from .reading_rollup import ReadingRollup15m, ReadingRollup1h, ReadingRollup1d
 
-__all__ = ["Base", "User", "Device", "Reading", "Recommendation"]
+__all__ = ["Base", "User", "Device", "Reading", "Recommendation", "ReadingAnomaly", "MarketPrice",
+           "ReadingRollup15m", "ReadingRollup1h", "ReadingRollup1d"]
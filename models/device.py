@@ -12,3 +12,4 @@ class Device(Base):
 
     owner = relationship("User", back_populates="devices")
     readings = relationship("Reading", back_populates="device")
+    recommendations = relationship("Recommendation", back_populates="device")
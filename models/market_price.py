@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Float, DateTime
+from .base import Base
+
+class MarketPrice(Base):
+    __tablename__ = "market_prices"
+    # Jährlich nach ts partitioniert (siehe Migration 7f2e9b4c0d15)
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
+
+    market = Column(String, primary_key=True)
+    ts = Column(DateTime, primary_key=True)
+    price_eur_mwh = Column(Float, nullable=False)
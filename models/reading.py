@@ -1,14 +1,25 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class Reading(Base):
     __tablename__ = "readings"
+    # Monatlich nach timestamp partitioniert (siehe Migration 5b7e2c91d4a0);
+    # der Partition-Key muss Teil des Primary Keys sein.
+    __table_args__ = (
+        Index("ix_readings_device_id_timestamp", "device_id", "timestamp"),
+        Index("ix_readings_timestamp_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": 'RANGE ("timestamp")'},
+    )
 
-    id = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime, nullable=False)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False)
     value = Column(Float, nullable=False)
     device_id = Column(Integer, ForeignKey("devices.id"))
 
     device = relationship("Device", back_populates="readings")
-    recommendations = relationship("Recommendation", back_populates="reading")
+    recommendations = relationship(
+        "Recommendation",
+        primaryjoin="Reading.id == foreign(Recommendation.reading_id)",
+        back_populates="reading",
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship
+from .base import Base
+
+class ReadingAnomaly(Base):
+    __tablename__ = "reading_anomalies"
+    __table_args__ = (
+        Index("ix_reading_anomalies_device_id_timestamp", "device_id", "timestamp"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    device_id = Column(Integer, ForeignKey("devices.id"), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+    kind = Column(String, nullable=False)
+    score = Column(Float)
+    expected = Column(Float)
+    created_at = Column(DateTime, nullable=False, server_default=text("now()"))
+
+    device = relationship("Device")
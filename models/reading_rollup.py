@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Float, DateTime
+from .base import Base
+
+class _RollupColumns:
+    """Aggregat je Gerät und Zeit-Bucket (avg = sum / n)."""
+
+    device_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    n = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+class ReadingRollup15m(_RollupColumns, Base):
+    __tablename__ = "readings_rollup_15m"
+
+class ReadingRollup1h(_RollupColumns, Base):
+    __tablename__ = "readings_rollup_1h"
+
+class ReadingRollup1d(_RollupColumns, Base):
+    __tablename__ = "readings_rollup_1d"
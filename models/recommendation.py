@@ -1,13 +1,25 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class Recommendation(Base):
     __tablename__ = "recommendations"
+    __table_args__ = (
+        Index("ix_recommendations_device_id_created_at", "device_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
-    reading_id = Column(Integer, ForeignKey("readings.id"))
+    # Kein FK mehr: readings ist partitioniert (PK = id + timestamp)
+    reading_id = Column(BigInteger, index=True)
+    device_id = Column(Integer, ForeignKey("devices.id"))
+    kind = Column(String)
+    score = Column(Float)
     recommendation_text = Column(String, nullable=False)
     created_at = Column(DateTime)
 
-    reading = relationship("Reading", back_populates="recommendations")
+    reading = relationship(
+        "Reading",
+        primaryjoin="foreign(Recommendation.reading_id) == Reading.id",
+        back_populates="recommendations",
+    )
+    device = relationship("Device", back_populates="recommendations")
@@ -1,6 +1,7 @@
 """
 🌙 Luna IEMS – Mini-Eval (Hit@K, MRR Placeholder)
-Lädt einfache Fragen aus einer optionalen Datei /data/eval/questions.json und misst Antwortlatenz.
+Lädt einfache Fragen aus einer optionalen Datei /data/eval/questions.json und misst
+Time-to-first-Token (über /api/v1/rag/ask/stream) sowie die Gesamtlatenz.
 Struktur:
 [{"q": "Frage 1"}, {"q": "Frage 2"}]
 """
@@ -17,22 +18,42 @@ def load_questions():
     # Fallback
     return [{"q":"Was ist das Luna IEMS?"}]
 
+def ask_stream(q: str):
+    """Fragt den Streaming-Endpoint ab. Liefert (Antwort, TTFT in s, Gesamtzeit in s)."""
+    t0 = time.time()
+    ttft, answer, event = None, "", None
+    with requests.post(f"{BASE_URL}/api/v1/rag/ask/stream", json={"question": q, "top_k": 4},
+                       timeout=120, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "token":
+                if ttft is None:
+                    ttft = time.time() - t0
+                answer += json.loads(line[6:]).get("t", "")
+    return answer, ttft, time.time() - t0
+
 def main():
     qs = load_questions()
-    lats = []
+    ttfts, lats = [], []
     for item in qs:
         q = item["q"]
-        t0 = time.time()
-        r = requests.post(f"{BASE_URL}/api/v1/rag/ask", json={"question": q, "top_k": 4}, timeout=30)
-        dt = time.time() - t0
+        try:
+            answer, ttft, dt = ask_stream(q)
+        except Exception as e:
+            print(f"Q: {q}\n❌ {e}\n")
+            continue
         lats.append(dt)
-        if r.ok:
-            j = r.json()
-            print(f"Q: {q}\n→ {j.get('data',{}).get('answer','<no answer>')[:120]}...\nlat={dt:.2f}s\n")
-        else:
-            print(f"Q: {q}\nHTTP {r.status_code}\n")
+        if ttft is not None:
+            ttfts.append(ttft)
+        ttft_s = f"{ttft:.2f}s" if ttft is not None else "-"
+        print(f"Q: {q}\n→ {(answer or '<no answer>')[:120]}...\nttft={ttft_s} lat={dt:.2f}s\n")
 
-    print(f"⏱️ Decision-Latency (avg): {mean(lats):.2f}s over {len(lats)} queries")
+    if ttfts:
+        print(f"⚡ Time-to-first-Token (avg): {mean(ttfts):.2f}s over {len(ttfts)} queries")
+    if lats:
+        print(f"⏱️ Decision-Latency (avg): {mean(lats):.2f}s over {len(lats)} queries")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+🌙 Luna IEMS – Marktpreis-Simulator (Day-Ahead stündlich, Intraday 15 min)
+
+Day-Ahead je Tag (vektorisiert über alle Stunden):
+    Niveau (Saison, wöchentlich driftend) × Tagesform (Morgen-/Abendspitze,
+    PV-Senke mittags – im Sommer und am Wochenende tiefer)
+    − Windeinspeisung (tageweise gammaverteilt, kann Preise negativ drücken)
+    + seltene Knappheitsspitzen am Abend
+Intraday: Day-Ahead auf 15 min plus Random Walk innerhalb des Tages; die
+Volatilität schwankt tageweise (ruhige und nervöse Tage).
+
+Ausgabe im Format des Preis-Ingests (market, ts, price_eur_mwh), Märkte
+"day_ahead" und "intraday". Reproduzierbar wie smart_meter_sim.py: jeder Tag
+hängt nur von --seed und dem Datum ab.
+
+Live-Modus: Intraday-Preise laufen je 15 min ein, die Day-Ahead-Kurve des
+Folgetags wird wie an der Börse um 12:00 veröffentlicht.
+
+Beispiele:
+    python scripts/market_price_sim.py --days 365 --format csv --out /tmp/prices.csv
+    python scripts/market_price_sim.py --live --speed 3600 --url http://localhost:8000
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import sim_io  # noqa: E402
+from smart_meter_sim import _rng, _bump  # noqa: E402
+
+INGEST_PATH = "/api/v1/market/prices/bulk"
+DA_STEPS, ID_STEPS = 24, 96
+PUBLISH_HOUR = 12
+# Preisgrenzen der Börse (€/MWh)
+PRICE_MIN, PRICE_MAX = -500.0, 4000.0
+
+_DAY, _WEEK = 2, 3
+
+BASE_PRICE = float(os.getenv("SIM_BASE_PRICE", "85"))
+
+
+def _level(seed: int, day: int) -> float:
+    """Preisniveau: wöchentliche Zufallswerte, linear interpoliert (glatt und startunabhängig)."""
+    week, frac = divmod(day, 7)
+    a = _rng(seed, _WEEK, week).normal()
+    b = _rng(seed, _WEEK, week + 1).normal()
+    return float(np.exp(0.2 * (a + (b - a) * frac / 7)))
+
+
+def day_prices(seed: int, day: np.datetime64):
+    """(day_ahead[24], intraday[96]) in €/MWh für einen Kalendertag."""
+    idx = int(day.astype("datetime64[D]").astype(np.int64))
+    doy = int((day - day.astype("datetime64[Y]")).astype(np.int64))
+    weekend = ((idx + 3) % 7) >= 5
+    rng = _rng(seed, _DAY, idx)
+    summer = 0.5 + 0.5 * np.cos(2 * np.pi * (doy - 172) / 365.25)
+
+    h = np.arange(DA_STEPS) + 0.5
+    shape = (1 - 0.3 * _bump(h, 3.5, 2.5) + 0.25 * _bump(h, 8, 1.5) + 0.4 * _bump(h, 19, 1.8)
+             - (0.15 + 0.55 * summer + 0.15 * weekend) * _bump(h, 13, 2.2))
+    level = BASE_PRICE * (1 + 0.2 * (1 - summer)) * _level(seed, idx) * (0.85 if weekend else 1.0)
+    wind = rng.gamma(1.5, 18.0) * (1 + 0.2 * rng.standard_normal(DA_STEPS))
+    da = level * shape - wind + rng.normal(0, 3.0, DA_STEPS)
+    # Knappheit: selten, dann einige Abendstunden mit Faktor 2–5
+    if rng.random() < 0.03:
+        peak = slice(17 + rng.integers(0, 2), 21)
+        da[peak] *= rng.uniform(2, 5)
+    da = np.clip(np.round(da, 2), PRICE_MIN, PRICE_MAX)
+
+    vol = 4.0 * rng.lognormal(0, 0.5)
+    walk = np.cumsum(rng.normal(0, vol / np.sqrt(ID_STEPS / 8), ID_STEPS))
+    intraday = np.repeat(da, ID_STEPS // DA_STEPS) + walk - walk.mean() + rng.normal(0, vol / 2, ID_STEPS)
+    return da, np.clip(np.round(intraday, 2), PRICE_MIN, PRICE_MAX)
+
+
+def _rows(market: str, day: np.datetime64, prices: np.ndarray) -> dict:
+    step = np.timedelta64(24 * 60 // len(prices), "m")
+    return {
+        "market": np.full(len(prices), market),
+        "ts": (day + np.arange(len(prices)) * step).astype("datetime64[s]"),
+        "price_eur_mwh": prices,
+    }
+
+
+def blocks(seed: int, start: np.datetime64, days: int, markets=("day_ahead", "intraday")):
+    """Ein Block je Tag und Markt."""
+    day0 = start.astype("datetime64[D]")
+    for d in range(days):
+        day = day0 + np.timedelta64(d, "D")
+        da, intraday = day_prices(seed, day)
+        for market, prices in (("day_ahead", da), ("intraday", intraday)):
+            if market in markets:
+                yield _rows(market, day, prices)
+
+
+def live_batches(seed: int, start: np.datetime64, days: int):
+    """Intraday je 15 min; Day-Ahead des Folgetags um PUBLISH_HOUR, für den Starttag sofort."""
+    day0 = start.astype("datetime64[D]")
+    header = "market,ts,price_eur_mwh\n"
+    step = np.timedelta64(15, "m")
+    publish = np.timedelta64(PUBLISH_HOUR, "h")
+    first = True
+    for d in range(days):
+        day = day0 + np.timedelta64(d, "D")
+        da, intraday = day_prices(seed, day)
+        if first:
+            yield start, header + sim_io.csv_lines(_rows("day_ahead", day, da))
+            if start >= day + publish:
+                yield start, header + sim_io.csv_lines(_rows("day_ahead", day + 1, day_prices(seed, day + 1)[0]))
+            first = False
+        rows = _rows("intraday", day, intraday)
+        for i in range(ID_STEPS):
+            ts = day + i * step
+            if ts < start:
+                continue
+            yield ts, header + sim_io.csv_lines({k: v[i:i + 1] for k, v in rows.items()})
+            if ts == day + publish:
+                yield ts, header + sim_io.csv_lines(_rows("day_ahead", day + 1, day_prices(seed, day + 1)[0]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Luna IEMS – Marktpreis-Simulator")
+    parser.add_argument("--start", default=None,
+                        help="Startdatum (ISO, Standard: heute bzw. jetzt im Live-Modus)")
+    parser.add_argument("--days", type=int, default=1, help="Anzahl simulierter Tage")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--market", choices=["day_ahead", "intraday"], action="append",
+                        help="Nur diese Märkte ausgeben (mehrfach angebbar, Standard: beide)")
+    parser.add_argument("--format", choices=sim_io.FORMATS, default="ndjson")
+    parser.add_argument("--out", default="-", help="Ausgabedatei ('-' = stdout)")
+    parser.add_argument("--live", action="store_true", help="Preise an die API schicken statt schreiben")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Live: Vielfaches der Echtzeit (0 = so schnell wie möglich)")
+    parser.add_argument("--url", default=os.getenv("LUNA_API_URL", "http://localhost:8000"))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.live:
+        now = datetime.now().replace(second=0, microsecond=0)
+        start = np.datetime64(args.start or now.replace(minute=now.minute - now.minute % 15).isoformat())
+        print(f"📡 Live: Preise ab {start} mit {args.speed:g}× Echtzeit → {args.url}", file=sys.stderr)
+        try:
+            stats = sim_io.replay(live_batches(args.seed, start, args.days), args.speed,
+                                  args.url.rstrip("/") + INGEST_PATH)
+        except KeyboardInterrupt:
+            sys.exit(0)
+        print(f"✅ {stats['batches']} Batches, {stats['stored']} Preise gespeichert, "
+              f"{stats['rejected']} abgelehnt, {stats['failed']} fehlgeschlagen", file=sys.stderr)
+    else:
+        start = np.datetime64(args.start or datetime.now().date().isoformat())
+        markets = tuple(args.market or ("day_ahead", "intraday"))
+        try:
+            rows = sim_io.write(blocks(args.seed, start, args.days, markets), args.format, args.out)
+        except (RuntimeError, ValueError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"✅ {rows} Preise ({args.days} Tage) in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
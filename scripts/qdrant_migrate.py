@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+🌙 Luna IEMS – Qdrant-Collection auf ein Speicherprofil umstellen (ohne Downtime)
+
+Profile (qdrant.PROFILES): default | scalar | product | binary
+
+--in-place  update_collection auf der bestehenden Collection (Quantisierung,
+            On-Disk, HNSW). Qdrant optimiert die Segmente im Hintergrund,
+            Suchen und Upserts laufen weiter.
+Standard    Blue/Green: neue Collection "<QDRANT_COLLECTION>_<profil>_<zeit>"
+            anlegen, alle Punkte kopieren (fehlende BM25-Vektoren werden aus
+            dem Text berechnet), warten bis die Collection indiziert ist, seit
+            Kopierbeginn eingegangene Punkte über ingested_at nachziehen und
+            direkt danach den Alias QDRANT_COLLECTION atomar umschalten.
+            Ist QDRANT_COLLECTION noch eine echte Collection (kein Alias), wird
+            sie gelöscht und sofort durch den Alias ersetzt – die Lücke liegt im
+            Millisekundenbereich; jede weitere Migration schaltet atomar um.
+            Während der Kopie gelöschte Punkte werden nicht nachgezogen →
+            Retraining (train_pipeline) solange pausieren.
+
+--eval N    misst Recall@k der HNSW-/quantisierten Suche gegen die exakte
+            Suche für N gespeicherte Vektoren (mit und ohne Rescoring) samt
+            Latenz – vor und nach der Umstellung ausführen.
+
+API-Prozesse merken sich beim ersten Zugriff, ob die Collection BM25-Vektoren
+hat; nach einer Migration von dense-only auf hybrid neu starten.
+
+Beispiele:
+    python scripts/qdrant_migrate.py --eval 200
+    python scripts/qdrant_migrate.py --profile scalar --eval 200
+    python scripts/qdrant_migrate.py --profile binary --in-place
+"""
+import os
+import sys
+import time
+import argparse
+import itertools
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.services import qdrant  # noqa: E402
+from api.services.qdrant import qm  # noqa: E402
+
+# Puffer für den Nachzug: Uhren von API und Skript müssen nicht exakt übereinstimmen
+CATCH_UP_MARGIN = timedelta(minutes=5)
+GREEN_TIMEOUT = int(os.getenv("QDRANT_MIGRATE_TIMEOUT", "3600"))
+
+
+def ram_per_vector(dim: int, quantization: str | None) -> int:
+    """Bytes je Vektor im RAM (ohne HNSW-Graph und Payload)."""
+    return {"scalar": dim, "product": dim * 4 // 16, "binary": (dim + 7) // 8}.get(quantization, dim * 4)
+
+
+def _quantization_kind(config) -> str | None:
+    for kind, cls in (("scalar", qm.ScalarQuantization), ("product", qm.ProductQuantization),
+                      ("binary", qm.BinaryQuantization)):
+        if isinstance(config, cls):
+            return kind
+    return None
+
+
+def describe(name: str) -> dict:
+    info = qdrant.get_client().get_collection(name)
+    vectors = info.config.params.vectors
+    kind = _quantization_kind(info.config.quantization_config)
+    points = info.points_count or 0
+    ram = points * ram_per_vector(vectors.size, kind) / 2 ** 20
+    print(f"📊 {name}: {points} Punkte, dim={vectors.size}, Quantisierung={kind or '–'}, "
+          f"on_disk={bool(vectors.on_disk)}, m={info.config.hnsw_config.m}, "
+          f"ef_construct={info.config.hnsw_config.ef_construct}, "
+          f"BM25={'ja' if qdrant.SPARSE_VECTOR in (info.config.params.sparse_vectors or {}) else 'nein'}, "
+          f"Vektoren im RAM ≈ {ram:.1f} MiB")
+    return {"dim": vectors.size, "points": points, "quantization": kind}
+
+
+def _point(record, hybrid: bool) -> qm.PointStruct:
+    vec = record.vector
+    dense = vec.get("") if isinstance(vec, dict) else vec
+    bm25 = vec.get(qdrant.SPARSE_VECTOR) if isinstance(vec, dict) else None
+    if hybrid and bm25 is not None:
+        return qm.PointStruct(id=record.id, vector={"": dense, qdrant.SPARSE_VECTOR: bm25}, payload=record.payload)
+    return qdrant.make_point(record.id, dense, record.payload or {}, hybrid)
+
+
+def copy(source: str, target: str, hybrid: bool, scroll_filter=None) -> int:
+    """Kopiert Punkte (inkl. Vektoren) von source nach target; liefert die Anzahl."""
+    batch_size = qdrant.QDRANT_UPSERT_BATCH
+    n, batch = 0, []
+    t0 = time.perf_counter()
+    for record in qdrant.scroll(scroll_filter, batch_size=batch_size, with_vectors=True, collection=source):
+        batch.append(_point(record, hybrid))
+        if len(batch) >= batch_size:
+            n += qdrant.upsert_points(batch, collection=target)
+            batch = []
+            if n % (batch_size * 40) == 0:
+                print(f"   … {n} Punkte kopiert ({n / (time.perf_counter() - t0):.0f}/s)")
+    if batch:
+        n += qdrant.upsert_points(batch, collection=target)
+    return n
+
+
+def wait_green(name: str, timeout: int = GREEN_TIMEOUT):
+    """Wartet, bis Qdrant die Collection fertig optimiert/indiziert hat."""
+    t0 = time.time()
+    while True:
+        status = qdrant.get_client().get_collection(name).status
+        if status == qm.CollectionStatus.GREEN:
+            return
+        if time.time() - t0 > timeout:
+            raise RuntimeError(f"Collection '{name}' nach {timeout}s noch nicht bereit (Status {status})")
+        time.sleep(2)
+
+
+def migrate(profile_name: str, keep_old: bool = False) -> str:
+    """Blue/Green-Migration auf profile_name; liefert den Namen der neuen Collection."""
+    alias = qdrant.COLL
+    source = qdrant.resolve_collection(alias)
+    dim = describe(source)["dim"]
+    target = f"{alias}_{profile_name}_{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+
+    print(f"📦 Lege '{target}' an (Profil {profile_name}) …")
+    qdrant.create_collection(target, dim, profile_name)
+    started = datetime.now(timezone.utc)
+    n = copy(source, target, qdrant.QDRANT_HYBRID)
+    print(f"✅ {n} Punkte kopiert.")
+
+    print("⏳ Warte auf Indizierung …")
+    wait_green(target)
+    # Nachzug erst nach der Indizierung (die bis QDRANT_MIGRATE_TIMEOUT dauern kann): alles seit
+    # Kopierbeginn, dann ein kurzer zweiter Durchgang für das, was währenddessen einging –
+    # unmittelbar davor wird umgeschaltet, die Quelle erst danach gelöscht.
+    since = started
+    for _ in range(2):
+        pass_start = datetime.now(timezone.utc)
+        m = copy(source, target, qdrant.QDRANT_HYBRID, qdrant.build_filter(date_from=since - CATCH_UP_MARGIN))
+        print(f"🔁 {m} seit {since:%H:%M:%S} eingegangene Punkte nachgezogen.")
+        since = pass_start
+
+    if source == alias:
+        # Erstmalig: echte Collection durch gleichnamigen Alias ersetzen
+        qdrant.get_client().delete_collection(source)
+        qdrant.switch_alias(target, alias)
+        print(f"🔀 Collection '{source}' ersetzt durch Alias '{alias}' → '{target}'.")
+    else:
+        qdrant.switch_alias(target, alias)
+        print(f"🔀 Alias '{alias}': '{source}' → '{target}'.")
+        # Schreibzugriffe zwischen letztem Durchgang und Umschalten landeten noch in der Quelle
+        m = copy(source, target, qdrant.QDRANT_HYBRID, qdrant.build_filter(date_from=since - CATCH_UP_MARGIN))
+        print(f"🔁 {m} Punkte nach dem Umschalten nachgezogen.")
+        if not keep_old:
+            qdrant.get_client().delete_collection(source)
+            print(f"🗑️ Alte Collection '{source}' gelöscht.")
+    return target
+
+
+def evaluate(n: int, top_k: int, ef: int | None = None):
+    """Recall@top_k gegen exakte Suche an den ersten n gespeicherten Vektoren."""
+    records = list(itertools.islice(qdrant.scroll(batch_size=min(n, 256), with_vectors=True, with_payload=False), n))
+    vectors = [r.vector.get("") if isinstance(r.vector, dict) else r.vector for r in records]
+    if not vectors:
+        print("⚠️ Keine Punkte für die Messung.")
+        return
+    # top_k + 1: der Punkt selbst ist immer Treffer und zählt nicht
+    exact = qdrant.search_batch(vectors, top_k + 1, params=qdrant.search_params(exact=True))
+    for rescore in (False, True):
+        t0 = time.perf_counter()
+        approx = qdrant.search_batch(vectors, top_k + 1, params=qdrant.search_params(ef=ef, rescore=rescore))
+        ms = (time.perf_counter() - t0) * 1000 / len(vectors)
+        recalls = []
+        for r, e, a in zip(records, exact, approx):
+            truth = [h.id for h in e if h.id != r.id][:top_k]
+            found = {h.id for h in a if h.id != r.id}
+            if truth:
+                recalls.append(len(found.intersection(truth)) / len(truth))
+        recall = sum(recalls) / max(1, len(recalls))
+        print(f"🎯 Recall@{top_k} = {recall:.4f} (rescore={'an' if rescore else 'aus'}, "
+              f"ef={ef or qdrant.QDRANT_SEARCH_EF or 'Standard'}, {len(vectors)} Anfragen, {ms:.2f} ms/Anfrage)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Luna IEMS – Qdrant-Speicherprofil umstellen")
+    parser.add_argument("--profile", choices=list(qdrant.PROFILES), help="Zielprofil")
+    parser.add_argument("--in-place", action="store_true", help="bestehende Collection umkonfigurieren")
+    parser.add_argument("--keep-old", action="store_true", help="alte Collection nach dem Umschalten behalten")
+    parser.add_argument("--eval", type=int, default=0, metavar="N", help="Recall an N Stichproben messen")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--ef", type=int, default=None, help="hnsw_ef für die Messung")
+    args = parser.parse_args()
+
+    try:
+        if args.profile:
+            if args.in_place:
+                name = qdrant.resolve_collection()
+                qdrant.update_profile(args.profile, name)
+                print(f"✅ '{name}' auf Profil {args.profile} umgestellt – Qdrant optimiert im Hintergrund.")
+            else:
+                migrate(args.profile, keep_old=args.keep_old)
+        describe(qdrant.COLL)
+        if args.eval:
+            evaluate(args.eval, args.top_k, args.ef)
+    except Exception as e:
+        print(f"❌ Migration fehlgeschlagen: {e}", file=sys.stderr)
+        sys.exit(1)
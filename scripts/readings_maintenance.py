@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+🌙 Luna IEMS – Wartung der partitionierten readings-Tabelle
+
+- legt Monatspartitionen für die kommenden Monate an (--ahead)
+- hängt Partitionen älter als --retention-months ab und löscht sie
+  (mit --detach-only bleiben sie als eigenständige Tabellen erhalten)
+- berechnet mit --rebuild-rollups alle 15-min/Stunden/Tages-Rollups neu
+
+Gedacht für Containerstart und einen täglichen Cron-Lauf.
+"""
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.services import db, readings, rollups  # noqa: E402
+
+READINGS_PARTITIONS_AHEAD = int(os.getenv("READINGS_PARTITIONS_AHEAD", "3"))
+READINGS_RETENTION_MONTHS = int(os.getenv("READINGS_RETENTION_MONTHS", "0"))
+
+
+def main(ahead: int, retention_months: int, detach_only: bool, rebuild_rollups: bool = False) -> int:
+    conn = db.conn()
+    try:
+        now = datetime.now()
+        count = readings.ensure_partitions(conn, now, now + timedelta(days=31 * ahead))
+        print(f"✅ {count} Monatspartitionen geprüft (bis {ahead} Monate voraus)")
+
+        if retention_months > 0:
+            removed = readings.apply_retention(conn, retention_months, drop=not detach_only)
+            action = "abgehängt" if detach_only else "gelöscht"
+            if removed:
+                print(f"🧹 {len(removed)} Partitionen {action}: {', '.join(removed)}")
+            else:
+                print(f"ℹ️ Keine Partitionen älter als {retention_months} Monate")
+
+        if rebuild_rollups:
+            devices = rollups.rebuild(conn)
+            print(f"📊 Rollups für {devices} Geräte neu berechnet")
+    except Exception as e:
+        print(f"❌ Readings-Wartung fehlgeschlagen: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Luna IEMS – Readings-Partitionen pflegen")
+    parser.add_argument("--ahead", type=int, default=READINGS_PARTITIONS_AHEAD,
+                        help="Anzahl Monate, für die Partitionen im Voraus angelegt werden")
+    parser.add_argument("--retention-months", type=int, default=READINGS_RETENTION_MONTHS,
+                        help="Partitionen älter als N Monate entfernen (0 = nie)")
+    parser.add_argument("--detach-only", action="store_true",
+                        help="Alte Partitionen nur abhängen, nicht löschen")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Alle Rollups aus den Rohdaten neu berechnen")
+    args = parser.parse_args()
+    sys.exit(main(args.ahead, args.retention_months, args.detach_only, args.rebuild_rollups))
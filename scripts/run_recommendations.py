@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+🌙 Luna IEMS – Batch-Lauf der Empfehlungs-Engine
+Bewertet alle Geräte anhand der Stunden-Rollups und schreibt Recommendation-Zeilen.
+"""
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.services import recommender  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Luna IEMS – Empfehlungen berechnen")
+    parser.add_argument("--days", type=int, default=recommender.RECO_WINDOW_DAYS,
+                        help="Auswertungsfenster in Tagen")
+    parser.add_argument("--llm-top-n", type=int, default=recommender.RECO_LLM_TOP_N,
+                        help="Die N wichtigsten Empfehlungen per LLM umformulieren (0 = aus)")
+    parser.add_argument("--device", type=int, action="append",
+                        help="Nur diese Geräte bewerten (mehrfach angebbar)")
+    args = parser.parse_args()
+
+    print("📊 Berechne Empfehlungen …")
+    try:
+        stats = recommender.run(args.device, days=args.days, llm_top_n=args.llm_top_n)
+    except Exception as e:
+        print(f"❌ Empfehlungslauf fehlgeschlagen: {e}")
+        sys.exit(1)
+    print(f"✅ {stats['recommendations']} Empfehlungen für {stats['devices']} Geräte "
+          f"in {stats['seconds']}s ({stats['llm_rephrased']} per LLM umformuliert)")
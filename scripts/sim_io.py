@@ -0,0 +1,147 @@
+"""
+🌙 Luna IEMS – Gemeinsame Ausgabe für die Simulatoren
+
+Die Generatoren (smart_meter_sim.py, market_price_sim.py) liefern Blöcke als
+Dict Spaltenname → NumPy-Array (flach, zeitlich sortiert, Zeitstempel als
+datetime64). Hier werden sie gestreamt geschrieben – NDJSON, CSV oder
+Parquet (pyarrow optional) – bzw. im Live-Modus mit N-facher Echtzeit an die
+Ingest-Endpunkte der API geschickt.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+FORMATS = ("ndjson", "csv", "parquet")
+FLOAT_DIGITS = 3
+
+
+def iso(ts: np.ndarray) -> np.ndarray:
+    """datetime64-Array → ISO-Strings (sekundengenau), vektorisiert."""
+    return np.datetime_as_string(ts.astype("datetime64[s]"), unit="s")
+
+
+def _columns(block: dict):
+    """Spalten als Python-Listen (Zeitstempel als ISO-String, Floats gerundet) für die Textformate."""
+    cols = []
+    for arr in block.values():
+        if arr.dtype.kind == "M":
+            cols.append(iso(arr).tolist())
+        elif np.issubdtype(arr.dtype, np.floating):
+            cols.append(np.round(arr.astype(np.float64), FLOAT_DIGITS).tolist())
+        else:
+            cols.append(arr.tolist())
+    return cols
+
+
+def ndjson_lines(block: dict) -> str:
+    names = list(block)
+    tpl = "{" + ",".join(
+        f'"{n}":"%s"' if block[n].dtype.kind in "MUSO" else f'"{n}":%s' for n in names) + "}\n"
+    return "".join([tpl % row for row in zip(*_columns(block))])
+
+
+def csv_lines(block: dict, header: bool = False) -> str:
+    tpl = ",".join(["%s"] * len(block)) + "\n"
+    body = "".join([tpl % row for row in zip(*_columns(block))])
+    return (",".join(block) + "\n" + body) if header else body
+
+
+class _ParquetSink:
+    """Schreibt jeden Block als eigene Row-Group."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("--format parquet benötigt 'pyarrow'.") from e
+        self.pa, self.pq, self.path, self.writer = pa, pq, path, None
+
+    def write(self, block: dict):
+        table = self.pa.table({name: arr for name, arr in block.items()})
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+@contextmanager
+def _text_out(path: str):
+    if path in ("", "-"):
+        yield sys.stdout
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            yield f
+
+
+def _rows(block: dict) -> int:
+    return len(next(iter(block.values())))
+
+
+def write(blocks, fmt: str, path: str) -> int:
+    """Schreibt alle Blöcke nach path ('-' = stdout). Liefert die Zeilenanzahl."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unbekanntes Format '{fmt}' (erlaubt: {', '.join(FORMATS)})")
+    rows = 0
+    if fmt == "parquet":
+        if path in ("", "-"):
+            raise ValueError("Parquet braucht eine Ausgabedatei (--out)")
+        sink = _ParquetSink(path)
+        try:
+            for block in blocks:
+                sink.write(block)
+                rows += _rows(block)
+        finally:
+            sink.close()
+        return rows
+    with _text_out(path) as f:
+        for i, block in enumerate(blocks):
+            f.write(ndjson_lines(block) if fmt == "ndjson" else csv_lines(block, header=i == 0))
+            rows += _rows(block)
+    return rows
+
+
+# -------------------------------------------------------------
+# Live-Modus
+# -------------------------------------------------------------
+def replay(batches, speed: float, url: str, timeout: float = 60.0) -> dict:
+    """
+    Schickt (sim_ts, csv_payload)-Batches an url, sobald ihre Simulationszeit
+    bei speed-facher Echtzeit erreicht ist (speed <= 0: so schnell wie möglich).
+    """
+    import httpx
+
+    stats = {"batches": 0, "stored": 0, "rejected": 0, "failed": 0}
+    wall0 = sim0 = None
+    with httpx.Client(timeout=timeout) as client:
+        for sim_ts, payload in batches:
+            if sim0 is None:
+                wall0, sim0 = time.monotonic(), sim_ts
+            if speed > 0:
+                due = wall0 + (sim_ts - sim0) / np.timedelta64(1, "s") / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                resp = client.post(url, params={"format": "csv"}, content=payload.encode(),
+                                   headers={"Content-Type": "text/csv"})
+                body = resp.json()
+                if resp.status_code != 200 or body.get("status") != "ok":
+                    raise RuntimeError(body.get("detail") or f"HTTP {resp.status_code}")
+                stats["stored"] += body.get("accepted", body.get("stored", 0))
+                stats["rejected"] += body.get("rejected", 0)
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"❌ {iso(np.array([sim_ts]))[0]}: {e}", file=sys.stderr)
+            stats["batches"] += 1
+            if stats["batches"] % 10 == 0:
+                print(f"⏱️  {iso(np.array([sim_ts]))[0]} – {stats['batches']} Batches, "
+                      f"{stats['stored']} gespeichert", file=sys.stderr)
+    return stats
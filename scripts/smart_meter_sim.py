@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+🌙 Luna IEMS – Smart-Meter-Simulator (Verbrauch & PV-Produktion, 15 min)
+
+Erzeugt vektorisiert je Tag eine Matrix (Geräte × 96 Intervalle):
+
+- Verbrauch: Lastprofil je Gerätetyp (Haushalt, Büro, Gewerbe), pro Gerät
+  zeitlich verschoben und skaliert, mit Saison- und Wochenendfaktor,
+  langsam driftendem Niveau, multiplikativem Rauschen und Lastspitzen
+  (Geräte schalten zu).
+- Produktion: PV-Anlage (PV_SHARE der Geräte) mit tageslängen-
+  abhängiger Sonnenkurve, regionalem Wetter und lokaler Bewölkung.
+
+Reproduzierbar: Jede Zufallsgröße hängt nur von --seed, dem Gerät bzw. dem
+Kalendertag ab – derselbe Tag sieht bei gleichem Seed immer gleich aus,
+unabhängig von --start, --days oder der Geräteanzahl (Präfix).
+
+Ausgabe im Format des Readings-Ingests (device_id, timestamp, value) – value
+ist der Verbrauch in kW, mit --value net Verbrauch − Produktion. --value raw
+schreibt stattdessen ts, consumption_kw und production_kw (nur Dateiausgabe).
+
+Beispiele:
+    python scripts/smart_meter_sim.py --devices 100000 --days 365 --format parquet --out /tmp/sm.parquet
+    python scripts/smart_meter_sim.py --devices 10 --days 1 | head
+    python scripts/smart_meter_sim.py --devices 1000 --days 7 --value net --format csv --out /tmp/readings.csv
+    python scripts/smart_meter_sim.py --devices 500 --live --speed 60 --url http://localhost:8000
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import sim_io  # noqa: E402
+
+STEPS_PER_DAY = 96
+STEP = np.timedelta64(15, "m")
+INGEST_PATH = "/api/v1/smartmeter/readings/bulk"
+VALUES = ("consumption", "net", "raw")
+
+# Zufallsströme: [seed, Kanal, ...] → unabhängig und präfixstabil
+_DEVICE, _DAY, _WEEK = 1, 2, 3
+
+PV_SHARE = 0.3
+SPIKE_P = 0.02
+SPIKE_SCALE = 3.0
+
+
+def _rng(seed: int, *keys: int) -> np.random.Generator:
+    return np.random.default_rng([seed, *keys])
+
+
+def _bump(hours: np.ndarray, center: float, width: float) -> np.ndarray:
+    d = (hours - center + 12) % 24 - 12
+    return np.exp(-0.5 * (d / width) ** 2)
+
+
+def _profiles() -> np.ndarray:
+    """Tagesprofile (Typ × Verschiebung × 96), Mittelwert 1; Verschiebung −1 h … +1 h."""
+    shifts = np.arange(-4, 5) * 0.25
+    h = (np.arange(STEPS_PER_DAY) / 4)[None, :] - shifts[:, None]
+    household = 0.5 + 0.8 * _bump(h, 7.5, 1.2) + 1.4 * _bump(h, 19, 2.0) + 0.3 * _bump(h, 13, 1.5)
+    office = 0.35 + 1.6 * np.clip((np.minimum(h % 24, 18) - 7.5) / 1.5, 0, 1) * (h % 24 < 18.5)
+    commercial = 0.8 + 0.6 * _bump(h, 12, 4.0)
+    shapes = np.stack([household, office, commercial])
+    return (shapes / shapes.mean(axis=2, keepdims=True)).astype(np.float32)
+
+
+PROFILES = _profiles()
+# Büros am Wochenende fast nur Grundlast, Haushalte etwas mehr
+WEEKEND = np.array([1.1, 0.4, 0.85], dtype=np.float32)
+
+
+class Fleet:
+    """Gerätekonstanten; Index i ↔ Device-ID first_id + i."""
+
+    def __init__(self, devices: int, seed: int, first_id: int = 1):
+        self.seed = seed
+        self.ids = np.arange(first_id, first_id + devices, dtype=np.int32)
+        kind = _rng(seed, _DEVICE, 0).choice(3, size=devices, p=[0.8, 0.12, 0.08])
+        self.kind = kind.astype(np.int8)
+        self.shift = _rng(seed, _DEVICE, 1).integers(0, PROFILES.shape[1], devices)
+        # mittlere Last in kW: Haushalt ~0,4, Büro ~3, Gewerbe ~8
+        scale = np.array([0.4, 3.0, 8.0], dtype=np.float32)[kind]
+        self.mean_kw = (scale * _rng(seed, _DEVICE, 2).lognormal(0, 0.35, devices)).astype(np.float32)
+        pv = _rng(seed, _DEVICE, 3).random(devices) < PV_SHARE
+        kwp = np.where(kind == 0, 6.0, 25.0) * _rng(seed, _DEVICE, 4).lognormal(0, 0.3, devices)
+        self.kwp = np.where(pv, kwp, 0).astype(np.float32)
+        self.region = _rng(seed, _DEVICE, 5).integers(0, 16, devices)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _level(self, day: int) -> np.ndarray:
+        """Langsam driftendes Verbrauchsniveau: lineare Interpolation wöchentlicher Zufallswerte."""
+        week, frac = divmod(day, 7)
+        a = _rng(self.seed, _WEEK, week).normal(0, 1, len(self))
+        b = _rng(self.seed, _WEEK, week + 1).normal(0, 1, len(self))
+        return np.exp(0.12 * (a + (b - a) * frac / 7)).astype(np.float32)
+
+    def day(self, day: np.datetime64):
+        """Verbrauch und Produktion (kW) eines Kalendertags als (Geräte × 96)-Matrizen."""
+        n = len(self)
+        shape = (n, STEPS_PER_DAY)
+        idx = int(day.astype("datetime64[D]").astype(np.int64))
+        doy = int((day - day.astype("datetime64[Y]")).astype(np.int64))
+        weekend = ((idx + 3) % 7) >= 5  # 1970-01-01 war ein Donnerstag
+
+        season = 1 + 0.2 * np.cos(2 * np.pi * (doy - 15) / 365.25)
+        factor = self.mean_kw * self._level(idx) * np.float32(season)
+        if weekend:
+            factor = factor * WEEKEND[self.kind]
+        load = PROFILES[self.kind, self.shift] * factor[:, None]
+        load *= np.exp(np.float32(0.15) * _rng(self.seed, _DAY, idx, 0).standard_normal(shape, dtype=np.float32))
+        # Zuschaltende Großverbraucher (Herd, Waschmaschine, Wallbox …): mit Wahrscheinlichkeit
+        # SPIKE_P je Intervall, Höhe exponentialverteilt (u/p ist unter u < p wieder gleichverteilt)
+        u = _rng(self.seed, _DAY, idx, 1).random(shape, dtype=np.float32)
+        hit = u < SPIKE_P
+        load[hit] += -np.log(u[hit] / SPIKE_P + 1e-7) * SPIKE_SCALE * np.broadcast_to(factor[:, None], shape)[hit]
+
+        # PV: Tageslänge 8–16,5 h, Sonnenhöchststand ~13:15 (MESZ-nah), nur Geräte mit Anlage
+        prod = np.zeros(shape, dtype=np.float32)
+        pv = np.flatnonzero(self.kwp)
+        daylen = 12.25 + 4.25 * np.cos(2 * np.pi * (doy - 172) / 365.25)
+        h = (np.arange(STEPS_PER_DAY) + 0.5) / 4
+        sun = np.clip(np.sin(np.pi * (h - (13.25 - daylen / 2)) / daylen), 0, None) ** 1.3
+        sun *= 0.775 + 0.225 * np.cos(2 * np.pi * (doy - 172) / 365.25)
+        day_hours = np.flatnonzero(sun > 0)
+        weather = _rng(self.seed, _DAY, idx, 2).beta(2.0, 1.3, 16).astype(np.float32)[self.region]
+        noise = _rng(self.seed, _DAY, idx, 3).standard_normal((n, len(day_hours)), dtype=np.float32)
+        clouds = np.clip(weather[pv, None] + np.float32(0.12) * noise[pv], 0.05, 1)
+        prod[pv[:, None], day_hours] = (0.85 * self.kwp[pv])[:, None] * sun[day_hours].astype(np.float32) * clouds
+        return load, prod
+
+
+def _block(fleet: Fleet, day: np.datetime64) -> dict:
+    load, prod = fleet.day(day)
+    ts = (day + np.arange(STEPS_PER_DAY) * STEP).astype("datetime64[s]")
+    return {
+        "device_id": np.tile(fleet.ids, STEPS_PER_DAY),
+        "ts": np.repeat(ts, len(fleet)),
+        "consumption_kw": load.T.ravel(),
+        "production_kw": prod.T.ravel(),
+    }
+
+
+def blocks(fleet: Fleet, start: np.datetime64, days: int, workers: int = 1):
+    """
+    Ein Block je Tag, zeitlich sortiert (alle Geräte je Intervall). Tage sind
+    voneinander unabhängig und werden mit workers > 1 parallel erzeugt.
+    """
+    day0 = start.astype("datetime64[D]")
+    dates = [day0 + np.timedelta64(d, "D") for d in range(days)]
+    if workers <= 1:
+        for day in dates:
+            yield _block(fleet, day)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(_block, [fleet] * days, dates)
+
+
+def ingest_block(block: dict, value: str = "consumption") -> dict:
+    """Block im Format des Readings-Ingests (device_id, timestamp, value); "raw" lässt ihn unverändert."""
+    if value == "raw":
+        return block
+    v = block["consumption_kw"]
+    if value == "net":
+        v = v - block["production_kw"]
+    return {"device_id": block["device_id"], "timestamp": block["ts"], "value": v}
+
+
+def live_batches(fleet: Fleet, start: np.datetime64, days: int, value: str = "consumption"):
+    """Je 15-min-Intervall ein CSV-Batch im Format des Readings-Ingests (device_id,timestamp,value)."""
+    ids = fleet.ids.tolist()
+    for block in blocks(fleet, start, days):
+        block = ingest_block(block, value)
+        n = len(fleet)
+        for i in range(STEPS_PER_DAY):
+            ts = block["timestamp"][i * n]
+            # Intervalle vor dem Start (Tagesbeginn) überspringen
+            if ts < start:
+                continue
+            v = block["value"][i * n:(i + 1) * n]
+            stamp = sim_io.iso(np.array([ts]))[0]
+            lines = [f"{d},{stamp},{x}" for d, x in zip(ids, np.round(v.astype(np.float64), 3).tolist())]
+            yield ts, "device_id,timestamp,value\n" + "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Luna IEMS – Smart-Meter-Simulator")
+    parser.add_argument("--devices", type=int, default=100, help="Anzahl simulierter Zähler")
+    parser.add_argument("--first-id", type=int, default=1, help="Device-ID des ersten Zählers")
+    parser.add_argument("--start", default=None,
+                        help="Startdatum (ISO, Standard: heute bzw. jetzt im Live-Modus)")
+    parser.add_argument("--days", type=int, default=1, help="Anzahl simulierter Tage")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1, help="Prozesse für die Tagesblöcke")
+    parser.add_argument("--format", choices=sim_io.FORMATS, default="ndjson")
+    parser.add_argument("--out", default="-", help="Ausgabedatei ('-' = stdout)")
+    parser.add_argument("--live", action="store_true", help="Daten an die API schicken statt schreiben")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Live: Vielfaches der Echtzeit (0 = so schnell wie möglich)")
+    parser.add_argument("--url", default=os.getenv("LUNA_API_URL", "http://localhost:8000"))
+    parser.add_argument("--value", choices=VALUES, default="consumption",
+                        help="Wert: Verbrauch, Verbrauch − Produktion oder beide Rohspalten (nur Datei)")
+    args = parser.parse_args()
+    if args.live and args.value == "raw":
+        parser.error("--value raw geht nur ohne --live (der Ingest erwartet eine value-Spalte)")
+
+    fleet = Fleet(args.devices, args.seed, args.first_id)
+    t0 = time.perf_counter()
+    if args.live:
+        now = datetime.now().replace(second=0, microsecond=0)
+        start = np.datetime64(args.start or now.replace(minute=now.minute - now.minute % 15).isoformat())
+        print(f"📡 Live: {len(fleet)} Zähler ab {start} mit {args.speed:g}× Echtzeit → {args.url}",
+              file=sys.stderr)
+        try:
+            stats = sim_io.replay(live_batches(fleet, start, args.days, args.value), args.speed,
+                                  args.url.rstrip("/") + INGEST_PATH)
+        except KeyboardInterrupt:
+            sys.exit(0)
+        print(f"✅ {stats['batches']} Batches, {stats['stored']} Readings gespeichert, "
+              f"{stats['rejected']} abgelehnt, {stats['failed']} fehlgeschlagen", file=sys.stderr)
+    else:
+        start = np.datetime64(args.start or datetime.now().date().isoformat())
+        try:
+            rows = sim_io.write((ingest_block(b, args.value) for b in blocks(fleet, start, args.days, args.workers)),
+                                args.format, args.out)
+        except (RuntimeError, ValueError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        elapsed = time.perf_counter() - t0
+        print(f"✅ {rows} Zeilen ({len(fleet)} Zähler × {args.days} Tage) in {elapsed:.1f}s "
+              f"({rows / elapsed:,.0f} Zeilen/s)", file=sys.stderr)
@@ -4,6 +4,9 @@
 echo "🚀 Wende Alembic Migrationen an..."
 alembic upgrade head
 
+echo "🗂️ Prüfe Readings-Partitionen..."
+python scripts/readings_maintenance.py
+
 # Jetzt den API-Server starten
 echo "✅ Starte FastAPI-Service..."
 exec uvicorn api.main:app --host 0.0.0.0 --port 8000 --log-level info --reload
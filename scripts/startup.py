@@ -59,8 +59,8 @@ def ensure_qdrant():
             print("⚠️ Qdrant nicht erreichbar – überspringe Collection-Setup.")
             return
     try:
-        qdrant.ensure_collection(dim=384)
-        print("✅ Qdrant Collection 'luna_chunks' vorhanden.")
+        qdrant.ensure_collection()
+        print("✅ Qdrant geprüft.")
     except Exception as e:
         print(f"⚠️ Qdrant Setup-Fehler: {e}")
 
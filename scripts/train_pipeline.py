@@ -6,8 +6,10 @@ Liest Dateien aus /data/incoming, erzeugt Embeddings und speichert sie in Qdrant
 
 import os
 import sys
-import uuid
+import json
+import hashlib
 import logging
+import argparse
 from pathlib import Path
 from datetime import datetime
 
@@ -16,7 +18,8 @@ from datetime import datetime
 # -------------------------------------------------------------
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from api.services import embed, qdrant  # noqa: E402
+from api.services import qdrant, chunking, answer_cache  # noqa: E402
+from api.services.embed_engine import EmbeddingEngine  # noqa: E402
 
 # -------------------------------------------------------------
 # Pfade & Logging
@@ -24,6 +27,7 @@ from api.services import embed, qdrant  # noqa: E402
 DATA_DIR = Path(os.getenv("DATA_DIR", "/data/incoming"))
 MODEL_DIR = Path(os.getenv("MODEL_DIR", "/models/versions"))
 LOG_FILE = Path(os.getenv("LOG_FILE", "/logs/train_pipeline.log"))
+MANIFEST_PATH = Path(os.getenv("TRAIN_MANIFEST", str(MODEL_DIR / "index_manifest.json")))
 
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -49,73 +53,175 @@ def discover_texts():
     return files
 
 
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# -------------------------------------------------------------
+# Manifest (path → mtime, size, sha256, points)
+# -------------------------------------------------------------
+def load_manifest() -> dict:
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8")).get("files", {})
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"⚠️ Manifest {MANIFEST_PATH} unlesbar ({e}) – starte ohne Manifest.")
+        return {}
+
+
+def save_manifest(files: dict):
+    tmp = MANIFEST_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"version": 1, "files": files}, indent=1), encoding="utf-8")
+    tmp.replace(MANIFEST_PATH)
+
+
+def diff_corpus(files, manifest: dict):
+    """
+    Vergleicht die gefundenen Dateien mit dem Manifest.
+    mtime+size gleich → unverändert (ohne Hashing); sonst entscheidet sha256.
+    Liefert (neu_oder_geändert, entfernt, aktualisiertes_manifest).
+    """
+    changed, current = [], {}
+    for path in files:
+        key = str(path)
+        st = path.stat()
+        entry = manifest.get(key)
+        if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+            current[key] = entry
+            continue
+        sha = file_sha256(path)
+        if entry and entry["sha256"] == sha:
+            current[key] = {**entry, "mtime": st.st_mtime, "size": st.st_size}
+            continue
+        current[key] = {"mtime": st.st_mtime, "size": st.st_size, "sha256": sha, "points": []}
+        changed.append(path)
+    removed = [k for k in manifest if k not in current]
+    return changed, removed, current
+
+
+def remove_stale(changed, removed, manifest: dict, current: dict) -> int:
+    """
+    Löscht die Punkte entfernter Dateien und die nicht mehr erzeugten Punkte neu
+    eingebetteter Dateien (alte IDs laut Manifest minus neue IDs). Ohne Punktliste
+    im Manifest (Altlasten mit Zufalls-IDs) wird über `path` gelöscht, die neuen
+    Punkte ausgenommen. Liefert die Anzahl aufgeräumter Dateien.
+    """
+    # Frische Qdrant-Instanz ohne Upserts: noch keine Collection → nichts zu löschen
+    if not qdrant.get_client().collection_exists(qdrant.COLL):
+        return 0
+    if removed:
+        qdrant.delete_by_payload("path", removed)
+    files = len(removed)
+    for path in map(str, changed):
+        if path not in current:
+            continue  # Fehler beim Einbetten → alte Punkte bleiben
+        new = current[path]["points"]
+        old = manifest.get(path, {}).get("points")
+        if old:
+            stale = set(old) - set(new)
+            if stale:
+                qdrant.delete_points(stale)
+                files += 1
+        else:
+            qdrant.delete_by_payload("path", [path], keep_ids=new)
+            files += 1
+    return files
+
+
 # -------------------------------------------------------------
 # Trainingslogik
 # -------------------------------------------------------------
-def retrain_model():
+def retrain_model(incremental: bool = True):
     start_time = datetime.utcnow()
-    logging.info("==== Retraining gestartet ====")
+    logging.info(f"==== Retraining gestartet ({'inkrementell' if incremental else 'voll'}) ====")
     files = discover_texts()
 
-    if not files:
-        logging.warning("Keine neuen Daten gefunden – Abbruch.")
-        return
-
-    vectors, payloads, texts = [], [], []
-    for idx, path in enumerate(files, start=1):
-        try:
-            text = path.read_text(encoding="utf-8", errors="ignore").strip()
-            if not text:
-                logging.warning(f"⚠️ Datei {path.name} ist leer, übersprungen.")
-                continue
-
-            emb = embed.embed_texts([text])[0]
-            vectors.append(emb)
-            texts.append(text)
-
-            payloads.append({
-                "path": str(path),
-                "chunk_id": str(uuid.uuid4()),
-                "text": text[:1000],
-                "filename": path.name,
-            })
-
-            logging.info(f"✅ Datei {idx}/{len(files)} verarbeitet: {path.name}")
+    manifest = load_manifest()
+    changed, removed, current = diff_corpus(files, manifest if incremental else {})
+    if not incremental:
+        removed = [k for k in manifest if k not in current]
+    logging.info(f"{len(changed)} neu/geändert, {len(removed)} entfernt, "
+                 f"{len(files) - len(changed)} unverändert.")
 
-        except Exception as e:
-            logging.error(f"❌ Fehler beim Verarbeiten von {path.name}: {e}")
-
-    if not vectors:
-        logging.warning("Keine Embeddings generiert – kein Upload zu Qdrant.")
+    if not changed and not removed:
+        logging.info("Korpus unverändert – nichts zu tun.")
+        console.info("✅ Korpus unverändert – Retraining übersprungen.")
         return
 
     # ---------------------------------------------------------
-    # Qdrant – Collection anlegen / aktualisieren
+    # Lesen & Chunken (Thread-Pool) → Embeddings (parallel) → Upserts (Batches)
     # ---------------------------------------------------------
-    dim = len(vectors[0])
-    client = qdrant.ensure_collection(dim=dim)
-    logging.info(f"Qdrant-Collection initialisiert (dim={dim}).")
+    def load(path: Path):
+        text = path.read_text(encoding="utf-8", errors="ignore").strip()
+        if not text:
+            logging.warning(f"⚠️ Datei {path.name} ist leer, übersprungen.")
+        sha = current[str(path)]["sha256"]
+        items = []
+        meta = qdrant.doc_meta(path.name, "corpus")
+        # Chunk-IDs hängen an Pfad + Dateihash → gleicher Inhalt, gleiche Punkt-IDs
+        for chunk in chunking.iter_chunks([text], doc_id=f"{path}:{sha}"):
+            items.append((chunk["id"], chunk["text"], {
+                **chunking.payload(chunk),
+                **meta,
+                "path": str(path),
+                "sha256": sha,
+            }))
+        current[str(path)]["points"] = [pid for pid, _, _ in items]
+        return items
+
+    collection_ready = hybrid = False
+
+    def upsert(points):
+        nonlocal collection_ready, hybrid
+        if not collection_ready:
+            qdrant.ensure_collection(dim=len(points[0][1]))
+            hybrid = qdrant.has_sparse()
+            collection_ready = True
+        # Parallelität steuert bereits die Engine → hier ein Batch pro Aufruf
+        qdrant.upsert_points(
+            [qdrant.make_point(pid, vec, pl, hybrid) for pid, vec, pl in points],
+            parallel=1,
+        )
+
+    def on_error(paths, exc):
+        # Nicht ins Manifest übernehmen → nächster Lauf versucht es erneut
+        for path in paths:
+            current.pop(str(path), None)
+            logging.error(f"❌ Fehler beim Verarbeiten von {path.name}: {exc}")
 
     try:
-        # Punkt-IDs als UUIDs erzeugen
-        points = [
-            qdrant.qm.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vec,
-                payload=payload,
-            )
-            for vec, payload in zip(vectors, payloads)
-        ]
-
-        result = client.upsert(collection_name="luna_chunks", points=points)
-        logging.info(f"✅ Upsert abgeschlossen ({len(points)} Punkte). Ergebnis: {result.status}")
-        console.info(f"✅ {len(points)} Vektoren erfolgreich in Qdrant upserted.")
-
+        stats = EmbeddingEngine().run(changed, load, upsert, on_error=on_error)
     except Exception as e:
         logging.error(f"⚠️ Fehler beim Upsert in Qdrant: {e}")
         console.error(f"⚠️ Fehler beim Upsert in Qdrant: {e}")
         return
 
+    logging.info(f"✅ Upsert abgeschlossen: {stats}")
+    console.info(f"✅ {stats['points']} Vektoren aus {stats['sources']} Dateien in Qdrant upserted "
+                 f"({stats['chunks_per_s']} Chunks/s).")
+
+    # ---------------------------------------------------------
+    # Qdrant – alte Punkte erst nach dem Upsert löschen, damit geänderte Dateien
+    # durchgehend auffindbar bleiben; fehlgeschlagene Dateien behalten ihre Punkte
+    # ---------------------------------------------------------
+    try:
+        removed_points = remove_stale(changed, removed, manifest, current)
+    except Exception as e:
+        # Manifest nicht speichern → nächster Lauf versucht das Aufräumen erneut
+        logging.error(f"⚠️ Fehler beim Löschen in Qdrant: {e}")
+        console.error(f"⚠️ Fehler beim Löschen in Qdrant: {e}")
+        return
+    if removed_points:
+        logging.info(f"🗑️ Alte Punkte von {removed_points} Dateien entfernt.")
+
+    save_manifest(current)
+    answer_cache.bump_collection_version()
+
     # ---------------------------------------------------------
     # Versionierung
     # ---------------------------------------------------------
@@ -132,5 +238,9 @@ def retrain_model():
 # Main Entry
 # -------------------------------------------------------------
 if __name__ == "__main__":
-    retrain_model()
+    parser = argparse.ArgumentParser(description="Luna IEMS – Training Pipeline")
+    parser.add_argument("--full", action="store_true",
+                        help="Manifest ignorieren und alle Dateien neu einbetten")
+    args = parser.parse_args()
+    retrain_model(incremental=not args.full)
 
@@ -0,0 +1,78 @@
+import numpy as np
+
+from api.services import anomaly
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = np.datetime64("2025-01-01T00:00") + np.arange(n) * np.timedelta64(15, "m")
+    x = 2.0 + 0.1 * rng.standard_normal(n)
+    x[60] = 10.0   # Spitze
+    x[80] = -1.0   # negativer Zählerwert
+    x[100:110] = 2.05  # hängender Zähler
+    return ts.astype("datetime64[us]"), x
+
+
+def _detector():
+    return anomaly.AnomalyDetector(alpha=0.05, z=5.0, warmup=30, stuck=5, capacity=4)
+
+
+def _state(det, device_id):
+    return [float(getattr(det, name)[device_id]) for name in anomaly._STATE]
+
+
+def test_step_detects_spike_negative_and_stuck():
+    det = _detector()
+    ts, x = _series(120)
+    hits = []
+    for i in range(len(x)):
+        hits += det._step(np.array([1]), ts[i:i + 1], x[i:i + 1])
+    kinds = [(int(np.flatnonzero(ts == np.datetime64(h[1]))[0]), h[3]) for h in hits]
+    # -1 ist zugleich Ausreißer; stuck beim sechsten gleichen Wert (Wiederholungszähler 5)
+    assert kinds == [(60, "spike"), (80, "spike"), (80, "negative"), (105, "stuck")]
+
+
+def test_scan_matches_step():
+    ts, x = _series(120)
+    vec, scalar = _detector(), _detector()
+    vec._ensure(3)
+    scalar._ensure(3)
+    hits = []
+    for i in range(len(x)):
+        hits += vec._step(np.array([3]), ts[i:i + 1], x[i:i + 1])
+    assert scalar._scan(3, ts, x) == hits
+    np.testing.assert_allclose(_state(scalar, 3), _state(vec, 3))
+
+
+def test_process_mixes_vector_and_scalar_paths(monkeypatch):
+    monkeypatch.setattr(anomaly, "ANOMALY_VECTOR_DEPTH", 50)
+    ts, x = _series(120)
+    dev = np.r_[np.full(120, 1), np.full(40, 2)]
+    t = np.r_[ts, ts[:40]]
+    v = np.r_[x, x[:40] * 2]
+    rng = np.random.default_rng(1)
+    perm = rng.permutation(len(dev))
+
+    batched = _detector()
+    hits = batched.process(dev[perm], t[perm], v[perm])
+    single = _detector()
+    expected = single._scan(1, ts, x)
+    single._ensure(2)
+    expected += single._scan(2, ts[:40], x[:40] * 2)
+
+    assert sorted(hits) == sorted(expected)
+    for d in (1, 2):
+        np.testing.assert_allclose(_state(batched, d), _state(single, d))
+    assert batched.processed == 160 and batched.flagged == len(hits)
+
+
+def test_state_grows_and_survives_save_load(tmp_path):
+    det = _detector()
+    det.process([1000], [np.datetime64("2025-01-01T00:00")], [1.5])
+    assert len(det.mean) == 1024 and det.count[1000] == 1
+    path = str(tmp_path / "state.npz")
+    det.save(path)
+    other = _detector()
+    assert other.load(path)
+    assert other.count[1000] == 1 and other.last[1000] == 1.5
+    assert not other.load(str(tmp_path / "fehlt.npz"))
@@ -0,0 +1,65 @@
+import time
+import random
+
+import pytest
+
+from api.services import chunking
+
+WORDS = ["Strom", "Netz", "Tarif", "Wärmepumpe", "Energie", "Last", "Preis", "Speicher"]
+
+
+def _text(sentences=400, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for i in range(sentences):
+        if i % 50 == 0:
+            parts.append(f"\n## Abschnitt {i // 50}\n\n")
+        parts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))) + ". ")
+        if i % 7 == 6:
+            parts.append("\n\n")
+    return "# Playbook\n\n" + "".join(parts)
+
+
+def _chunks(pieces, **kwargs):
+    kwargs.setdefault("count_tokens", chunking.estimate_tokens)
+    return list(chunking.iter_chunks(pieces, doc_id="doc", **kwargs))
+
+
+def test_offsets_match_source():
+    text = _text()
+    chunks = _chunks([text], max_tokens=64, overlap_tokens=16)
+    assert chunks
+    for c in chunks:
+        assert text[c["start"]:c["end"]] == c["text"]
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+
+
+@pytest.mark.parametrize("step", [1, 7, 100, 4096])
+def test_piece_split_invariance(step):
+    text = _text(150)
+    whole = _chunks([text], max_tokens=64, overlap_tokens=16)
+    split = _chunks([text[i:i + step] for i in range(0, len(text), step)], max_tokens=64, overlap_tokens=16)
+    assert split == whole
+
+
+def test_token_bound_and_stable_ids():
+    text = _text()
+    chunks = _chunks([text], max_tokens=48, overlap_tokens=8)
+    assert all(c["tokens"] <= 48 for c in chunks)
+    assert [c["id"] for c in chunks] == [c["id"] for c in _chunks([text], max_tokens=48, overlap_tokens=8)]
+    assert len({c["id"] for c in chunks}) == len(chunks)
+
+
+def test_headings_path():
+    chunks = _chunks([_text()], max_tokens=64, overlap_tokens=0)
+    assert chunks[0]["headings"][0] == "Playbook"
+    assert any(c["headings"] == ["Playbook", "Abschnitt 3"] for c in chunks)
+
+
+def test_long_unterminated_line_is_linear():
+    rng = random.Random(1)
+    text = " ".join(rng.choice(WORDS) for _ in range(40000))[:250000]
+    t0 = time.perf_counter()
+    chunks = _chunks([text[i:i + 8192] for i in range(0, len(text), 8192)], max_tokens=128, overlap_tokens=16)
+    assert time.perf_counter() - t0 < 2.0
+    assert chunks[-1]["end"] == len(text.rstrip())
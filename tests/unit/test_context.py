@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+from api.services import context
+from api.services.chunking import estimate_tokens
+
+DOC = " ".join(f"Satz {i} über Tarif {i * 7 % 13} und Last {i * 3 % 11}." for i in range(200))
+
+
+def _hit(cid, score, text=None, start=None, end=None, path="a.md"):
+    if text is None:
+        text = DOC[start:end]
+    payload = {"chunk_id": cid, "text": text, "path": path}
+    if start is not None:
+        payload.update(start=start, end=end)
+    return SimpleNamespace(id=cid, score=score, payload=payload)
+
+
+def _unique(i, words=60):
+    return " ".join(f"wort{i}_{j}" for j in range(words)) + "."
+
+
+def test_orders_by_score_and_reports_tokens():
+    hits = [_hit("b", 0.5, _unique(1)), _hit("a", 0.9, _unique(2))]
+    packed = context.pack(hits, 10_000)
+    assert [cid for cid, _ in packed["texts"]] == ["a", "b"]
+    assert packed["tokens"] == sum(estimate_tokens(t) + context.LABEL_TOKENS for _, t in packed["texts"])
+    assert packed["dropped"] == [] and packed["budget"] == 10_000
+
+
+def test_drops_repeated_ids_and_contained_spans():
+    hits = [_hit("a", 0.9, start=0, end=800), _hit("a", 0.8, start=0, end=800), _hit("c", 0.7, start=100, end=500)]
+    packed = context.pack(hits, 10_000)
+    assert [cid for cid, _ in packed["texts"]] == ["a"]
+    assert {d["chunk_id"]: d["reason"] for d in packed["dropped"]} == {"a": "duplicate", "c": "duplicate"}
+
+
+def test_cuts_overlap_with_stronger_chunk():
+    hits = [_hit("a", 0.9, start=0, end=800), _hit("b", 0.8, start=700, end=1500)]
+    packed = context.pack(hits, 10_000)
+    assert dict(packed["texts"])["b"] == DOC[800:1500].strip()
+
+
+def test_drops_near_duplicates_from_other_documents():
+    text = _unique(3)
+    hits = [_hit("a", 0.9, text, path="a.md"), _hit("b", 0.8, text + " Ende", path="b.md")]
+    packed = context.pack(hits, 10_000)
+    assert [cid for cid, _ in packed["texts"]] == ["a"]
+
+
+def test_budget_trims_then_drops():
+    hits = [_hit(str(i), 1.0 - i / 10, _unique(i, words=100)) for i in range(5)]
+    budget = 2 * (estimate_tokens(_unique(0, words=100)) + context.LABEL_TOKENS) + context.RAG_MIN_CHUNK_TOKENS + 30
+    packed = context.pack(hits, budget)
+    assert packed["tokens"] <= budget
+    assert packed["trimmed"] == ["2"]
+    assert [d["chunk_id"] for d in packed["dropped"]] == ["3", "4"]
+    assert all(d["reason"] == "budget" for d in packed["dropped"])
+
+
+def test_zero_budget_drops_everything():
+    packed = context.pack([_hit("a", 0.9, _unique(1))], 0)
+    assert packed["hits"] == [] and packed["dropped"][0]["reason"] == "budget"
@@ -0,0 +1,44 @@
+import pytest
+from psycopg_pool import ConnectionPool
+
+from api.services import db
+
+
+@pytest.mark.parametrize("raw, expected", [("5", 5), (" 0 ", 0), ("None", None), ("off", None), ("", None)])
+def test_prepare_threshold(monkeypatch, raw, expected):
+    monkeypatch.setattr(db, "DB_PREPARE_THRESHOLD", raw)
+    assert db._connect_kwargs() == {"prepare_threshold": expected}
+
+
+def test_pool_options(monkeypatch):
+    monkeypatch.setattr(db, "DB_POOL_MIN", 8)
+    monkeypatch.setattr(db, "DB_POOL_MAX", 4)
+    opts = db._pool_options(ConnectionPool)
+    # max_size nie kleiner als min_size; Pool wird erst explizit geöffnet
+    assert opts["min_size"] == opts["max_size"] == 8
+    assert opts["open"] is False and opts["close_returns"] is True
+    assert opts["check"] == ConnectionPool.check_connection
+
+    monkeypatch.setattr(db, "DB_POOL_CHECK", False)
+    assert db._pool_options(ConnectionPool)["check"] is None
+
+
+def test_conninfo_from_env(monkeypatch):
+    monkeypatch.setenv("DB_HOST", "pg.local")
+    monkeypatch.setenv("DB_NAME", "luna_test")
+    monkeypatch.delenv("DB_PASSWORD", raising=False)
+    monkeypatch.setenv("DB_PASS", "geheim")
+    info = db.conninfo()
+    assert "host=pg.local" in info and "dbname=luna_test" in info and "password=geheim" in info
+
+
+def test_aconnection_requires_open_pool(monkeypatch):
+    monkeypatch.setattr(db, "apool", None)
+    with pytest.raises(RuntimeError):
+        db.aconnection()
+
+
+def test_stats_without_pools(monkeypatch):
+    monkeypatch.setattr(db, "pool", None)
+    monkeypatch.setattr(db, "apool", None)
+    assert db.stats()["sync"] is None and db.stats()["async"] is None
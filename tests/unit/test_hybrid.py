@@ -0,0 +1,54 @@
+import zlib
+from types import SimpleNamespace
+
+from api.services import rag, sparse
+
+
+def test_terms_keep_exact_codes_and_paragraphs():
+    terms = sparse.terms("Nach § 14a EnWG gilt der Tarif NT-2 (HT/NT) ab 0,25 €/kWh.")
+    for t in ("§14a", "14a", "enwg", "tarif", "nt-2", "nt", "ht/nt", "ht", "0,25"):
+        assert t in terms
+    # Stoppwörter und einstellige Bestandteile fallen weg
+    assert "der" not in terms and "nach" not in terms and "2" not in terms
+
+
+def test_encode_document_bm25_weights():
+    vec = sparse.encode_document("Tarif Tarif Tarif Netz")
+    weights = dict(zip(vec.indices, vec.values))
+    tarif, netz = weights[sparse._index("tarif")], weights[sparse._index("netz")]
+    assert len(weights) == 2
+    # tf-Sättigung: dreifache Häufigkeit, aber weniger als dreifaches Gewicht
+    assert netz < tarif < 3 * netz
+    assert tarif < sparse.BM25_K1 + 1
+
+
+def test_encode_query_unit_weights_without_duplicates():
+    vec = sparse.encode_query("Tarif tarif NT-2")
+    assert set(vec.values) == {1.0}
+    assert len(vec.indices) == len(set(vec.indices)) == 3
+
+
+def test_indices_are_stable():
+    # CRC32 statt hash(): gleiche Indizes in jedem Prozess
+    assert sparse._index("tarif") == zlib.crc32(b"tarif")
+    assert sparse.encode_document("EnWG").indices == sparse.encode_query("enwg").indices
+
+
+class _Hit(SimpleNamespace):
+    def model_copy(self, update):
+        return _Hit(**{**self.__dict__, **update})
+
+
+def _hits(*ids):
+    return [_Hit(id=i, score=1.0, payload={"text": i}) for i in ids]
+
+
+def test_fuse_rewards_agreement():
+    fused = rag._fuse(_hits("a", "b", "c"), _hits("c", "d", "a"), 3)
+    assert [h.id for h in fused] == ["a", "c", "b"]
+    assert fused[0].score == 1 / (rag.RAG_RRF_K + 1) + 1 / (rag.RAG_RRF_K + 3)
+
+
+def test_fuse_without_sparse_hits_keeps_dense_order():
+    dense = _hits("a", "b", "c")
+    assert rag._fuse(dense, [], 2) == dense[:2]
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from api.services import market
+
+
+def _parse(fmt, text):
+    parser = market.PriceParser(fmt)
+    rows = parser.parse(text.encode()) + list(parser.flush())
+    return parser, rows
+
+
+def test_csv_with_alternative_columns():
+    parser, rows = _parse("csv", "market,timestamp,price\nda,2025-01-01T00:00:00+01:00,81.5\n")
+    assert rows == [("da", datetime(2025, 1, 1), 81.5)]
+    assert parser.years == {2025}
+
+
+def test_csv_short_row_is_rejected():
+    parser, rows = _parse("csv", "market,ts,price_eur_mwh\nda\nda,2025-01-01T01:00:00,70\n")
+    assert len(rows) == 1
+    assert parser.rejected == 1 and parser.errors[0]["line"] == 2
+
+
+def test_csv_incomplete_header_raises():
+    with pytest.raises(ValueError, match="price_eur_mwh"):
+        _parse("csv", "market,ts\nda,2025-01-01T00:00:00\n")
+
+
+@pytest.mark.parametrize("line", ["42", "[1]", "null", "{kaputt"])
+def test_ndjson_non_object_is_rejected(line):
+    parser, rows = _parse("ndjson", line + '\n{"market": "da", "ts": "2025-01-01T00:00:00", "price_eur_mwh": 0}\n')
+    # Preis 0 ist gültig (nicht mit "fehlt" verwechseln)
+    assert rows == [("da", datetime(2025, 1, 1), 0.0)]
+    assert parser.rejected == 1
+
+
+@pytest.mark.parametrize("line", [
+    '{"market": "", "ts": "2025-01-01T00:00:00", "price": 1}',
+    '{"market": "da", "ts": "gestern", "price": 1}',
+    '{"market": "da", "ts": "2025-01-01T00:00:00", "price": "nan"}',
+    '{"market": "da", "ts": "2025-01-01T00:00:00"}',
+])
+def test_invalid_values_are_rejected(line):
+    parser, rows = _parse("ndjson", line)
+    assert rows == [] and parser.rejected == 1
+
+
+def _prices(monkeypatch, points):
+    t = np.array([(ts - market.EPOCH).total_seconds() for ts, _ in points])
+    p = np.array([price for _, price in points], dtype=np.float64)
+    calls = []
+
+    def _fake(conn, name, start, end):
+        calls.append((start, end))
+        keep = (t >= (start - market.EPOCH).total_seconds()) & (t < (end - market.EPOCH).total_seconds())
+        return t[keep], p[keep]
+
+    monkeypatch.setattr(market, "prices", _fake)
+    return calls
+
+
+def test_price_grid_forward_fills(monkeypatch):
+    t0 = datetime(2025, 1, 1)
+    calls = _prices(monkeypatch, [(t0 - timedelta(hours=2), 50.0), (t0 + timedelta(minutes=30), 80.0),
+                                  (t0 + timedelta(minutes=40), 90.0)])
+    grid = market.price_grid(None, "da", t0, 4, timedelta(minutes=15))
+    # Preis vor dem Fenster gilt weiter; 00:45 nimmt den letzten Preis davor (00:40)
+    np.testing.assert_array_equal(grid, [50.0, 50.0, 80.0, 90.0])
+    assert calls == [(t0 - market.MARKET_PRICE_MAX_GAP, t0 + timedelta(hours=1))]
+
+
+def test_price_grid_gap_limit(monkeypatch):
+    t0 = datetime(2025, 1, 1)
+    monkeypatch.setattr(market, "MARKET_PRICE_MAX_GAP", timedelta(hours=1))
+    _prices(monkeypatch, [(t0, 60.0)])
+    grid = market.price_grid(None, "da", t0 - timedelta(hours=1), 4, timedelta(hours=1))
+    # vor dem ersten Preis und ab MAX_GAP danach: NaN
+    assert np.isnan(grid[0]) and grid[1] == 60.0 and np.isnan(grid[2:]).all()
+
+
+def test_price_grid_without_prices(monkeypatch):
+    _prices(monkeypatch, [])
+    assert np.isnan(market.price_grid(None, "da", datetime(2025, 1, 1), 3, timedelta(hours=1))).all()
+
+
+def test_nan_to_none():
+    assert market._nan_to_none(np.array([1.23456789, np.nan])) == [1.234568, None]
+    assert market._nan_to_none(np.array([0.0, 2.0]), mask=np.array([True, False])) == [None, 2.0]
@@ -0,0 +1,133 @@
+from datetime import datetime, timezone
+
+import pytest
+from qdrant_client import QdrantClient
+
+from api.services import qdrant, rag
+from api.services.qdrant import qm
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    """In-Memory-Qdrant statt Server (ignoriert Payload-Indizes, filtert aber gleich)."""
+    monkeypatch.setattr(qdrant, "_client", QdrantClient(":memory:"))
+    monkeypatch.setattr(qdrant, "_sparse", {})
+    monkeypatch.setattr(qdrant, "_indexed", set())
+    return qdrant._client
+
+
+def test_build_filter_empty():
+    assert qdrant.build_filter() is None
+    assert qdrant.build_filter(source=None, tags=[]) is None
+
+
+def test_build_filter_conditions():
+    f = qdrant.build_filter(source="upload", tags=["tarif", "netz"], date_from="2025-01-01T00:00:00Z")
+    source, tags, date = f.must
+    assert source.key == "source" and source.match == qm.MatchValue(value="upload")
+    assert tags.key == "tags" and tags.match == qm.MatchAny(any=["tarif", "netz"])
+    assert date.key == qdrant.DATE_FIELD and date.range.lt is None
+    assert date.range.gte == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_build_filter_rejects_unknown_field():
+    with pytest.raises(ValueError, match="text"):
+        qdrant.build_filter(text="x")
+
+
+def test_doc_meta():
+    meta = qdrant.doc_meta("Tarif.PDF", "upload", tags=[" netz", "tarif", "netz", ""], tenant="stadtwerk")
+    assert meta["doc_type"] == "pdf"
+    assert meta["tags"] == ["netz", "tarif"]
+    assert meta["tenant"] == "stadtwerk"
+    assert datetime.fromisoformat(meta[qdrant.DATE_FIELD]).tzinfo is not None
+    assert "tenant" not in qdrant.doc_meta("README", "corpus")
+    assert qdrant.doc_meta("README", "corpus")["doc_type"] == "unknown"
+
+
+def test_scope_versions_differ_per_filter():
+    assert rag._scope(None) == (None, rag.PROMPT_VERSION)
+    f1, v1 = rag._scope({"source": "upload"})
+    _, v2 = rag._scope({"source": "corpus"})
+    _, v3 = rag._scope({"source": "upload"})
+    assert f1 is not None and v1 != v2 and v1 == v3 != rag.PROMPT_VERSION
+
+
+def test_filtered_search(memory):
+    qdrant.ensure_collection(dim=2)
+    points = [
+        qdrant.make_point(1, [1.0, 0.0], {"text": "a", "tenant": "x", "tags": ["tarif"],
+                                          qdrant.DATE_FIELD: "2025-01-10T00:00:00+00:00"}),
+        qdrant.make_point(2, [0.9, 0.1], {"text": "b", "tenant": "y", "tags": ["netz"],
+                                          qdrant.DATE_FIELD: "2025-02-10T00:00:00+00:00"}),
+        qdrant.make_point(3, [0.8, 0.2], {"text": "c", "tenant": "x", "tags": ["netz", "tarif"],
+                                          qdrant.DATE_FIELD: "2025-03-10T00:00:00+00:00"}),
+    ]
+    qdrant.upsert_points(points, parallel=1)
+
+    def ids(**kw):
+        return sorted(h.id for h in qdrant.search([1.0, 0.0], top_k=10, query_filter=qdrant.build_filter(**kw)))
+
+    assert ids() == [1, 2, 3]
+    assert ids(tenant="x") == [1, 3]
+    assert ids(tags=["netz"]) == [2, 3]
+    assert ids(tenant="x", tags="netz") == [3]
+    assert ids(date_from="2025-02-01T00:00:00Z", date_to="2025-03-01T00:00:00Z") == [2]
+
+
+def test_profile_overrides(monkeypatch):
+    assert qdrant.profile("binary")["m"] == qdrant.PROFILES["binary"]["m"]
+    monkeypatch.setattr(qdrant, "QDRANT_HNSW_M", 48)
+    monkeypatch.setattr(qdrant, "QDRANT_HNSW_EF_CONSTRUCT", 300)
+    p = qdrant.profile("scalar")
+    assert (p["name"], p["m"], p["ef_construct"], p["quantization"]) == ("scalar", 48, 300, "scalar")
+    # PROFILES selbst bleibt unverändert
+    assert qdrant.PROFILES["scalar"]["m"] == 16
+
+
+def test_profile_unknown():
+    with pytest.raises(ValueError, match="turbo"):
+        qdrant.profile("turbo")
+
+
+@pytest.mark.parametrize("name, cls", [
+    ("default", type(None)),
+    ("scalar", qm.ScalarQuantization),
+    ("product", qm.ProductQuantization),
+    ("binary", qm.BinaryQuantization),
+])
+def test_collection_config(monkeypatch, name, cls):
+    monkeypatch.setattr(qdrant, "QDRANT_HYBRID", True)
+    config = qdrant._collection_config(384, name)
+    on_disk = qdrant.PROFILES[name]["on_disk"]
+    assert config["vectors_config"].size == 384 and config["vectors_config"].on_disk == on_disk
+    assert isinstance(config["quantization_config"], cls)
+    assert config["on_disk_payload"] == on_disk
+    assert config["sparse_vectors_config"][qdrant.SPARSE_VECTOR].modifier == qm.Modifier.IDF
+
+
+def test_collection_config_dense_only(monkeypatch):
+    monkeypatch.setattr(qdrant, "QDRANT_HYBRID", False)
+    assert "sparse_vectors_config" not in qdrant._collection_config(8, "default")
+
+
+def test_search_params(monkeypatch):
+    monkeypatch.setattr(qdrant, "QDRANT_SEARCH_EF", 0)
+    monkeypatch.setattr(qdrant, "QDRANT_RESCORE", True)
+    default = qdrant.search_params()
+    assert default.hnsw_ef is None and default.exact is False and default.quantization.rescore is True
+    p = qdrant.search_params(ef=256, rescore=False, oversampling=3.0, exact=True)
+    assert p.hnsw_ef == 256 and p.exact is True
+    assert p.quantization.rescore is False and p.quantization.oversampling == 3.0
+
+
+def test_switch_alias(memory):
+    for name in ("luna_a", "luna_b"):
+        qdrant.create_collection(name, 2, "default")
+    assert qdrant.resolve_collection("luna_alias") == "luna_alias"
+    qdrant.switch_alias("luna_a", "luna_alias")
+    assert qdrant.resolve_collection("luna_alias") == "luna_a"
+    qdrant.switch_alias("luna_b", "luna_alias")
+    assert qdrant.resolve_collection("luna_alias") == "luna_b"
+    qdrant.upsert_points([qdrant.make_point(1, [1.0, 0.0], {"text": "x"})], collection="luna_alias")
+    assert memory.count("luna_b").count == 1 and memory.count("luna_a").count == 0
@@ -0,0 +1,32 @@
+import asyncio
+from types import SimpleNamespace
+
+from api.services import embed, rag
+
+
+def _hit(cid, text):
+    return SimpleNamespace(id=cid, score=0.9, payload={"chunk_id": cid, "text": text, "filename": "a.pdf"})
+
+
+def test_ask_batch_reports_generate_errors_per_question(monkeypatch):
+    async def _embed(texts):
+        return [[0.1, 0.2] for _ in texts]
+
+    async def _retrieve(questions, embs, top_k, query_filter=None):
+        return [[_hit(f"c{i}", f"Text zu {q}.")] for i, q in enumerate(questions)]
+
+    async def _stream(system_prompt, prompt):
+        if "kaputt" in prompt:
+            raise RuntimeError("Ollama nicht erreichbar")
+        yield "Antwort"
+
+    monkeypatch.setattr(embed, "aembed_texts", _embed)
+    monkeypatch.setattr(embed, "agenerate_stream", _stream)
+    monkeypatch.setattr(rag, "_aretrieve_batch", _retrieve)
+    monkeypatch.setattr(rag, "_cached", lambda *a, **k: None)
+    monkeypatch.setattr(rag, "_remember", lambda *a, **k: None)
+
+    ok, failed = asyncio.run(rag.aask_batch(["Frage heil", "Frage kaputt"]))
+    assert ok["status"] == "ok" and ok["answer"] == "Antwort"
+    assert failed["status"] == "error"
+    assert "Ollama nicht erreichbar" in failed["answer"]
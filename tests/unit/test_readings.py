@@ -0,0 +1,132 @@
+from datetime import date, datetime
+
+import pytest
+
+from api.services import readings
+
+
+def _parse(fmt, text, known=None):
+    parser = readings.ReadingParser(fmt, known_devices=known)
+    rows = parser.parse(text.encode()) + list(parser.flush())
+    return parser, rows
+
+
+def test_ndjson_valid_rows():
+    parser, rows = _parse("ndjson", '{"device_id": 1, "timestamp": "2025-01-01T00:15:00", "value": 1.5}\n'
+                                    '{"device_id": "2", "ts": "2025-02-01T00:00:00+01:00", "value": "0.25"}')
+    assert [(d, v) for d, _, v, _ in rows] == [(1, 1.5), (2, 0.25)]
+    # Offset wird verworfen (timestamp without time zone)
+    assert rows[1][3] == datetime(2025, 2, 1)
+    assert parser.months == {(2025, 1), (2025, 2)}
+    assert parser.rejected == 0
+
+
+def test_csv_short_row_is_rejected():
+    parser, rows = _parse("csv", "device_id,timestamp,value\n1,2025-01-01T00:00:00\n1,2025-01-01T00:15:00,2\n")
+    assert len(rows) == 1
+    assert parser.rejected == 1
+    assert parser.errors[0]["line"] == 2
+
+
+def test_csv_incomplete_header_raises():
+    with pytest.raises(ValueError, match="value"):
+        _parse("csv", "device_id,timestamp\n1,2025-01-01T00:00:00\n")
+
+
+@pytest.mark.parametrize("line", ["[1, 2]", "42", "null", '"x"', "{kaputt"])
+def test_ndjson_non_object_is_rejected(line):
+    parser, rows = _parse("ndjson", line + '\n{"device_id": 1, "timestamp": "2025-01-01T00:00:00", "value": 1}\n')
+    assert len(rows) == 1
+    assert parser.rejected == 1
+
+
+@pytest.mark.parametrize("value", ['"nan"', '"inf"', '"-Infinity"'])
+def test_non_finite_values_are_rejected(value):
+    parser, rows = _parse("ndjson", f'{{"device_id": 1, "timestamp": "2025-01-01T00:00:00", "value": {value}}}')
+    assert rows == [] and parser.rejected == 1
+
+
+def test_unknown_device_is_rejected():
+    parser, rows = _parse("ndjson", '{"device_id": 7, "timestamp": "2025-01-01T00:00:00", "value": 1}\n'
+                                    '{"device_id": 1, "timestamp": "2025-01-01T00:00:00", "value": 1}', known={1})
+    assert [r[0] for r in rows] == [1]
+    assert "7" in parser.errors[0]["error"]
+
+
+def test_lines_split_across_chunks():
+    data = b'{"device_id": 1, "timestamp": "2025-01-01T00:00:00", "value": 1}\n' * 5
+    parser = readings.ReadingParser("ndjson")
+    rows = []
+    for i in range(0, len(data), 7):
+        rows += parser.parse(data[i:i + 7])
+    rows += list(parser.flush())
+    assert len(rows) == 5 and parser.rejected == 0
+
+
+def test_error_report_is_capped():
+    parser, rows = _parse("ndjson", "[]\n" * (readings.MAX_REPORTED_ERRORS + 5))
+    assert parser.rejected == readings.MAX_REPORTED_ERRORS + 5
+    assert len(parser.errors) == readings.MAX_REPORTED_ERRORS
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.sql.append(sql)
+
+    def fetchall(self):
+        return [(name,) for name in self.conn.tables]
+
+
+class _Conn:
+    def __init__(self, tables=()):
+        self.tables = list(tables)
+        self.sql = []
+        self.commits = 0
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_list_partitions_sorted_and_filtered():
+    conn = _Conn(["readings_2025_03", "readings_default", "readings_2024_12", "readings_2025_01"])
+    assert readings.list_partitions(conn) == [
+        ("readings_2024_12", date(2024, 12, 1)),
+        ("readings_2025_01", date(2025, 1, 1)),
+        ("readings_2025_03", date(2025, 3, 1)),
+    ]
+
+
+@pytest.mark.parametrize("today, keep, expected", [
+    # Cutoff = Monatsbeginn von today − keep Monate; ältere Partitionen fallen weg
+    (date(2025, 3, 15), 2, ["readings_2024_11", "readings_2024_12"]),
+    (date(2025, 3, 1), 3, ["readings_2024_11"]),
+    (date(2025, 1, 31), 1, ["readings_2024_11"]),
+    (date(2025, 3, 15), 0, ["readings_2024_11", "readings_2024_12", "readings_2025_01", "readings_2025_02"]),
+    (date(2025, 3, 15), 12, []),
+])
+def test_apply_retention_cutoff(monkeypatch, today, keep, expected):
+    parts = [(f"readings_{y}_{m:02d}", date(y, m, 1)) for y, m in
+             [(2024, 11), (2024, 12), (2025, 1), (2025, 2), (2025, 3)]]
+    monkeypatch.setattr(readings, "list_partitions", lambda conn: parts)
+    conn = _Conn()
+    assert readings.apply_retention(conn, keep, today=today) == expected
+    assert sum("DROP TABLE" in s for s in conn.sql) == len(expected)
+
+
+def test_apply_retention_detach_only(monkeypatch):
+    monkeypatch.setattr(readings, "list_partitions", lambda conn: [("readings_2020_01", date(2020, 1, 1))])
+    conn = _Conn()
+    assert readings.apply_retention(conn, 1, drop=False, today=date(2025, 1, 1)) == ["readings_2020_01"]
+    assert conn.sql == ['ALTER TABLE readings DETACH PARTITION "readings_2020_01"']
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from api.services import recommender
+
+DAYS = 14
+
+
+def _profile(evening=1.0, night=0.2):
+    day = np.full(24, 1.0)
+    day[:7] = night
+    day[recommender.PEAK_HOURS] = evening
+    return day
+
+
+def _device(day, spike=None, last_day_factor=1.0):
+    # leichte Schwankung von Tag zu Tag, damit der z-Score definiert ist
+    m = np.stack([day * (1 + 0.02 * (d % 3)) for d in range(DAYS)])
+    m[-1] *= last_day_factor
+    if spike is not None:
+        m[3, spike] = 50.0
+    return m.ravel()
+
+
+def _matrix():
+    rows = {
+        "normal": _device(_profile()),
+        "baseload": _device(np.ones(24)),
+        "peak": _device(_profile(), spike=12),
+        "load_shift": _device(_profile(evening=5.0)),
+        "anomaly": _device(_profile(), last_day_factor=3.0),
+        "sparse": np.where(np.arange(DAYS * 24) % 4 == 0, 1.0, np.nan),
+    }
+    return list(rows), np.stack(list(rows.values()))
+
+
+def test_peak_hours_spec():
+    assert recommender._peak_hours("17-20") == [17, 18, 19, 20]
+    assert recommender._peak_hours("7-9, 17-18") == [7, 8, 9, 17, 18]
+    assert recommender._peak_hours("23-25") == [0, 1, 23]
+
+
+def test_window_ends_at_last_full_hour():
+    start, end = recommender.window(datetime(2025, 3, 10, 14, 37, 12), days=7)
+    assert end == datetime(2025, 3, 10, 14) and start == datetime(2025, 3, 3, 14)
+
+
+def test_signals_per_device():
+    names, matrix = _matrix()
+    sig = recommender.signals(matrix)
+    i = names.index
+    assert sig["ok"].tolist() == [True, True, True, True, True, False]
+    assert sig["baseload_ratio"][i("baseload")] == pytest.approx(1.0, abs=0.05)
+    assert sig["baseload_ratio"][i("normal")] == pytest.approx(0.2, abs=0.01)
+    assert sig["peak_ratio"][i("peak")] > recommender.RECO_PEAK_RATIO
+    assert sig["shift_factor"][i("load_shift")] > recommender.RECO_SHIFT_FACTOR
+    assert sig["z"][i("anomaly")] > recommender.RECO_ANOMALY_Z
+    assert abs(sig["z"][i("normal")]) < 2
+
+
+def test_signals_respect_start_hour():
+    _, matrix = _matrix()
+    shifted = np.roll(matrix, -5, axis=1)
+    # gleiche Daten, 5 Stunden später beginnend → gleicher Hochpreisanteil
+    a = recommender.signals(matrix[:, :-24])["share"]
+    b = recommender.signals(shifted[:, :-24], start_hour=5)["share"]
+    np.testing.assert_allclose(a[:5], b[:5], rtol=0.05)
+
+
+def test_recommend_one_kind_per_profile():
+    names, matrix = _matrix()
+    ids = np.arange(100, 100 + len(names))
+    recs = recommender.recommend(ids, recommender.signals(matrix))
+    kinds = {(d, k) for d, k, _, _ in recs}
+    assert kinds == {(100 + names.index(k), k) for k in ("baseload", "peak", "load_shift", "anomaly")}
+    for _, _, score, text in recs:
+        assert score >= 1.0 and "{" not in text
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+
+from api.services import repositories
+
+
+class _Result:
+    def scalars(self):
+        return iter([])
+
+    def scalar_one_or_none(self):
+        return None
+
+
+class _Session:
+    """Hält die ausgeführten Statements fest, statt sie an Postgres zu schicken."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return _Result()
+
+    def sql(self, i=-1) -> str:
+        return str(self.statements[i].compile(dialect=postgresql.dialect())).lower()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_latest_readings_uses_one_lateral_query():
+    s = _Session()
+    assert _run(repositories.latest_readings(s, [1, 2, 3])) == {}
+    assert len(s.statements) == 1
+    sql = s.sql()
+    assert "join lateral" in sql and "order by readings.timestamp desc" in sql and "limit" in sql
+
+
+def test_latest_readings_without_ids_skips_query():
+    s = _Session()
+    assert _run(repositories.latest_readings(s, [])) == {}
+    assert s.statements == []
+
+
+def test_get_device_joins_owner():
+    s = _Session()
+    _run(repositories.get_device(s, 7))
+    assert "left outer join users" in s.sql()
+
+
+def test_readings_for_device_is_bounded():
+    s = _Session()
+    _run(repositories.readings_for_device(s, 7, datetime(2025, 1, 1), datetime(2025, 2, 1), limit=50))
+    sql = s.sql()
+    # Zeitbedingung auf timestamp → Partition-Pruning; immer mit LIMIT
+    assert 'readings.timestamp >=' in sql and 'readings.timestamp <' in sql and "limit" in sql
+
+
+def test_latest_recommendations_filters_last_run():
+    s = _Session()
+    _run(repositories.latest_recommendations(s, 7))
+    sql = s.sql()
+    assert "max(recommendations.created_at)" in sql and "order by recommendations.score desc" in sql
+
+
+def test_list_devices_optional_user_filter():
+    s = _Session()
+    _run(repositories.list_devices(s))
+    _run(repositories.list_devices(s, user_id=3))
+    assert "devices.user_id =" not in s.sql(0)
+    assert "devices.user_id =" in s.sql(1)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from api.services import rollups
+
+T0 = datetime(2025, 1, 1)
+
+
+def test_touched_ranges_min_max_per_device():
+    touched = rollups.TouchedRanges()
+    assert not touched
+    for device_id, minutes in [(1, 30), (2, 0), (1, 0), (1, 90), (1, 45), (2, 0)]:
+        touched.add(device_id, T0 + timedelta(minutes=minutes))
+    assert touched
+    assert touched.ranges == {
+        1: [T0, T0 + timedelta(minutes=90)],
+        2: [T0, T0],
+    }
+
+
+@pytest.mark.parametrize("span, max_points, expected", [
+    (timedelta(hours=6), 1000, "15m"),
+    (timedelta(days=10), 1000, "15m"),       # 960 Buckets
+    (timedelta(days=11), 1000, "1h"),        # 1056 × 15 min
+    (timedelta(days=41), 1000, "1h"),
+    (timedelta(days=42), 1000, "1d"),        # 1008 Stunden
+    (timedelta(days=5000), 1000, "1d"),      # gröbste, auch wenn zu viele
+    (timedelta(hours=1), 4, "15m"),
+    (timedelta(hours=1), 3, "1h"),
+])
+def test_pick_resolution(span, max_points, expected):
+    assert rollups.pick_resolution(T0, T0 + span, max_points) == expected
+
+
+class _Cursor:
+    def __init__(self, row):
+        self.row = row
+        self.params = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.params = params
+
+    def fetchone(self):
+        return self.row
+
+
+class _Conn:
+    def __init__(self, row):
+        self.cur = _Cursor(row)
+
+    def cursor(self, binary=False):
+        return self.cur
+
+
+def test_load_matrix_places_buckets():
+    dev = np.array([7, 3, 7], dtype=">i4").tobytes()
+    idx = np.array([0, 2, 3], dtype=">i4").tobytes()
+    val = np.array([1.5, 2.0, 4.0], dtype=">f8").tobytes()
+    conn = _Conn((dev, idx, val))
+    m = rollups.load_matrix(conn, np.array([3, 7]), T0, 4, "1h")
+    assert m.shape == (2, 4) and m.dtype == np.float32
+    np.testing.assert_array_equal(m[0], [np.nan, np.nan, 2.0, np.nan])
+    np.testing.assert_array_equal(m[1], [1.5, np.nan, np.nan, 4.0])
+    assert conn.cur.params["end"] == T0 + timedelta(hours=4)
+    assert conn.cur.params["width"] == 3600
+
+
+def test_load_matrix_without_rows_is_nan():
+    m = rollups.load_matrix(_Conn((None, None, None)), np.array([1]), T0, 3, "15m")
+    assert np.isnan(m).all()
+
+
+def test_query_rejects_unknown_resolution():
+    with pytest.raises(ValueError):
+        rollups.query(_Conn(None), 1, T0, T0 + timedelta(hours=1), resolution="5m")
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from api.services import series
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=np.int64) * 1000
+    return t, rng.normal(size=n).cumsum()
+
+
+@pytest.mark.parametrize("n", [2001, 2500, 10007, 100001])
+def test_minmax_non_divisible_lengths(n):
+    t, v = _series(n)
+    ts, vs = series.minmax(t, v, 2000)
+    assert len(ts) <= 2000
+    assert np.all(np.diff(ts) > 0)
+    # globale Extrema bleiben immer erhalten
+    assert vs.min() == v.min() and vs.max() == v.max()
+
+
+def test_minmax_keeps_extrema_per_bucket():
+    t, v = _series(1000)
+    ts, vs = series.minmax(t, v, 10)
+    edges = np.linspace(0, 1000, 6).astype(np.int64)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        assert v[lo:hi].min() in vs and v[lo:hi].max() in vs
+
+
+def test_minmax_short_series_unchanged():
+    t, v = _series(50)
+    ts, vs = series.minmax(t, v, 100)
+    assert ts is t and vs is v
+
+
+@pytest.mark.parametrize("n", [2001, 10007])
+def test_lttb_keeps_endpoints_and_order(n):
+    t, v = _series(n)
+    ts, vs = series.lttb(t, v, 500)
+    assert len(ts) == 500
+    assert ts[0] == t[0] and ts[-1] == t[-1]
+    assert np.all(np.diff(ts) > 0)
+
+
+def test_downsample_rejects_unknown_mode():
+    t, v = _series(10)
+    with pytest.raises(ValueError):
+        series.downsample(t, v, 5, mode="avg")
+
+
+@pytest.mark.parametrize("n", [2001, 10007])
+def test_minmax_matches_argmin_argmax_with_ties(n):
+    t = np.arange(n, dtype=np.int64)
+    v = np.random.default_rng(3).integers(0, 3, n).astype(np.float64)
+    ts, _ = series.minmax(t, v, 2000)
+    edges = np.linspace(0, n, 1001).astype(np.int64)
+    expected = set()
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        expected |= {lo + int(np.argmin(v[lo:hi])), lo + int(np.argmax(v[lo:hi]))}
+    assert ts.tolist() == sorted(expected)